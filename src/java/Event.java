@@ -25,7 +25,12 @@ public class Event {
 	/**
 	 * Base for events.
 	 */
-	public static class Base {}
+	public static class Base {
+		/**
+		 * Request id, version 2 only.
+		 */
+		public long id = -1;
+	}
 	/**
 	 * Log
 	 */
@@ -50,6 +55,18 @@ public class Event {
 			);
 		}
 	}
+	/**
+	 * Streamed debug log records.
+	 */
+	public static class LogStream extends Base {
+		public String records[];
+		public String toString() {
+			return String.format(
+				"LogStream %1$d",
+				records.length
+			);
+		}
+	}
 	/**
 	 * Query string.
 	 */
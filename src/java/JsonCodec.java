@@ -0,0 +1,343 @@
+/*
+ * otopi -- plugable installer
+ * Copyright (C) 2012-2013 Red Hat, Inc.
+ *
+ * This library is free software; you can redistribute it and/or
+ * modify it under the terms of the GNU Lesser General Public
+ * License as published by the Free Software Foundation; either
+ * version 2.1 of the License, or (at your option) any later version.
+ *
+ * This library is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * Lesser General Public License for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public
+ * License along with this library; if not, write to the Free Software
+ * Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+ */
+package org.ovirt.otopi.dialog;
+package org.ovirt.otopi.dialog;
+
+import java.util.Arrays;
+import java.util.LinkedHashMap;
+import java.util.LinkedList;
+import java.util.List;
+import java.util.Map;
+
+/**
+ * Minimal JSON codec for machine dialog version 2.
+ *
+ * Decodes objects into Map, arrays into List, integers into Long,
+ * other numbers into Double.
+ *
+ * Encoded output is ASCII, so length in characters equals length
+ * in bytes.
+ */
+public class JsonCodec {
+
+	private String _text;
+	private int _pos;
+
+	private JsonCodec(String text) {
+		_text = text;
+		_pos = 0;
+	}
+
+	private IllegalArgumentException _error(String message) {
+		return new IllegalArgumentException(
+			String.format(
+				"Invalid JSON at %1$d: %2$s",
+				_pos,
+				message
+			)
+		);
+	}
+
+	private void _skipWhitespace() {
+		while (
+			_pos < _text.length() &&
+			" \t\r\n".indexOf(_text.charAt(_pos)) != -1
+		) {
+			_pos++;
+		}
+	}
+
+	private char _peek() {
+		_skipWhitespace();
+		if (_pos >= _text.length()) {
+			throw _error("unexpected end");
+		}
+		return _text.charAt(_pos);
+	}
+
+	private void _expect(char c) {
+		if (_peek() != c) {
+			throw _error(String.format("expected '%1$c'", c));
+		}
+		_pos++;
+	}
+
+	private boolean _literal(String literal) {
+		if (_text.startsWith(literal, _pos)) {
+			_pos += literal.length();
+			return true;
+		}
+		return false;
+	}
+
+	private String _string() {
+		_expect('"');
+		StringBuilder ret = new StringBuilder();
+		while (true) {
+			if (_pos >= _text.length()) {
+				throw _error("unterminated string");
+			}
+			char c = _text.charAt(_pos++);
+			if (c == '"') {
+				break;
+			}
+			else if (c == '\\') {
+				if (_pos >= _text.length()) {
+					throw _error("unterminated string");
+				}
+				c = _text.charAt(_pos++);
+				switch (c) {
+					case '"': case '\\': case '/':
+						ret.append(c);
+					break;
+					case 'b':
+						ret.append('\b');
+					break;
+					case 'f':
+						ret.append('\f');
+					break;
+					case 'n':
+						ret.append('\n');
+					break;
+					case 'r':
+						ret.append('\r');
+					break;
+					case 't':
+						ret.append('\t');
+					break;
+					case 'u':
+						if (_pos + 4 > _text.length()) {
+							throw _error("invalid unicode escape");
+						}
+						try {
+							ret.append(
+								(char)Integer.parseInt(
+									_text.substring(_pos, _pos + 4),
+									16
+								)
+							);
+						}
+						catch (NumberFormatException e) {
+							throw _error("invalid unicode escape");
+						}
+						_pos += 4;
+					break;
+					default:
+						throw _error("invalid escape");
+				}
+			}
+			else {
+				ret.append(c);
+			}
+		}
+		return ret.toString();
+	}
+
+	private Object _number() {
+		int start = _pos;
+		boolean integral = true;
+		while (_pos < _text.length()) {
+			char c = _text.charAt(_pos);
+			if ((c >= '0' && c <= '9') || c == '-' || c == '+') {
+			}
+			else if (c == '.' || c == 'e' || c == 'E') {
+				integral = false;
+			}
+			else {
+				break;
+			}
+			_pos++;
+		}
+		String number = _text.substring(start, _pos);
+		try {
+			if (integral) {
+				return Long.valueOf(number);
+			}
+			else {
+				return Double.valueOf(number);
+			}
+		}
+		catch (NumberFormatException e) {
+			throw _error("invalid number");
+		}
+	}
+
+	private Object _value() {
+		char c = _peek();
+		if (c == '{') {
+			Map<String, Object> ret = new LinkedHashMap<String, Object>();
+			_pos++;
+			if (_peek() == '}') {
+				_pos++;
+			}
+			else {
+				while (true) {
+					String key = _string();
+					_expect(':');
+					ret.put(key, _value());
+					if (_peek() == ',') {
+						_pos++;
+					}
+					else {
+						_expect('}');
+						break;
+					}
+				}
+			}
+			return ret;
+		}
+		else if (c == '[') {
+			List<Object> ret = new LinkedList<Object>();
+			_pos++;
+			if (_peek() == ']') {
+				_pos++;
+			}
+			else {
+				while (true) {
+					ret.add(_value());
+					if (_peek() == ',') {
+						_pos++;
+					}
+					else {
+						_expect(']');
+						break;
+					}
+				}
+			}
+			return ret;
+		}
+		else if (c == '"') {
+			return _string();
+		}
+		else if (_literal("true")) {
+			return Boolean.TRUE;
+		}
+		else if (_literal("false")) {
+			return Boolean.FALSE;
+		}
+		else if (_literal("null")) {
+			return null;
+		}
+		else {
+			return _number();
+		}
+	}
+
+	/**
+	 * Decode JSON text.
+	 * @param text JSON text.
+	 * @return decoded value.
+	 */
+	public static Object decode(String text) {
+		JsonCodec codec = new JsonCodec(text);
+		Object ret = codec._value();
+		codec._skipWhitespace();
+		if (codec._pos != text.length()) {
+			throw codec._error("trailing data");
+		}
+		return ret;
+	}
+
+	private static void _encodeString(StringBuilder out, String s) {
+		out.append('"');
+		for (int i = 0; i < s.length(); i++) {
+			char c = s.charAt(i);
+			if (c == '"' || c == '\\') {
+				out.append('\\').append(c);
+			}
+			else if (c == '\n') {
+				out.append("\\n");
+			}
+			else if (c == '\r') {
+				out.append("\\r");
+			}
+			else if (c == '\t') {
+				out.append("\\t");
+			}
+			else if (c < 0x20 || c > 0x7e) {
+				out.append(String.format("\\u%04x", (int)c));
+			}
+			else {
+				out.append(c);
+			}
+		}
+		out.append('"');
+	}
+
+	@SuppressWarnings("unchecked")
+	private static void _encode(StringBuilder out, Object o) {
+		if (o == null) {
+			out.append("null");
+		}
+		else if (o instanceof String) {
+			_encodeString(out, (String)o);
+		}
+		else if (o instanceof Boolean || o instanceof Number) {
+			out.append(o.toString());
+		}
+		else if (o instanceof Map) {
+			boolean first = true;
+			out.append('{');
+			for (Map.Entry<String, Object> entry : ((Map<String, Object>)o).entrySet()) {
+				if (!first) {
+					out.append(", ");
+				}
+				first = false;
+				_encodeString(out, entry.getKey());
+				out.append(": ");
+				_encode(out, entry.getValue());
+			}
+			out.append('}');
+		}
+		else if (o instanceof Object[] || o instanceof List) {
+			boolean first = true;
+			out.append('[');
+			for (
+				Object e :
+				o instanceof List ? (List<Object>)o : Arrays.asList((Object[])o)
+			) {
+				if (!first) {
+					out.append(", ");
+				}
+				first = false;
+				_encode(out, e);
+			}
+			out.append(']');
+		}
+		else {
+			throw new IllegalArgumentException(
+				String.format(
+					"Cannot encode %s",
+					o.getClass().getName()
+				)
+			);
+		}
+	}
+
+	/**
+	 * Encode value as ASCII JSON text.
+	 * @param o value, null, String, Boolean, Number, Map, List or array.
+	 * @return JSON text.
+	 */
+	public static String encode(Object o) {
+		StringBuilder out = new StringBuilder();
+		_encode(out, o);
+		return out.toString();
+	}
+}
@@ -0,0 +1,291 @@
+/*
+ * otopi -- plugable installer
+ * Copyright (C) 2012-2013 Red Hat, Inc.
+ *
+ * This library is free software; you can redistribute it and/or
+ * modify it under the terms of the GNU Lesser General Public
+ * License as published by the Free Software Foundation; either
+ * version 2.1 of the License, or (at your option) any later version.
+ *
+ * This library is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * Lesser General Public License for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public
+ * License along with this library; if not, write to the Free Software
+ * Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+ */
+package org.ovirt.otopi.dialog;
+
+import java.nio.ByteBuffer;
+import java.nio.CharBuffer;
+import java.nio.charset.Charset;
+import java.nio.charset.CharsetDecoder;
+import java.nio.charset.CodingErrorAction;
+import java.util.LinkedList;
+import java.util.List;
+import java.util.Map;
+
+import org.apache.commons.logging.Log;
+import org.apache.commons.logging.LogFactory;
+
+import org.ovirt.otopi.dialog.constants.DialogMachineConst;
+import org.ovirt.otopi.dialog.constants.DialogMachineV2Const;
+
+/**
+ * Non blocking machine dialog decoder.
+ *
+ * Input is decoded incrementally as it becomes available, so a
+ * single thread may serve many sessions using a selector.
+ * Responses and commands are encoded into buffers to be written
+ * by the caller.
+ *
+ * Multi-string displays are delivered as a single event once
+ * complete.
+ *
+ * Please refer to README.dialog.
+ */
+public class MachineDialogDecoder {
+
+	private static final int BUFFER_SIZE = 1024;
+
+	private static final Log log = LogFactory.getLog(MachineDialogDecoder.class);
+
+	private static final Charset UTF8 = Charset.forName("UTF-8");
+
+	private static final String PROTOCOL_REQUEST = (
+		DialogMachineConst.REQUEST_PREFIX +
+		DialogMachineConst.PROTOCOL +
+		" "
+	);
+
+	private final CharsetDecoder _decoder = UTF8.newDecoder().onMalformedInput(
+		CodingErrorAction.REPLACE
+	).onUnmappableCharacter(
+		CodingErrorAction.REPLACE
+	);
+	private byte _buffer[] = new byte[BUFFER_SIZE];
+	private ByteBuffer _bytes = ByteBuffer.wrap(_buffer);
+	private CharBuffer _chars = CharBuffer.allocate(BUFFER_SIZE);
+	private int _size = 0;
+	private int _frameSize = -1;
+	private int _version = 1;
+	private Event.DisplayMultiString _multiString;
+	private List<String> _multiStringLines;
+	private LinkedList<Event.Base> _events = new LinkedList<Event.Base>();
+
+	private void _reserve(int size) {
+		if (size > _buffer.length) {
+			byte buffer[] = new byte[Math.max(size, _buffer.length * 2)];
+			System.arraycopy(_buffer, 0, buffer, 0, _size);
+			_buffer = buffer;
+			_bytes = ByteBuffer.wrap(_buffer);
+		}
+	}
+
+	private String _string(int size) {
+		if (_chars.capacity() < size) {
+			_chars = CharBuffer.allocate(Math.max(size, _chars.capacity() * 2));
+		}
+		_bytes.clear();
+		_bytes.limit(size);
+		_chars.clear();
+		_decoder.reset();
+		_decoder.decode(_bytes, _chars, true);
+		_decoder.flush(_chars);
+		_chars.flip();
+		return _chars.toString();
+	}
+
+	private void _startMultiString(Event.DisplayMultiString event) {
+		log.debug("in-request reading multi-string");
+		_multiString = event;
+		_multiStringLines = new LinkedList<String>();
+	}
+
+	private void _endMultiString() {
+		_multiString.value = _multiStringLines.toArray(new String[0]);
+		_events.add(_multiString);
+		_multiString = null;
+		_multiStringLines = null;
+	}
+
+	private void _processLine(String line) {
+		if (log.isDebugEnabled()) {
+			log.debug(String.format("Got: %1$s", line));
+		}
+
+		if (_multiString != null) {
+			if (_multiString.boundary.equals(line)) {
+				_endMultiString();
+			}
+			else {
+				_multiStringLines.add(line);
+			}
+		}
+		else if (line.startsWith(DialogMachineConst.NOTE_PREFIX)) {
+		}
+		else if (line.startsWith(PROTOCOL_REQUEST)) {
+			int version = Integer.parseInt(
+				line.substring(PROTOCOL_REQUEST.length())
+			);
+			if (version != DialogMachineV2Const.VERSION) {
+				throw new RuntimeException(
+					String.format("Unsupported protocol version %1$d", version)
+				);
+			}
+			_version = version;
+		}
+		else if (line.startsWith(DialogMachineConst.REQUEST_PREFIX)) {
+			Event.Base bevent = MachineDialogParser.parseRequest(
+				line.substring(DialogMachineConst.REQUEST_PREFIX.length())
+			);
+			if (bevent instanceof Event.DisplayMultiString) {
+				_startMultiString((Event.DisplayMultiString)bevent);
+			}
+			else {
+				_events.add(bevent);
+			}
+		}
+		else {
+			throw new RuntimeException("Invalid data recieved during bootstrap");
+		}
+	}
+
+	private void _processHeader(String header) {
+		try {
+			_frameSize = Integer.parseInt(header);
+		}
+		catch (NumberFormatException e) {
+			_frameSize = -1;
+		}
+		if (_frameSize < 0) {
+			throw new RuntimeException(
+				String.format("Invalid frame header '%1$s'", header)
+			);
+		}
+	}
+
+	private void _processFrame(String payload) {
+		Map<String, Object> frame = MachineDialogParser.decodeFrame(payload);
+		Event.Base bevent = MachineDialogParser.parseFrame(frame);
+
+		if (_multiString != null) {
+			if (
+				!(bevent instanceof Event.DisplayMultiString) ||
+				!_multiString.name.equals(((Event.DisplayMultiString)bevent).name)
+			) {
+				throw new RuntimeException("Invalid multi-string frame");
+			}
+		}
+		else if (bevent instanceof Event.DisplayMultiString) {
+			_startMultiString((Event.DisplayMultiString)bevent);
+		}
+		else if (bevent != null) {
+			_events.add(bevent);
+		}
+
+		if (_multiString != null) {
+			for (String s : ((Event.DisplayMultiString)bevent).value) {
+				_multiStringLines.add(s);
+			}
+			if (!Boolean.TRUE.equals(frame.get("more"))) {
+				_endMultiString();
+			}
+		}
+	}
+
+	/**
+	 * Decode input.
+	 * All remaining bytes of input are consumed, incomplete lines
+	 * and frames are kept until next call.
+	 * @param in input.
+	 */
+	public void decode(ByteBuffer in) {
+		try {
+			while (in.hasRemaining()) {
+				if (_frameSize == -1) {
+					byte b = in.get();
+					if (b == '\n') {
+						String line = _string(_size);
+						_size = 0;
+						if (_version != 1) {
+							_processHeader(line);
+						}
+						else {
+							_processLine(line);
+						}
+					}
+					else {
+						_reserve(_size + 1);
+						_buffer[_size++] = b;
+					}
+				}
+				else {
+					int n = Math.min(in.remaining(), _frameSize + 1 - _size);
+					_reserve(_size + n);
+					in.get(_buffer, _size, n);
+					_size += n;
+					if (_size == _frameSize + 1) {
+						if (_buffer[_frameSize] != '\n') {
+							throw new RuntimeException("Invalid frame");
+						}
+						String payload = _string(_frameSize);
+						_size = 0;
+						_frameSize = -1;
+						_processFrame(payload);
+					}
+				}
+			}
+		}
+		catch (RuntimeException e) {
+			log.error("Cannot parse input", e);
+			throw e;
+		}
+	}
+
+	/**
+	 * Get next decoded event.
+	 * @return next event, null if no complete event is available.
+	 */
+	public Event.Base nextEvent() {
+		Event.Base bevent = _events.poll();
+		if (bevent != null && log.isDebugEnabled()) {
+			log.debug(
+				String.format(
+					"nextEvent: %s",
+					bevent
+				)
+			);
+		}
+		return bevent;
+	}
+
+	/**
+	 * Get protocol version in use.
+	 * @return protocol version.
+	 */
+	public int getVersion() {
+		return _version;
+	}
+
+	/**
+	 * Encode command.
+	 * @param command command.
+	 * @return buffer to send.
+	 */
+	public ByteBuffer encodeCommand(String command) {
+		return UTF8.encode(MachineDialogParser.formatCommand(_version, command));
+	}
+
+	/**
+	 * Encode response of an event.
+	 * @param bevent event that holds the response.
+	 * @return buffer to send, null if no response required.
+	 */
+	public ByteBuffer encodeResponse(Event.Base bevent) {
+		String response = MachineDialogParser.formatResponse(_version, bevent);
+		return response == null ? null : UTF8.encode(response);
+	}
+}
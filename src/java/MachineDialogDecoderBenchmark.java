@@ -0,0 +1,102 @@
+/*
+ * otopi -- plugable installer
+ * Copyright (C) 2012-2013 Red Hat, Inc.
+ *
+ * This library is free software; you can redistribute it and/or
+ * modify it under the terms of the GNU Lesser General Public
+ * License as published by the Free Software Foundation; either
+ * version 2.1 of the License, or (at your option) any later version.
+ *
+ * This library is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * Lesser General Public License for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public
+ * License along with this library; if not, write to the Free Software
+ * Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+ */
+package org.ovirt.otopi.dialog;
+
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.nio.ByteBuffer;
+
+/**
+ * Decoder versus parser benchmark.
+ *
+ * Not part of the unit tests, run explicitly:
+ * java -cp target/classes:target/test-classes:commons-logging.jar \
+ *     org.ovirt.otopi.dialog.MachineDialogDecoderBenchmark [iterations]
+ */
+public class MachineDialogDecoderBenchmark {
+
+	private static final int ITERATIONS = 2000;
+	private static final int CHUNK = 4096;
+	private static final String PROTOCOL_2 = "***PROTOCOL 2\n";
+
+	private static int parse(byte data[], int count) throws Exception {
+		MachineDialogParser parser = new MachineDialogParser();
+		parser.setStreams(
+			new ByteArrayInputStream(data),
+			new ByteArrayOutputStream()
+		);
+		for (int i = 0; i < count; i++) {
+			parser.nextEvent();
+		}
+		return count;
+	}
+
+	private static int decode(byte data[], int chunk) {
+		MachineDialogDecoder decoder = new MachineDialogDecoder();
+		int count = 0;
+		for (int i = 0; i < data.length; i += chunk) {
+			decoder.decode(
+				ByteBuffer.wrap(data, i, Math.min(chunk, data.length - i))
+			);
+			while (decoder.nextEvent() != null) {
+				count++;
+			}
+		}
+		return count;
+	}
+
+	public static void main(String args[]) throws Exception {
+		int iterations = args.length > 0 ? Integer.parseInt(args[0]) : ITERATIONS;
+
+		for (String incoming : new String[] {
+			MachineDialogParserTest.COVERAGE_INCOMING,
+			MachineDialogParserTest.V2_INCOMING,
+		}) {
+			String prefix = "";
+			int i = incoming.indexOf(PROTOCOL_2);
+			if (i != -1) {
+				prefix = incoming.substring(0, i + PROTOCOL_2.length());
+				incoming = incoming.substring(prefix.length());
+			}
+			StringBuilder sb = new StringBuilder(prefix);
+			for (int n = 0; n < iterations; n++) {
+				sb.append(incoming);
+			}
+			byte data[] = sb.toString().getBytes("UTF-8");
+
+			long start = System.nanoTime();
+			int count = decode(data, CHUNK);
+			long decoderTime = System.nanoTime() - start;
+
+			start = System.nanoTime();
+			parse(data, count);
+			long parserTime = System.nanoTime() - start;
+
+			System.out.println(
+				String.format(
+					"%1$s: %2$d events, parser %3$dms, decoder %4$dms",
+					prefix.length() == 0 ? "v1" : "v2",
+					count,
+					parserTime / 1000000,
+					decoderTime / 1000000
+				)
+			);
+		}
+	}
+}
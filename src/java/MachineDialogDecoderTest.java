@@ -0,0 +1,199 @@
+/*
+ * otopi -- plugable installer
+ * Copyright (C) 2012-2013 Red Hat, Inc.
+ *
+ * This library is free software; you can redistribute it and/or
+ * modify it under the terms of the GNU Lesser General Public
+ * License as published by the Free Software Foundation; either
+ * version 2.1 of the License, or (at your option) any later version.
+ *
+ * This library is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * Lesser General Public License for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public
+ * License along with this library; if not, write to the Free Software
+ * Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+ */
+package org.ovirt.otopi.dialog;
+
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.nio.ByteBuffer;
+import java.util.LinkedList;
+import java.util.List;
+
+import static org.junit.Assert.assertArrayEquals;
+import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertNull;
+import static org.junit.Assert.assertTrue;
+import org.junit.Test;
+
+public class MachineDialogDecoderTest {
+
+	private List<String> parse(byte data[], int count) throws Exception {
+		MachineDialogParser parser = new MachineDialogParser();
+		parser.setStreams(
+			new ByteArrayInputStream(data),
+			new ByteArrayOutputStream()
+		);
+		List<String> events = new LinkedList<String>();
+		for (int i = 0; i < count; i++) {
+			events.add(parser.nextEvent().toString());
+		}
+		return events;
+	}
+
+	private List<String> decode(MachineDialogDecoder decoder, byte data[], int chunk) {
+		List<String> events = new LinkedList<String>();
+		for (int i = 0; i < data.length; i += chunk) {
+			decoder.decode(
+				ByteBuffer.wrap(data, i, Math.min(chunk, data.length - i))
+			);
+			Event.Base bevent;
+			while ((bevent = decoder.nextEvent()) != null) {
+				events.add(bevent.toString());
+			}
+		}
+		return events;
+	}
+
+	private void compare(String incoming) throws Exception {
+		byte data[] = incoming.getBytes("UTF-8");
+		for (int chunk : new int[] {1, 7, data.length}) {
+			List<String> events = decode(new MachineDialogDecoder(), data, chunk);
+			assertEquals(parse(data, events.size()), events);
+		}
+	}
+
+	@Test
+	public void testCoverage() throws Exception {
+		compare(MachineDialogParserTest.COVERAGE_INCOMING);
+	}
+
+	@Test
+	public void testV2() throws Exception {
+		compare(MachineDialogParserTest.V2_INCOMING);
+
+		MachineDialogDecoder decoder = new MachineDialogDecoder();
+		decoder.decode(
+			ByteBuffer.wrap(MachineDialogParserTest.V2_INCOMING.getBytes("UTF-8"))
+		);
+		assertEquals(2, decoder.getVersion());
+
+		Event.Base bevent;
+
+		bevent = decoder.nextEvent();
+		assertTrue(bevent instanceof Event.Log);
+		assertEquals(1, bevent.id);
+
+		bevent = decoder.nextEvent();
+		assertTrue(bevent instanceof Event.QueryString);
+		assertEquals(2, bevent.id);
+
+		bevent = decoder.nextEvent();
+		assertTrue(bevent instanceof Event.DisplayValue);
+		assertEquals(new Integer(5), ((Event.DisplayValue)bevent).value);
+
+		bevent = decoder.nextEvent();
+		assertTrue(bevent instanceof Event.QueryString);
+
+		bevent = decoder.nextEvent();
+		assertTrue(bevent instanceof Event.DisplayMultiString);
+		assertEquals(5, bevent.id);
+		assertArrayEquals(
+			new String[] {"line 1", "line \u00e9"},
+			((Event.DisplayMultiString)bevent).value
+		);
+
+		bevent = decoder.nextEvent();
+		assertTrue(bevent instanceof Event.QueryValue);
+		Event.QueryValue queryvalueevent = (Event.QueryValue)bevent;
+		queryvalueevent.value = "a\"b\n\u00e9";
+		assertEquals(
+			MachineDialogParserTest.frame(
+				"{\"type\": \"response\", \"id\": 7, \"name\": \"key3\", \"value\": \"a\\\"b\\n\\u00e9\"}"
+			),
+			new String(toBytes(decoder.encodeResponse(queryvalueevent)), "UTF-8")
+		);
+		assertEquals(
+			MachineDialogParserTest.frame("{\"type\": \"response\", \"value\": \"noop\"}"),
+			new String(toBytes(decoder.encodeCommand("noop")), "UTF-8")
+		);
+	}
+
+	@Test
+	public void testPartial() throws Exception {
+		MachineDialogDecoder decoder = new MachineDialogDecoder();
+
+		decoder.decode(ByteBuffer.wrap("***Q:STRING na".getBytes("UTF-8")));
+		assertNull(decoder.nextEvent());
+		decoder.decode(ByteBuffer.wrap("me\n***D:MULTI-STRING m b\nline \u00e9".getBytes("UTF-8")));
+
+		Event.Base bevent = decoder.nextEvent();
+		assertTrue(bevent instanceof Event.QueryString);
+		assertEquals("name", ((Event.QueryString)bevent).name);
+		assertNull(decoder.nextEvent());
+
+		decoder.decode(ByteBuffer.wrap("\nb\n".getBytes("UTF-8")));
+		bevent = decoder.nextEvent();
+		assertTrue(bevent instanceof Event.DisplayMultiString);
+		assertArrayEquals(
+			new String[] {"line \u00e9"},
+			((Event.DisplayMultiString)bevent).value
+		);
+		assertNull(decoder.nextEvent());
+	}
+
+	@Test
+	public void testLogStream() throws Exception {
+		MachineDialogDecoder decoder = new MachineDialogDecoder();
+		decoder.decode(
+			ByteBuffer.wrap(
+				"***LOG-STREAM eJxLVDDkSlI4vBIACV8Cqw==\n".getBytes("UTF-8")
+			)
+		);
+		Event.Base bevent = decoder.nextEvent();
+		assertTrue(bevent instanceof Event.LogStream);
+		assertArrayEquals(
+			new String[] {"a 1", "b \u00e9"},
+			((Event.LogStream)bevent).records
+		);
+	}
+
+	@Test
+	public void testEncode() throws Exception {
+		MachineDialogDecoder decoder = new MachineDialogDecoder();
+		Event.Confirm event = new Event.Confirm();
+		event.what = "c1";
+		event.reply = true;
+		assertEquals(
+			"CONFIRM c1=yes\n",
+			new String(toBytes(decoder.encodeResponse(event)), "UTF-8")
+		);
+		assertEquals(
+			"noop\n",
+			new String(toBytes(decoder.encodeCommand("noop")), "UTF-8")
+		);
+		assertNull(decoder.encodeResponse(new Event.Terminate()));
+	}
+
+	@Test(expected=RuntimeException.class)
+	public void testInvalidToken() throws Exception {
+		new MachineDialogDecoder().decode(ByteBuffer.wrap("XXX\n".getBytes("UTF-8")));
+	}
+
+	@Test(expected=RuntimeException.class)
+	public void testInvalidFrame() throws Exception {
+		new MachineDialogDecoder().decode(
+			ByteBuffer.wrap("***PROTOCOL 2\n3\n{}xx".getBytes("UTF-8"))
+		);
+	}
+
+	private static byte[] toBytes(ByteBuffer buffer) {
+		byte ret[] = new byte[buffer.remaining()];
+		buffer.get(ret);
+		return ret;
+	}
+}
@@ -19,27 +19,36 @@
 package org.ovirt.otopi.dialog;
 
 import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
 import java.io.IOException;
 import java.io.InputStream;
 import java.io.InputStreamReader;
 import java.io.OutputStream;
 import java.io.OutputStreamWriter;
 import java.io.PrintWriter;
+import java.io.UnsupportedEncodingException;
 import java.nio.charset.Charset;
 import java.util.HashMap;
+import java.util.LinkedHashMap;
 import java.util.LinkedList;
 import java.util.List;
 import java.util.Map;
+import java.util.zip.DataFormatException;
+import java.util.zip.Inflater;
 
 import org.apache.commons.logging.Log;
 import org.apache.commons.logging.LogFactory;
 
 import org.ovirt.otopi.dialog.constants.DialogMachineConst;
+import org.ovirt.otopi.dialog.constants.DialogMachineV2Const;
 import org.ovirt.otopi.constants.Types;
 
 /**
  * Machine dialog parser.
  *
+ * Version 2 is used once announced by the remote, the remote
+ * is requested for version 2 using DIALOG/machineVersion.
+ *
  * Please refer to README.dialog.
  */
 public class MachineDialogParser {
@@ -60,79 +69,131 @@ public class MachineDialogParser {
 
 	private BufferedReader _incoming;
 	private PrintWriter _outgoing;
+	private int _version = 1;
+	private LinkedList<Event.Base> _pending = new LinkedList<Event.Base>();
 
-	private Event.Base _parseRequest(String request, OutputStream out) throws Exception {
-		Event.Base bevent = null;
+	private Map<String, Object> _readFrame(String header) throws IOException {
+		int size;
+		try {
+			size = Integer.parseInt(header);
+		}
+		catch (NumberFormatException e) {
+			throw new RuntimeException(
+				String.format("Invalid frame header '%1$s'", header)
+			);
+		}
+		char buffer[] = new char[size + 1];
+		int n = 0;
+		while (n < buffer.length) {
+			int r = _incoming.read(buffer, n, buffer.length - n);
+			if (r == -1) {
+				throw new IOException("Unexpected connection termination");
+			}
+			n += r;
+		}
+		if (buffer[size] != '\n') {
+			throw new RuntimeException("Invalid frame");
+		}
+		return decodeFrame(new String(buffer, 0, size));
+	}
 
-		if (request.startsWith(DialogMachineConst.LOG_PREFIX)) {
-			Event.Log event;
-			bevent = event = new Event.Log();
-			String s[] = request.split(" ", 2);
-			event.severity = LOG_SEVERITIES.get(s[0]);
-			event.record = s[1];
+	private void _write(String s) {
+		if (s != null) {
+			_outgoing.print(s);
+			_outgoing.flush();
 		}
-		else if (request.startsWith(DialogMachineConst.QUERY_STRING + " ")) {
-			Event.QueryString event;
-			bevent = event = new Event.QueryString();
-			String s[] = request.split(" ", 2);
-			event.name = s[1];
+	}
+
+	private void _sendCommand(String command) {
+		_write(formatCommand(_version, command));
+	}
+
+	/**
+	 * Decode version 2 frame payload.
+	 * @param payload frame payload.
+	 * @return frame.
+	 */
+	@SuppressWarnings("unchecked")
+	static Map<String, Object> decodeFrame(String payload) {
+		log.debug(String.format("Got frame: %1$s", payload));
+		Object frame = JsonCodec.decode(payload);
+		if (!(frame instanceof Map)) {
+			throw new RuntimeException("Invalid frame");
 		}
-		else if (request.startsWith(DialogMachineConst.QUERY_MULTI_STRING + " ")) {
-			Event.QueryMultiString event;
-			bevent = event = new Event.QueryMultiString();
-			String s[] = request.split(" ", 4);
-			event.name = s[1];
-			event.boundary = s[2];
-			event.abortboundary = s[3];
+		return (Map<String, Object>)frame;
+	}
+
+	/**
+	 * Encode version 2 frame.
+	 * @param frame frame.
+	 * @return frame header and payload.
+	 */
+	static String encodeFrame(Map<String, Object> frame) {
+		String payload = JsonCodec.encode(frame);
+		return String.format("%d\n%s\n", payload.length(), payload);
+	}
+
+	/**
+	 * Format command.
+	 * @param version protocol version.
+	 * @param command command.
+	 * @return command as sent.
+	 */
+	static String formatCommand(int version, String command) {
+		if (version == 1) {
+			return String.format("%s\n", command);
 		}
-		else if (request.startsWith(DialogMachineConst.QUERY_VALUE + " ")) {
-			Event.QueryValue event;
-			bevent = event = new Event.QueryValue();
-			String s[] = request.split(" ", 2);
-			event.name = s[1];
+		else {
+			Map<String, Object> response = new LinkedHashMap<String, Object>();
+			response.put("type", DialogMachineV2Const.TYPE_RESPONSE);
+			response.put("value", command);
+			return encodeFrame(response);
 		}
-		else if (request.startsWith(DialogMachineConst.DISPLAY_VALUE + " ")) {
-			Event.DisplayValue event;
-			bevent = event = new Event.DisplayValue();
-			String s[] = request.split(" ", 2);
-			String var[] = s[1].split("=", 2);
-			event.name = var[0];
-			String val[] = var[1].split(":", 2);
-			event.type = val[0];
-			String value = val[1];
-			if (Types.NONE.equals(event.type)) {
-				event.value = null;
-			}
-			else if (Types.BOOLEAN.equals(event.type)) {
+	}
+
+	private Event.Base _parseFrame(Map<String, Object> frame, OutputStream out) throws Exception {
+		Event.Base bevent = parseFrame(frame);
+
+		if (bevent instanceof Event.DisplayMultiString) {
+			Event.DisplayMultiString event = (Event.DisplayMultiString)bevent;
+			List<String> list = new LinkedList<String>();
+			while (true) {
+				for (String s : event.value) {
+					if (out != null) {
+						out.write((s + "\n").getBytes("UTF-8"));
+					}
+					else {
+						list.add(s);
+					}
+				}
+				if (!Boolean.TRUE.equals(frame.get("more"))) {
+					break;
+				}
+				String header = _incoming.readLine();
+				if (header == null) {
+					throw new IOException("Unexpected connection termination");
+				}
+				frame = _readFrame(header);
+				Event.Base next = parseFrame(frame);
 				if (
-					"FALSE".equals(value) ||
-					"False".equals(value) ||
-					"F".equals(value)
+					!(next instanceof Event.DisplayMultiString) ||
+					!event.name.equals(((Event.DisplayMultiString)next).name)
 				) {
-					event.value = new Boolean(false);
+					throw new RuntimeException("Invalid multi-string frame");
 				}
-				else {
-					event.value = new Boolean(true);
-				}
-			}
-			else if (Types.INTEGER.equals(event.type)) {
-				event.value = new Integer(value);
-			}
-			else if (Types.STRING.equals(event.type)) {
-				event.value = value;
-			}
-			else {
-				throw new SoftError(
-					String.format("Invalid variable type '%1$s'", event.type)
-				);
+				event.value = ((Event.DisplayMultiString)next).value;
 			}
+			event.value = list.toArray(new String[0]);
 		}
-		else if (request.startsWith(DialogMachineConst.DISPLAY_MULTI_STRING + " ")) {
-			Event.DisplayMultiString event;
-			bevent = event = new Event.DisplayMultiString();
-			String s[] = request.split(" ", 3);
-			event.name = s[1];
-			event.boundary = s[2];
+
+		return bevent;
+	}
+
+	private Event.Base _parseRequest(String request, OutputStream out) throws Exception {
+		Event.Base bevent = parseRequest(request);
+
+		if (bevent instanceof Event.DisplayMultiString) {
+			Event.DisplayMultiString event = (Event.DisplayMultiString)bevent;
 			log.debug("in-request reading multi-string");
 			List<String> list = new LinkedList<String>();
 			String l;
@@ -155,21 +216,275 @@ public class MachineDialogParser {
 			}
 			event.value = list.toArray(new String[0]);
 		}
+
+		return bevent;
+	}
+
+	/**
+	 * Parse typed value.
+	 * @param type value type.
+	 * @param value value string.
+	 * @return value (null, Boolean, Integer, String).
+	 */
+	static Object parseValue(String type, String value) {
+		Object ret;
+		if (Types.NONE.equals(type)) {
+			ret = null;
+		}
+		else if (Types.BOOLEAN.equals(type)) {
+			if (
+				"FALSE".equals(value) ||
+				"False".equals(value) ||
+				"F".equals(value)
+			) {
+				ret = new Boolean(false);
+			}
+			else {
+				ret = new Boolean(true);
+			}
+		}
+		else if (Types.INTEGER.equals(type)) {
+			ret = new Integer(value);
+		}
+		else if (Types.STRING.equals(type)) {
+			ret = value;
+		}
+		else {
+			throw new SoftError(
+				String.format("Invalid variable type '%1$s'", type)
+			);
+		}
+		return ret;
+	}
+
+	private static final String BASE64 = (
+		"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+	);
+
+	private static byte[] _base64Decode(String value) {
+		ByteArrayOutputStream out = new ByteArrayOutputStream(value.length() * 3 / 4);
+		int bits = 0;
+		int n = 0;
+		for (int i = 0; i < value.length(); i++) {
+			char c = value.charAt(i);
+			if (c == '=') {
+				break;
+			}
+			int v = BASE64.indexOf(c);
+			if (v == -1) {
+				throw new RuntimeException("Invalid log stream encoding");
+			}
+			bits = (bits << 6) | v;
+			n += 6;
+			if (n >= 8) {
+				n -= 8;
+				out.write((bits >> n) & 0xff);
+			}
+		}
+		return out.toByteArray();
+	}
+
+	/**
+	 * Decode log stream batch.
+	 * @param value base64 of zlib compressed records.
+	 * @return records.
+	 */
+	static String[] decodeLogStream(String value) {
+		Inflater inflater = new Inflater();
+		try {
+			inflater.setInput(_base64Decode(value));
+			ByteArrayOutputStream out = new ByteArrayOutputStream();
+			byte buffer[] = new byte[BUFFER_SIZE];
+			while (!inflater.finished()) {
+				int n = inflater.inflate(buffer);
+				if (n == 0 && (inflater.needsInput() || inflater.needsDictionary())) {
+					throw new RuntimeException("Truncated log stream");
+				}
+				out.write(buffer, 0, n);
+			}
+			return new String(out.toByteArray(), "UTF-8").split("\n", -1);
+		}
+		catch (DataFormatException e) {
+			throw new RuntimeException("Invalid log stream", e);
+		}
+		catch (UnsupportedEncodingException e) {
+			throw new RuntimeException(e);
+		}
+		finally {
+			inflater.end();
+		}
+	}
+
+	/**
+	 * Parse version 2 frame.
+	 * Multi-string display holds the lines of this frame only,
+	 * the 'more' member of frame indicates continuation.
+	 * @param frame frame.
+	 * @return event or null if frame is a note.
+	 */
+	static Event.Base parseFrame(Map<String, Object> frame) {
+		Event.Base bevent = null;
+		String type = (String)frame.get("type");
+
+		if (DialogMachineV2Const.TYPE_NOTE.equals(type)) {
+		}
+		else if (DialogMachineV2Const.TYPE_LOG.equals(type)) {
+			Event.Log event;
+			bevent = event = new Event.Log();
+			event.severity = Event.Log.Severity.valueOf((String)frame.get("severity"));
+			event.record = (String)frame.get("record");
+		}
+		else if (DialogMachineV2Const.TYPE_LOG_STREAM.equals(type)) {
+			Event.LogStream event;
+			bevent = event = new Event.LogStream();
+			event.records = decodeLogStream((String)frame.get("value"));
+		}
+		else if (DialogMachineV2Const.TYPE_QUERY_STRING.equals(type)) {
+			Event.QueryString event;
+			bevent = event = new Event.QueryString();
+			event.name = (String)frame.get("name");
+		}
+		else if (DialogMachineV2Const.TYPE_QUERY_MULTI_STRING.equals(type)) {
+			Event.QueryMultiString event;
+			bevent = event = new Event.QueryMultiString();
+			event.name = (String)frame.get("name");
+		}
+		else if (DialogMachineV2Const.TYPE_QUERY_VALUE.equals(type)) {
+			Event.QueryValue event;
+			bevent = event = new Event.QueryValue();
+			event.name = (String)frame.get("name");
+		}
+		else if (DialogMachineV2Const.TYPE_DISPLAY_VALUE.equals(type)) {
+			Event.DisplayValue event;
+			bevent = event = new Event.DisplayValue();
+			event.name = (String)frame.get("name");
+			event.type = (String)frame.get("valueType");
+			Object value = frame.get("value");
+			if (
+				Types.INTEGER.equals(event.type) &&
+				value instanceof Long &&
+				((Long)value).longValue() >= Integer.MIN_VALUE &&
+				((Long)value).longValue() <= Integer.MAX_VALUE
+			) {
+				value = new Integer(((Long)value).intValue());
+			}
+			event.value = value;
+		}
+		else if (DialogMachineV2Const.TYPE_DISPLAY_MULTI_STRING.equals(type)) {
+			Event.DisplayMultiString event;
+			bevent = event = new Event.DisplayMultiString();
+			event.name = (String)frame.get("name");
+			List<?> value = (List<?>)frame.get("value");
+			event.value = new String[value.size()];
+			int i = 0;
+			for (Object o : value) {
+				event.value[i++] = (String)o;
+			}
+		}
+		else if (DialogMachineV2Const.TYPE_CONFIRM.equals(type)) {
+			Event.Confirm event;
+			bevent = event = new Event.Confirm();
+			event.what = (String)frame.get("name");
+			event.description = (String)frame.get("description");
+		}
+		else if (DialogMachineV2Const.TYPE_TERMINATE.equals(type)) {
+			bevent = new Event.Terminate();
+		}
+		else {
+			throw new RuntimeException(
+				String.format(
+					"Unsupported frame type '%1$s'",
+					type
+				)
+			);
+		}
+
+		if (bevent != null && frame.get("id") instanceof Number) {
+			bevent.id = ((Number)frame.get("id")).longValue();
+		}
+
+		return bevent;
+	}
+
+	/**
+	 * Parse version 1 request.
+	 * Multi-string display is returned without value, the lines
+	 * up to the boundary follow the request.
+	 * @param request request without prefix.
+	 * @return event.
+	 */
+	static Event.Base parseRequest(String request) {
+		Event.Base bevent = null;
+
+		if (request.startsWith(DialogMachineConst.LOG_PREFIX)) {
+			Event.Log event;
+			bevent = event = new Event.Log();
+			int i = request.indexOf(' ');
+			event.severity = LOG_SEVERITIES.get(request.substring(0, i));
+			event.record = request.substring(i + 1);
+		}
+		else if (request.startsWith(DialogMachineConst.LOG_STREAM + " ")) {
+			Event.LogStream event;
+			bevent = event = new Event.LogStream();
+			event.records = decodeLogStream(
+				request.substring(DialogMachineConst.LOG_STREAM.length() + 1)
+			);
+		}
+		else if (request.startsWith(DialogMachineConst.QUERY_STRING + " ")) {
+			Event.QueryString event;
+			bevent = event = new Event.QueryString();
+			event.name = request.substring(DialogMachineConst.QUERY_STRING.length() + 1);
+		}
+		else if (request.startsWith(DialogMachineConst.QUERY_MULTI_STRING + " ")) {
+			Event.QueryMultiString event;
+			bevent = event = new Event.QueryMultiString();
+			int i = DialogMachineConst.QUERY_MULTI_STRING.length() + 1;
+			int j = request.indexOf(' ', i);
+			int k = request.indexOf(' ', j + 1);
+			event.name = request.substring(i, j);
+			event.boundary = request.substring(j + 1, k);
+			event.abortboundary = request.substring(k + 1);
+		}
+		else if (request.startsWith(DialogMachineConst.QUERY_VALUE + " ")) {
+			Event.QueryValue event;
+			bevent = event = new Event.QueryValue();
+			event.name = request.substring(DialogMachineConst.QUERY_VALUE.length() + 1);
+		}
+		else if (request.startsWith(DialogMachineConst.DISPLAY_VALUE + " ")) {
+			Event.DisplayValue event;
+			bevent = event = new Event.DisplayValue();
+			int i = DialogMachineConst.DISPLAY_VALUE.length() + 1;
+			int j = request.indexOf('=', i);
+			int k = request.indexOf(':', j + 1);
+			event.name = request.substring(i, j);
+			event.type = request.substring(j + 1, k);
+			event.value = parseValue(event.type, request.substring(k + 1));
+		}
+		else if (request.startsWith(DialogMachineConst.DISPLAY_MULTI_STRING + " ")) {
+			Event.DisplayMultiString event;
+			bevent = event = new Event.DisplayMultiString();
+			int i = DialogMachineConst.DISPLAY_MULTI_STRING.length() + 1;
+			int j = request.indexOf(' ', i);
+			event.name = request.substring(i, j);
+			event.boundary = request.substring(j + 1);
+		}
 		else if (request.startsWith(DialogMachineConst.CONFIRM + " ")) {
 			Event.Confirm event;
 			bevent = event = new Event.Confirm();
-			String s[] = request.split(" ", 3);
-			event.what = s[1];
-			event.description = s[2];
+			int i = DialogMachineConst.CONFIRM.length() + 1;
+			int j = request.indexOf(' ', i);
+			event.what = request.substring(i, j);
+			event.description = request.substring(j + 1);
 		}
 		else if (request.equals(DialogMachineConst.TERMINATE)) {
 			bevent = new Event.Terminate();
 		}
 		else {
+			int i = request.indexOf(' ');
 			throw new RuntimeException(
 				String.format(
 					"Unsupported command '%1$s'",
-					request.split(" ")[0]
+					i == -1 ? request : request.substring(0, i)
 				)
 			);
 		}
@@ -177,6 +492,73 @@ public class MachineDialogParser {
 		return bevent;
 	}
 
+	private static String _formatResponseV2(Event.Base bevent) {
+		Map<String, Object> response = new LinkedHashMap<String, Object>();
+		response.put("type", DialogMachineV2Const.TYPE_RESPONSE);
+		response.put("id", new Long(bevent.id));
+
+		if (bevent instanceof Event.QueryString) {
+			Event.QueryString event = (Event.QueryString)bevent;
+			if (event.value == null) {
+				throw new IllegalArgumentException("value cannot be null");
+			}
+			response.put("name", event.name);
+			response.put("value", event.value);
+		}
+		else if (bevent instanceof Event.QueryMultiString) {
+			Event.QueryMultiString event = (Event.QueryMultiString)bevent;
+			response.put("name", event.name);
+			if (event.abort) {
+				response.put("abort", Boolean.TRUE);
+			}
+			else {
+				if (event.value == null) {
+					throw new IllegalArgumentException("value cannot be null");
+				}
+				response.put("value", event.value);
+			}
+		}
+		else if (bevent instanceof Event.QueryValue) {
+			Event.QueryValue event = (Event.QueryValue)bevent;
+			response.put("name", event.name);
+			if (event.abort) {
+				response.put("abort", Boolean.TRUE);
+			}
+			else {
+				if (
+					event.value != null &&
+					!(event.value instanceof Boolean) &&
+					!(event.value instanceof Integer) &&
+					!(event.value instanceof String)
+				) {
+					throw new IllegalArgumentException(
+						String.format(
+							"Invalid type %s",
+							event.value.getClass().getName()
+						)
+					);
+				}
+				response.put("value", event.value);
+			}
+		}
+		else if (bevent instanceof Event.Confirm) {
+			Event.Confirm event = (Event.Confirm)bevent;
+			response.put("name", event.what);
+			if (event.abort) {
+				response.put("abort", Boolean.TRUE);
+			}
+			else {
+				response.put("value", Boolean.valueOf(event.reply));
+			}
+		}
+		else {
+			// no response required.
+			return null;
+		}
+
+		return encodeFrame(response);
+	}
+
 	/**
 	 * Set the dialog streams.
 	 * @param incoming incoming stream.
@@ -199,6 +581,14 @@ public class MachineDialogParser {
 		);
 	}
 
+	/**
+	 * Get protocol version in use.
+	 * @return protocol version.
+	 */
+	public int getVersion() {
+		return _version;
+	}
+
 	/**
 	 * env-get command.
 	 * @param name variable name.
@@ -209,12 +599,14 @@ public class MachineDialogParser {
 
 		log.debug(String.format("env-get %1$s", name));
 
-		_outgoing.printf(
-			"env-get -k %1$s\n",
-			name
+		_sendCommand(
+			String.format(
+				"env-get -k %1$s",
+				name
+			)
 		);
 
-		Event.Base bevent = nextEvent();
+		Event.Base bevent = _nextCliEvent(null);
 		if (bevent instanceof Event.DisplayValue) {
 			Event.DisplayValue event = (Event.DisplayValue)bevent;
 			value = event.value;
@@ -260,19 +652,23 @@ public class MachineDialogParser {
 		);
 
 		if (value instanceof String[]) {
-			_outgoing.printf(
-				"env-query-multi -k %1$s\n",
-				name
+			_sendCommand(
+				String.format(
+					"env-query-multi -k %1$s",
+					name
+				)
 			);
 		}
 		else {
-			_outgoing.printf(
-				"env-query -k %1$s\n",
-				name
+			_sendCommand(
+				String.format(
+					"env-query -k %1$s",
+					name
+				)
 			);
 		}
 
-		Event.Base bevent = nextEvent();
+		Event.Base bevent = _nextCliEvent(null);
 		if (bevent instanceof Event.QueryValue) {
 			Event.QueryValue event = (Event.QueryValue)bevent;
 			event.value = value;
@@ -293,13 +689,212 @@ public class MachineDialogParser {
 		}
 	}
 
+	private static String _bulkEscape(String s) {
+		StringBuilder ret = new StringBuilder(s.length());
+		for (int i = 0; i < s.length(); i++) {
+			char c = s.charAt(i);
+			switch (c) {
+				case '\\':
+					ret.append("\\\\");
+				break;
+				case '\n':
+					ret.append("\\n");
+				break;
+				case '\r':
+					ret.append("\\r");
+				break;
+				default:
+					ret.append(c);
+				break;
+			}
+		}
+		return ret.toString();
+	}
+
+	private static String _bulkUnescape(String s) {
+		StringBuilder ret = new StringBuilder(s.length());
+		for (int i = 0; i < s.length(); i++) {
+			char c = s.charAt(i);
+			if (c == '\\') {
+				i++;
+				if (i >= s.length()) {
+					throw new SoftError("Invalid escape sequence");
+				}
+				c = s.charAt(i);
+				switch (c) {
+					case '\\':
+					break;
+					case 'n':
+						c = '\n';
+					break;
+					case 'r':
+						c = '\r';
+					break;
+					default:
+						throw new SoftError("Invalid escape sequence");
+				}
+			}
+			ret.append(c);
+		}
+		return ret.toString();
+	}
+
+	private static String _bulkEncode(String name, Object value) {
+		String type;
+		String s;
+		if (value == null) {
+			type = Types.NONE;
+			s = "";
+		}
+		else if (value instanceof Boolean) {
+			type = Types.BOOLEAN;
+			s = ((Boolean)value).booleanValue() ? "True" : "False";
+		}
+		else if (value instanceof Integer) {
+			type = Types.INTEGER;
+			s = value.toString();
+		}
+		else if (value instanceof String) {
+			type = Types.STRING;
+			s = (String)value;
+		}
+		else if (value instanceof String[]) {
+			type = Types.MULTI_STRING;
+			StringBuilder sb = new StringBuilder();
+			for (String l : (String[])value) {
+				if (sb.length() > 0) {
+					sb.append('\n');
+				}
+				sb.append(l);
+			}
+			s = sb.toString();
+		}
+		else {
+			throw new IllegalArgumentException(
+				String.format(
+					"Invalid type %s",
+					value.getClass().getName()
+				)
+			);
+		}
+		return String.format(
+			"%1$s=%2$s:%3$s",
+			_bulkEscape(name),
+			type,
+			_bulkEscape(s)
+		);
+	}
+
+	private static void _bulkDecode(String line, Map<String, Object> values) {
+		String var[] = line.split("=", 2);
+		if (var.length != 2) {
+			throw new SoftError(String.format("Invalid entry '%1$s'", line));
+		}
+		String val[] = var[1].split(":", 2);
+		if (val.length != 2) {
+			throw new SoftError(String.format("Invalid entry '%1$s'", line));
+		}
+		String type = val[0];
+		String value = _bulkUnescape(val[1]);
+		Object ret;
+		if (Types.MULTI_STRING.equals(type)) {
+			ret = value.length() == 0 ? new String[0] : value.split("\n", -1);
+		}
+		else if (Types.OBJECT.equals(type)) {
+			ret = value;
+		}
+		else {
+			ret = parseValue(type, value);
+		}
+		values.put(_bulkUnescape(var[0]), ret);
+	}
+
+	/**
+	 * env-get-bulk command.
+	 * @param names variable names.
+	 * @return map of variable values (null, Boolean, Integer, String, String[]).
+	 */
+	public Map<String, Object> cliEnvironmentGetBulk(String[] names) throws IOException {
+		log.debug(String.format("env-get-bulk %1$d keys", names.length));
+
+		_sendCommand("env-get-bulk");
+
+		Event.Base bevent = _nextCliEvent(null);
+		if (bevent instanceof Event.QueryMultiString) {
+			Event.QueryMultiString event = (Event.QueryMultiString)bevent;
+			event.value = new String[names.length];
+			for (int i = 0; i < names.length; i++) {
+				event.value[i] = _bulkEscape(names[i]);
+			}
+			sendResponse(event);
+		}
+		else {
+			throw new SoftError(
+				String.format(
+					"Unexpected event %s",
+					bevent
+				)
+			);
+		}
+
+		bevent = _nextCliEvent(null);
+		if (bevent instanceof Event.DisplayMultiString) {
+			Map<String, Object> values = new LinkedHashMap<String, Object>();
+			for (String l : ((Event.DisplayMultiString)bevent).value) {
+				if (l.length() > 0) {
+					_bulkDecode(l, values);
+				}
+			}
+			return values;
+		}
+		else {
+			throw new SoftError(
+				String.format(
+					"Unexpected event %s",
+					bevent
+				)
+			);
+		}
+	}
+
+	/**
+	 * env-set-bulk command.
+	 * All values are applied at once, none is applied if any is invalid.
+	 * @param values map of variable values (null, Boolean, Integer, String, String[]).
+	 */
+	public void cliEnvironmentSetBulk(Map<String, Object> values) throws IOException {
+		log.debug(String.format("env-set-bulk %1$d keys", values.size()));
+
+		List<String> lines = new LinkedList<String>();
+		for (Map.Entry<String, Object> entry : values.entrySet()) {
+			lines.add(_bulkEncode(entry.getKey(), entry.getValue()));
+		}
+
+		_sendCommand("env-set-bulk");
+
+		Event.Base bevent = _nextCliEvent(null);
+		if (bevent instanceof Event.QueryMultiString) {
+			Event.QueryMultiString event = (Event.QueryMultiString)bevent;
+			event.value = lines.toArray(new String[lines.size()]);
+			sendResponse(event);
+		}
+		else {
+			throw new SoftError(
+				String.format(
+					"Unexpected event %s",
+					bevent
+				)
+			);
+		}
+	}
+
 	/**
 	 * log command.
 	 * @param out stream to write log into.
 	 */
 	public void cliDownloadLog(OutputStream out) throws IOException {
-		_outgoing.printf("log\n");
-		Event.Base bevent = nextEvent(out);
+		_sendCommand("log");
+		Event.Base bevent = _nextCliEvent(out);
 		if (bevent instanceof Event.DisplayMultiString) {
 		}
 		else {
@@ -312,40 +907,73 @@ public class MachineDialogParser {
 		}
 	}
 
+	/**
+	 * log command, ranged.
+	 * Only complete lines are retrieved, use the returned offset
+	 * in next call to follow the log.
+	 * @param out stream to write log into.
+	 * @param offset offset to start from.
+	 * @param size maximum size to retrieve.
+	 * @return next offset.
+	 */
+	public long cliDownloadLog(OutputStream out, long offset, long size) throws IOException {
+		_sendCommand(String.format("log --offset=%d --size=%d", offset, size));
+		Event.Base bevent = _nextCliEvent(out);
+		if (!(bevent instanceof Event.DisplayMultiString)) {
+			throw new SoftError(
+				String.format(
+					"Unexpected event %s",
+					bevent
+				)
+			);
+		}
+		bevent = _nextCliEvent(null);
+		if (
+			bevent instanceof Event.DisplayValue &&
+			"LOG_NEXT_OFFSET".equals(((Event.DisplayValue)bevent).name) &&
+			((Event.DisplayValue)bevent).value instanceof String
+		) {
+			return Long.parseLong((String)((Event.DisplayValue)bevent).value);
+		}
+		else {
+			throw new SoftError(
+				String.format(
+					"Unexpected event %s",
+					bevent
+				)
+			);
+		}
+	}
+
 	/**
 	 * noop command.
 	 */
 	public void cliNoop() throws IOException {
-		_outgoing.printf("noop\n");
+		_sendCommand("noop");
 	}
 
 	/**
 	 * quit command.
 	 */
 	public void cliQuit() throws IOException {
-		_outgoing.printf("quit\n");
+		_sendCommand("quit");
 	}
 
 	/**
 	 * install command.
 	 */
 	public void cliInstall() throws IOException {
-		_outgoing.printf("install\n");
+		_sendCommand("install");
 	}
 
 	/**
 	 * abort command.
 	 */
 	public void cliAbort() throws IOException {
-		_outgoing.printf("abort\n");
+		_sendCommand("abort");
 	}
 
-	/**
-	 * Get next event from stream.
-	 * @param out output stream for multistring display.
-	 * @return Next event in stream.
-	 */
-	public Event.Base nextEvent(OutputStream out) throws IOException, SoftError {
+	private Event.Base _nextEvent(OutputStream out) throws IOException, SoftError {
 		Event.Base bevent = null;
 		String line;
 
@@ -357,7 +985,33 @@ public class MachineDialogParser {
 			try{
 				log.debug(String.format("Got: %1$s", line));
 
-				if (line.startsWith(DialogMachineConst.NOTE_PREFIX)) {
+				if (_version != 1) {
+					bevent = _parseFrame(_readFrame(line), out);
+				}
+				else if (line.startsWith(DialogMachineConst.NOTE_PREFIX)) {
+				}
+				else if (
+					line.startsWith(
+						DialogMachineConst.REQUEST_PREFIX +
+						DialogMachineConst.PROTOCOL +
+						" "
+					)
+				) {
+					int version = Integer.parseInt(
+						line.substring(
+							(
+								DialogMachineConst.REQUEST_PREFIX +
+								DialogMachineConst.PROTOCOL +
+								" "
+							).length()
+						)
+					);
+					if (version != DialogMachineV2Const.VERSION) {
+						throw new RuntimeException(
+							String.format("Unsupported protocol version %1$d", version)
+						);
+					}
+					_version = version;
 				}
 				else if (line.startsWith(DialogMachineConst.REQUEST_PREFIX)) {
 					bevent = _parseRequest(
@@ -396,6 +1050,32 @@ public class MachineDialogParser {
 		return bevent;
 	}
 
+	/**
+	 * Get next event while waiting for a command result.
+	 * Log streams may arrive at any time, they are kept and
+	 * returned by next nextEvent() calls.
+	 */
+	private Event.Base _nextCliEvent(OutputStream out) throws IOException, SoftError {
+		Event.Base bevent;
+		while ((bevent = _nextEvent(out)) instanceof Event.LogStream) {
+			_pending.add(bevent);
+		}
+		return bevent;
+	}
+
+	/**
+	 * Get next event from stream.
+	 * @param out output stream for multistring display.
+	 * @return Next event in stream.
+	 */
+	public Event.Base nextEvent(OutputStream out) throws IOException, SoftError {
+		Event.Base bevent = _pending.poll();
+		if (bevent == null) {
+			bevent = _nextEvent(out);
+		}
+		return bevent;
+	}
+
 	/**
 	 * Get next event from stream.
 	 * @return Next event in stream.
@@ -409,7 +1089,22 @@ public class MachineDialogParser {
 	 * @param bevent event that holds the response.
 	 */
 	public void sendResponse(Event.Base bevent) {
-		if (bevent instanceof Event.QueryString) {
+		_write(formatResponse(_version, bevent));
+	}
+
+	/**
+	 * Format response of an event.
+	 * @param version protocol version.
+	 * @param bevent event that holds the response.
+	 * @return response as sent, null if no response required.
+	 */
+	static String formatResponse(int version, Event.Base bevent) {
+		StringBuilder ret = new StringBuilder();
+
+		if (version != 1) {
+			return _formatResponseV2(bevent);
+		}
+		else if (bevent instanceof Event.QueryString) {
 			Event.QueryString event = (Event.QueryString)bevent;
 			if (event.value == null) {
 				throw new IllegalArgumentException("value cannot be null");
@@ -417,21 +1112,21 @@ public class MachineDialogParser {
 			if (event.value.indexOf("\n") != -1) {
 				throw new IllegalArgumentException("value cannot contain new line");
 			}
-			_outgoing.println(event.value);
+			ret.append(event.value).append('\n');
 		}
 		else if (bevent instanceof Event.QueryMultiString) {
 			Event.QueryMultiString event = (Event.QueryMultiString)bevent;
 			if (event.abort) {
-				_outgoing.println(event.abortboundary);
+				ret.append(event.abortboundary).append('\n');
 			}
 			else {
 				if (event.value == null) {
 					throw new IllegalArgumentException("value cannot be null");
 				}
 				for (String s : event.value) {
-					_outgoing.println(s);
+					ret.append(s).append('\n');
 				}
-				_outgoing.println(event.boundary);
+				ret.append(event.boundary).append('\n');
 			}
 		}
 		else if (bevent instanceof Event.QueryValue) {
@@ -469,42 +1164,45 @@ public class MachineDialogParser {
 			}
 
 			if (event.abort) {
-				_outgoing.printf(
+				ret.append(String.format(
 					"%s %s\n",
 					DialogMachineConst.QUERY_VALUE_RESPONSE_ABORT,
 					event.name
-				);
+				));
 			}
 			else {
-				_outgoing.printf(
+				ret.append(String.format(
 					"%s %s=%s:%s\n",
 					DialogMachineConst.QUERY_VALUE_RESPONSE_VALUE,
 					event.name,
 					type,
 					event.value
-				);
+				));
 			}
 		}
 		else if (bevent instanceof Event.Confirm) {
 			Event.Confirm event = (Event.Confirm)bevent;
 			if (event.abort) {
-				_outgoing.printf(
+				ret.append(String.format(
 					"%s %s\n",
 					DialogMachineConst.CONFIRM_RESPONSE_ABORT,
 					event.what
-				);
+				));
 			}
 			else {
-				_outgoing.printf(
+				ret.append(String.format(
 					"%s %s=%s\n",
 					DialogMachineConst.CONFIRM_RESPONSE_VALUE,
 					event.what,
 					event.reply ? "yes" : "no"
-				);
+				));
 			}
 		}
 		else {
 			// no response required.
+			return null;
 		}
+
+		return ret.toString();
 	}
 }
@@ -22,14 +22,68 @@ import java.io.ByteArrayInputStream;
 import java.io.ByteArrayOutputStream;
 import java.io.OutputStream;
 import java.io.UnsupportedEncodingException;
+import java.util.LinkedHashMap;
+import java.util.Map;
 
 import static org.junit.Assert.assertArrayEquals;
 import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertNull;
 import static org.junit.Assert.assertTrue;
 import org.junit.Test;
 
 public class MachineDialogParserTest {
 
+	static final String COVERAGE_INCOMING = (
+		"#NOTE\n" +
+		"#NOTE\n" +
+		"***L:INFO log record\n" +
+		"***L:WARNING log record\n" +
+		"***L:ERROR log record\n" +
+		"***L:CRITICAL log record\n" +
+		"***L:FATAL log record\n" +
+		"#INFO\n" +
+		"***Q:STRING str1\n" +	// 1
+		"***Q:MULTI-STRING mstr0 boundary1 boundary2\n" + // 2
+		"***Q:MULTI-STRING mstr1 boundary1 boundary2\n" + // 3
+		"***Q:MULTI-STRING mstr2 boundary1 boundary2\n" + // 4
+		"***Q:VALUE value0\n" +	// 5
+		"***Q:VALUE value1\n" +	// 6
+		"***Q:VALUE value2\n" +	// 7
+		"***Q:VALUE value3\n" +	// 8
+		"***Q:VALUE value4\n" +	// 9
+		"***Q:VALUE value5\n" +	// 10
+		"***D:VALUE value10=none:NoneType\n" +
+		"***D:VALUE value11=bool:True\n" +
+		"***D:VALUE value12=bool:False\n" +
+		"***D:VALUE value13=int:52\n" +
+		"***D:VALUE value14=str:value 2\n" +
+		"***D:MULTI-STRING mstr3 boundary2\n" +
+		"line 1\n" +
+		"line 2\n" +
+		"boundary2\n" +
+		"***CONFIRM confirm0 description 0\n" +	// 11
+		"***CONFIRM confirm1 description 1\n" +	// 12
+		"***CONFIRM confirm2 description 1\n" +	// 13
+		"***TERMINATE\n" +
+		""
+	);
+
+	static final String V2_INCOMING = (
+		"# note before protocol\n" +
+		"***PROTOCOL 2\n" +
+		frame("{\"id\": 0, \"text\": \"hello\", \"type\": \"note\"}") +
+		frame("{\"id\": 1, \"record\": \"Stage: x\", \"severity\": \"INFO\", \"type\": \"log\"}") +
+		frame("{\"id\": 2, \"name\": \"prompt\", \"type\": \"query-string\"}") +
+		frame("{\"id\": 3, \"name\": \"key1\", \"type\": \"display-value\", \"value\": 5, \"valueType\": \"int\"}") +
+		frame("{\"id\": 4, \"name\": \"prompt\", \"type\": \"query-string\"}") +
+		frame("{\"id\": 5, \"more\": true, \"name\": \"key2\", \"type\": \"display-multi-string\", \"value\": [\"line 1\"]}") +
+		frame("{\"id\": 6, \"more\": false, \"name\": \"key2\", \"type\": \"display-multi-string\", \"value\": [\"line \\u00e9\"]}") +
+		frame("{\"id\": 7, \"name\": \"key3\", \"type\": \"query-value\"}") +
+		frame("{\"description\": \"desc\", \"id\": 8, \"name\": \"c1\", \"type\": \"confirm\"}") +
+		frame("{\"id\": 9, \"type\": \"terminate\"}") +
+		""
+	);
+
 	private MachineDialogParser getParser(String stream, OutputStream os) throws UnsupportedEncodingException {
 		MachineDialogParser parser = new MachineDialogParser();
 		parser.setStreams(
@@ -87,40 +141,7 @@ public class MachineDialogParserTest {
 
 	@Test
 	public void testCoverage() throws Exception {
-		String incoming = (
-			"#NOTE\n" +
-			"#NOTE\n" +
-			"***L:INFO log record\n" +
-			"***L:WARNING log record\n" +
-			"***L:ERROR log record\n" +
-			"***L:CRITICAL log record\n" +
-			"***L:FATAL log record\n" +
-			"#INFO\n" +
-			"***Q:STRING str1\n" +	// 1
-			"***Q:MULTI-STRING mstr0 boundary1 boundary2\n" + // 2
-			"***Q:MULTI-STRING mstr1 boundary1 boundary2\n" + // 3
-			"***Q:MULTI-STRING mstr2 boundary1 boundary2\n" + // 4
-			"***Q:VALUE value0\n" +	// 5
-			"***Q:VALUE value1\n" +	// 6
-			"***Q:VALUE value2\n" +	// 7
-			"***Q:VALUE value3\n" +	// 8
-			"***Q:VALUE value4\n" +	// 9
-			"***Q:VALUE value5\n" +	// 10
-			"***D:VALUE value10=none:NoneType\n" +
-			"***D:VALUE value11=bool:True\n" +
-			"***D:VALUE value12=bool:False\n" +
-			"***D:VALUE value13=int:52\n" +
-			"***D:VALUE value14=str:value 2\n" +
-			"***D:MULTI-STRING mstr3 boundary2\n" +
-			"line 1\n" +
-			"line 2\n" +
-			"boundary2\n" +
-			"***CONFIRM confirm0 description 0\n" +	// 11
-			"***CONFIRM confirm1 description 1\n" +	// 12
-			"***CONFIRM confirm2 description 1\n" +	// 13
-			"***TERMINATE\n" +
-			""
-		);
+		String incoming = COVERAGE_INCOMING;
 		String expected_outgoing = (
 			"value 1\n" +		// 1
 			"boundary2\n" +		// 2
@@ -351,6 +372,39 @@ public class MachineDialogParserTest {
 		assertEquals(expected_outgoing, new String(bos.toByteArray(), "UTF-8"));
 	}
 
+	@Test
+	public void testLogRange() throws Exception {
+		String incoming = (
+			"***Q:STRING prompt\n" +
+			"***D:MULTI-STRING LOG boundary1\n" +
+			"line 1\n" +
+			"line 2\n" +
+			"boundary1\n" +
+			"***D:VALUE LOG_NEXT_OFFSET=str:4294967310\n" +
+			"***TERMINATE\n" +
+			""
+		);
+		String expected_outgoing = (
+			"log --offset=4294967296 --size=100\n" +
+			""
+		);
+		ByteArrayOutputStream bos = new ByteArrayOutputStream();
+		MachineDialogParser parser = getParser(incoming, bos);
+
+		Event.Base bevent;
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.QueryString);
+		ByteArrayOutputStream log = new ByteArrayOutputStream();
+		assertEquals(4294967310L, parser.cliDownloadLog(log, 4294967296L, 100));
+		assertEquals("line 1\nline 2\n", new String(log.toByteArray(), "UTF-8"));
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.Terminate);
+
+		assertEquals(expected_outgoing, new String(bos.toByteArray(), "UTF-8"));
+	}
+
 	@Test
 	public void testEnvGet() throws Exception {
 		String incoming = (
@@ -492,6 +546,72 @@ public class MachineDialogParserTest {
 		parser.cliEnvironmentSet("key1", "test\nwith new line");
 	}
 
+	@Test
+	public void testEnvBulk() throws Exception {
+		String incoming = (
+			"***Q:STRING prompt\n" +
+			"***Q:MULTI-STRING ENV_SET_BULK boundary1 abort1\n" +
+			"***Q:STRING prompt\n" +
+			"***Q:MULTI-STRING ENV_GET_BULK boundary2 abort2\n" +
+			"***D:MULTI-STRING ENV_GET_BULK boundary3\n" +
+			"key1=none:\n" +
+			"key2=bool:False\n" +
+			"key3=int:5\n" +
+			"key\\\\4=str:a\\\\b\\rc\n" +
+			"key5=multi-str:line1\\nline2\n" +
+			"key6=multi-str:\n" +
+			"boundary3\n" +
+			"***TERMINATE\n" +
+			""
+		);
+		String expected_outgoing = (
+			"env-set-bulk\n" +
+			"key1=none:\n" +
+			"key2=bool:True\n" +
+			"key3=int:5\n" +
+			"key\\\\4=str:a\\\\b\\rc\n" +
+			"key5=multi-str:line1\\nline2\n" +
+			"boundary1\n" +
+			"env-get-bulk\n" +
+			"key1\n" +
+			"key\\\\4\n" +
+			"boundary2\n" +
+			""
+		);
+		ByteArrayOutputStream bos = new ByteArrayOutputStream();
+		MachineDialogParser parser = getParser(incoming, bos);
+
+		Event.Base bevent;
+
+		Map<String, Object> values = new LinkedHashMap<String, Object>();
+		values.put("key1", null);
+		values.put("key2", new Boolean(true));
+		values.put("key3", new Integer(5));
+		values.put("key\\4", "a\\b\rc");
+		values.put("key5", new String[] {"line1", "line2"});
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.QueryString);
+		parser.cliEnvironmentSetBulk(values);
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.QueryString);
+		values = parser.cliEnvironmentGetBulk(new String[] {"key1", "key\\4"});
+		assertEquals(6, values.size());
+		assertNull(values.get("key1"));
+		assertTrue(values.containsKey("key1"));
+		assertEquals(new Boolean(false), values.get("key2"));
+		assertEquals(new Integer(5), values.get("key3"));
+		assertEquals("a\\b\rc", values.get("key\\4"));
+		assertArrayEquals(new String[] {"line1", "line2"}, (String[])values.get("key5"));
+		assertArrayEquals(new String[0], (String[])values.get("key6"));
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.Terminate);
+
+		assertEquals(expected_outgoing, new String(bos.toByteArray(), "UTF-8"));
+	}
+
 	@Test
 	public void testMiscCLI() throws Exception {
 		String incoming = (
@@ -544,4 +664,149 @@ public class MachineDialogParserTest {
 
 		assertEquals(expected_outgoing, new String(bos.toByteArray(), "UTF-8"));
 	}
+
+	static String frame(String payload) {
+		return String.format("%d\n%s\n", payload.length(), payload);
+	}
+
+	@Test
+	public void testV2() throws Exception {
+		String incoming = V2_INCOMING;
+		String expected_outgoing = (
+			frame("{\"type\": \"response\", \"value\": \"env-get -k key1\"}") +
+			frame("{\"type\": \"response\", \"value\": \"env-get -k key2\"}") +
+			frame("{\"type\": \"response\", \"id\": 7, \"name\": \"key3\", \"value\": \"a\\\"b\\n\\u00e9\"}") +
+			frame("{\"type\": \"response\", \"id\": 8, \"name\": \"c1\", \"value\": true}") +
+			""
+		);
+		ByteArrayOutputStream bos = new ByteArrayOutputStream();
+		MachineDialogParser parser = getParser(incoming, bos);
+
+		Event.Base bevent;
+		Object value;
+
+		bevent = parser.nextEvent();
+		assertEquals(2, parser.getVersion());
+		assertTrue(bevent instanceof Event.Log);
+		assertEquals(Event.Log.Severity.INFO, ((Event.Log)bevent).severity);
+		assertEquals("Stage: x", ((Event.Log)bevent).record);
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.QueryString);
+		assertEquals("prompt", ((Event.QueryString)bevent).name);
+		assertEquals(2, bevent.id);
+		value = parser.cliEnvironmentGet("key1");
+		assertEquals(new Integer(5), value);
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.QueryString);
+		value = parser.cliEnvironmentGet("key2");
+		assertArrayEquals(new String [] {"line 1", "line \u00e9"}, (String[])value);
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.QueryValue);
+		Event.QueryValue queryvalueevent = (Event.QueryValue)bevent;
+		assertEquals("key3", queryvalueevent.name);
+		queryvalueevent.value = "a\"b\n\u00e9";
+		parser.sendResponse(queryvalueevent);
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.Confirm);
+		Event.Confirm confirmevent = (Event.Confirm)bevent;
+		assertEquals("c1", confirmevent.what);
+		assertEquals("desc", confirmevent.description);
+		confirmevent.reply = true;
+		parser.sendResponse(confirmevent);
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.Terminate);
+
+		assertEquals(expected_outgoing, new String(bos.toByteArray(), "UTF-8"));
+	}
+
+	@Test(expected=RuntimeException.class)
+	public void testV2InvalidFrame() throws Exception {
+		String incoming = (
+			"***PROTOCOL 2\n" +
+			"10\n" +
+			"{\"id\": 0}XX" +
+			""
+		);
+		ByteArrayOutputStream bos = new ByteArrayOutputStream();
+		MachineDialogParser parser = getParser(incoming, bos);
+		parser.nextEvent();
+	}
+
+	@Test
+	public void testLogStream() throws Exception {
+		String incoming = (
+			"***LOG-STREAM eJxLVDDkSlI4vBIACV8Cqw==\n" +
+			"***PROTOCOL 2\n" +
+			frame("{\"id\": 0, \"type\": \"log-stream\", \"value\": \"eJxLVDDkSlI4vBIACV8Cqw==\"}") +
+			""
+		);
+		MachineDialogParser parser = getParser(incoming, new ByteArrayOutputStream());
+
+		Event.Base bevent;
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.LogStream);
+		assertArrayEquals(
+			new String[] {"a 1", "b \u00e9"},
+			((Event.LogStream)bevent).records
+		);
+
+		bevent = parser.nextEvent();
+		assertEquals(2, parser.getVersion());
+		assertTrue(bevent instanceof Event.LogStream);
+		assertEquals(0, bevent.id);
+		assertArrayEquals(
+			new String[] {"a 1", "b \u00e9"},
+			((Event.LogStream)bevent).records
+		);
+	}
+
+	@Test
+	public void testLogStreamDuringCli() throws Exception {
+		String incoming = (
+			"***Q:STRING prompt\n" +
+			"***LOG-STREAM eJxLVDDkSlI4vBIACV8Cqw==\n" +
+			"***D:VALUE key1=int:5\n" +
+			"***Q:STRING prompt\n" +
+			""
+		);
+		MachineDialogParser parser = getParser(incoming, new ByteArrayOutputStream());
+
+		Event.Base bevent;
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.QueryString);
+		assertEquals(new Integer(5), parser.cliEnvironmentGet("key1"));
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.LogStream);
+
+		bevent = parser.nextEvent();
+		assertTrue(bevent instanceof Event.QueryString);
+	}
+
+	@Test(expected=RuntimeException.class)
+	public void testLogStreamInvalid() throws Exception {
+		MachineDialogParser parser = getParser(
+			"***LOG-STREAM eJxLVDDk\n",
+			new ByteArrayOutputStream()
+		);
+		parser.nextEvent();
+	}
+
+	@Test
+	public void testJsonCodec() throws Exception {
+		Object value = JsonCodec.decode(
+			"{\"a\": [1, -2.5, true, false, null, \"x\\ty\\u0041\"], \"b\": {}}"
+		);
+		assertEquals(
+			"{\"a\": [1, -2.5, true, false, null, \"x\\tyA\"], \"b\": {}}",
+			JsonCodec.encode(value)
+		);
+	}
 }
@@ -32,6 +32,8 @@ def _pythonModulesCompat():
     else:
         import ConfigParser
         sys.modules['configparser'] = ConfigParser
+        import Queue
+        sys.modules['queue'] = Queue
         import __builtin__
         sys.modules['builtins'] = __builtin__
 
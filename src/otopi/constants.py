@@ -39,6 +39,7 @@ class Defaults(object):
         )
     )
     PACKAGER_KEEP_ALIVE_INTERVAL = 30
+    PACKAGER_METADATA_MAX_AGE = 3600
 
 
 @util.export
@@ -81,9 +82,12 @@ class Const(object):
     CONFIG_SECTION_ENFORCE = 'environment:enforce'
     DIALOG_DIALECT_MACHINE = 'machine'
     DIALOG_DIALECT_HUMAN = 'human'
+    DIALOG_ANSWER_SECTION = 'answers'
     EXIT_CODE_SUCCESS = 0
     EXIT_CODE_GENERAL_ERROR = 1
     EXIT_CODE_INITIALIZATION_ERROR = 2
+    LOG_COMPRESS_GZIP = 'gzip'
+    LOG_COMPRESS_ZSTD = 'zstd'
 
 
 @util.export
@@ -94,6 +98,7 @@ class SystemEnvironment(object):
     LOG_DIR = 'OTOPI_LOGDIR'
     CONFIG = 'OTOPI_CONFIG'
     EXEC_DIR = 'OTOPI_EXECDIR'
+    DIALOG_SOCKET = 'OTOPI_DIALOG_SOCKET'
 
 
 @util.export
@@ -129,6 +134,11 @@ class CoreEnv(object):
     LOG_FILTER_KEYS = 'CORE/logFilterKeys'
     LOG_FILE_HANDLE = 'CORE/logFileHandle'
     LOG_REMOVE_AT_EXIT = 'CORE/logRemoveAtExit'
+    LOG_ASYNC = 'CORE/logAsync'
+    LOG_JSON = 'CORE/logJson'
+    LOG_JSON_FILE_NAME = 'CORE/logJsonFileName'
+    LOG_COMPRESS = 'CORE/logCompress'
+    LOG_STREAM = 'CORE/logStream'
     CONFIG_FILE_NAME = 'CORE/configFileName'
     CONFIG_FILE_APPEND = 'CORE/configFileAppend'
 
@@ -140,6 +150,11 @@ class DialogEnv(object):
     CUSTOMIZATION = 'DIALOG/customization'
     BOUNDARY = 'DIALOG/boundary'
     CLI_VERSION = 'DIALOG/cliVersion'
+    MACHINE_VERSION = 'DIALOG/machineVersion'
+    ANSWER_FILE = 'DIALOG/answerFile'
+    ANSWER_PREFIX = 'DIALOG_ANSWER/'
+    SOCKET = 'DIALOG/socket'
+    PROGRESS_COALESCE = 'DIALOG/progressCoalesce'
 
 
 @util.export
@@ -171,6 +186,7 @@ class NetEnv(object):
 @util.codegen
 class PackEnv(object):
     KEEP_ALIVE_INTERVAL = 'PACKAGER/keepAliveInterval'
+    METADATA_MAX_AGE = 'PACKAGER/metadataMaxAge'
     YUMPACKAGER_ENABLED = 'PACKAGER/yumpackagerEnabled'
     YUMPACKAGER_EXPIRE_CACHE = 'PACKAGER/yumExpireCache'
     YUM_DISABLED_PLUGINS = 'PACKAGER/yumDisabledPlugins'
@@ -180,6 +196,11 @@ class PackEnv(object):
     DNFPACKAGER_EXPIRE_CACHE = 'PACKAGER/dnfExpireCache'
     DNF_DISABLED_PLUGINS = 'PACKAGER/dnfDisabledPlugins'
     DNF_ROLLBACK = 'PACKAGER/dnfRollback'
+    DNF_INSTALLROOT = 'PACKAGER/dnfInstallroot'
+    DNF_SNAPSHOT = 'PACKAGER/dnfSnapshot'
+    DNF_SNAPSHOT_MODE = 'PACKAGER/dnfSnapshotMode'
+    FAKEPACKAGER_FIXTURE = 'PACKAGER/fakepackagerFixture'
+    FAKEPACKAGER_TIME_SCALE = 'PACKAGER/fakepackagerTimeScale'
 
 
 @util.export
@@ -187,6 +208,8 @@ class PackEnv(object):
 class Queries(object):
     CUSTOMIZATION_COMMAND = 'CUSTOMIZATION_COMMAND'
     TERMINATION_COMMAND = 'TERMINATION_COMMAND'
+    ENV_SET_BULK = 'ENV_SET_BULK'
+    ENV_GET_BULK = 'ENV_GET_BULK'
     TIME = 'TIME'
 
 
@@ -27,6 +27,7 @@ import operator
 import os
 import random
 import sys
+import threading
 import traceback
 
 
@@ -170,7 +171,8 @@ class Context(base.Base):
     (
         NOTIFY_ERROR,   # error occurred.
         NOTIFY_REEXEC,  # about to re-execute process.
-    ) = range(2)
+        NOTIFY_STAGE,   # about to execute stage.
+    ) = range(3)
 
     @property
     def environment(self):
@@ -208,6 +210,7 @@ class Context(base.Base):
         self._sequence = {}
         self._plugins = []
         self._notifications = []
+        self._prefetches = {}
         self._environment = {
             constants.BaseEnv.ERROR: False,
             constants.BaseEnv.ABORTED: False,
@@ -260,6 +263,84 @@ class Context(base.Base):
         """Register notification method."""
         self._notifications.append(notification)
 
+    def registerPrefetch(self, name, method, keys=()):
+        """Register speculative prefetch.
+
+        Prefetch methods are executed in background when prefetch is
+        started, they must not modify the environment nor the system.
+
+        Keyword arguments:
+        name -- prefetch name, usually the name of the consuming event.
+        method -- method to execute, its result is kept.
+        keys -- environment keys the result depends on.
+
+        """
+        self._prefetches[name] = {
+            'method': method,
+            'keys': tuple(keys),
+            'snapshot': None,
+            'thread': None,
+            'result': None,
+            'error': False,
+        }
+
+    def __prefetchSnapshot(self, keys):
+        return dict(
+            (k, common.toStr(self.environment.get(k)))
+            for k in keys
+        )
+
+    def __prefetch(self, name, prefetch):
+        try:
+            prefetch['result'] = prefetch['method']()
+        except Exception:
+            prefetch['error'] = True
+            self.logger.debug('prefetch %s failed', name, exc_info=True)
+
+    def startPrefetch(self):
+        """Start registered prefetches in background."""
+        for name, prefetch in self._prefetches.items():
+            if prefetch['thread'] is None:
+                self.logger.debug('starting prefetch %s', name)
+                prefetch['snapshot'] = self.__prefetchSnapshot(
+                    prefetch['keys']
+                )
+                prefetch['thread'] = threading.Thread(
+                    target=self.__prefetch,
+                    name='otopi.prefetch.%s' % name,
+                    kwargs={
+                        'name': name,
+                        'prefetch': prefetch,
+                    },
+                )
+                prefetch['thread'].daemon = True
+                prefetch['thread'].start()
+
+    def getPrefetch(self, name):
+        """Consume prefetch result.
+
+        Waits for prefetch to complete.
+
+        Keyword arguments:
+        name -- prefetch name.
+
+        Returns:
+        (valid, result) -- valid is False if prefetch was not started,
+            failed or any of its environment keys was modified.
+
+        """
+        prefetch = self._prefetches.pop(name, None)
+        if prefetch is None or prefetch['thread'] is None:
+            return False, None
+        prefetch['thread'].join()
+        if prefetch['error']:
+            return False, None
+        if prefetch['snapshot'] != self.__prefetchSnapshot(prefetch['keys']):
+            self.logger.debug('prefetch %s dropped, environment changed', name)
+            return False, None
+        self.logger.debug('prefetch %s consumed', name)
+        return True, prefetch['result']
+
     def registerPlugin(self, p):
         """Register plugin.
 
@@ -422,13 +503,15 @@ class Context(base.Base):
                 not if_no_error or
                 not self.environment[constants.BaseEnv.ERROR]
             ):
+                self.notify(event=self.NOTIFY_STAGE)
                 self.logger.info(
                     _("Stage: {stage}").format(
                         stage=plugin.Stages.stage_str(self._currentStage),
                     )
                 )
                 self.logger.debug(
-                    "STAGE %s" % plugin.Stages.stage_id(self._currentStage)
+                    'STAGE %s',
+                    plugin.Stages.stage_id(self._currentStage),
                 )
                 for methodinfo in self._sequence[self._currentStage]:
                     if (
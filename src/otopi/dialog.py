@@ -25,11 +25,17 @@ Dialog is the component responsible of intraction with manager.
 """
 
 
+import fcntl
 import getpass
 import gettext
 import logging
 import os
+import socket
+import stat
+import struct
 import sys
+import termios
+import time
 
 
 from . import common
@@ -115,13 +121,14 @@ class DialogBase(object):
         """
         pass
 
-    def displayMultiString(self, name, value, note=None):
+    def displayMultiString(self, name, value, note=None, log=True):
         """Display a multi-string to the manager.
 
         Keyword arguments:
         name -- name of variable.
-        value -- value to variable.
+        value -- value to variable, iterable of lines.
         note -- note to present.
+        log -- log the content.
 
         """
         pass
@@ -147,6 +154,19 @@ class DialogBase(object):
         """
         return False
 
+    def streamLog(self, data):
+        """Stream a batch of log records to the manager.
+
+        Keyword arguments:
+        data -- zlib compressed records, new-line separated.
+
+        Returns:
+        True -- sent.
+        False -- cannot be sent now or not supported by dialog.
+
+        """
+        return False
+
     def terminate(self):
         """Notify manager of end of dialog."""
         pass
@@ -154,11 +174,26 @@ class DialogBase(object):
 
 @util.export
 class DialogBaseImpl(DialogBase):
+    """Dialog implementation over standard handles.
+
+    Output is buffered, it is flushed before reading input, when
+    closed, on notes, on log records, at stage boundaries and when
+    written FLUSH_INTERVAL seconds after last flush. Buffer size is
+    OUTPUT_BUFFER_SIZE.
+
+    If DialogEnv.SOCKET is set, the dialog is carried over a connection
+    to this unix domain socket instead of the standard handles.
+    """
+
+    OUTPUT_BUFFER_SIZE = 65536
+    FLUSH_INTERVAL = 1
 
     def __init__(self):
         self.__input = None
         self.__output = None
         self.__handler = None
+        self.__socket = None
+        self.__lastFlush = 0
 
     def __setupStdHandles(self):
         self.__flush(sys.stdout)
@@ -178,17 +213,40 @@ class DialogBaseImpl(DialogBase):
             )
 
     def __setupDialogChannel(self, logFormatter=None):
-        self.__input = os.fdopen(
-            os.dup(self.__stdhandles[0]),
-            'rt',
-            1
-        )
-        self.__output = os.fdopen(
-            os.dup(self.__stdhandles[1]),
-            'wt',
-            1
-        )
-        self.__handler = logging.StreamHandler(self.__output)
+        socketName = self.environment.get(constants.DialogEnv.SOCKET)
+        if socketName:
+            self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self.__socket.connect(socketName)
+            except socket.error as e:
+                self.__socket.close()
+                self.__socket = None
+                raise RuntimeError(
+                    _(
+                        "Cannot connect to dialog socket '{socket}': {error}"
+                    ).format(
+                        socket=socketName,
+                        error=e,
+                    )
+                )
+            self.__input = self.__socket.makefile('r', 1)
+            self.__output = self.__socket.makefile(
+                'w',
+                self.OUTPUT_BUFFER_SIZE
+            )
+        else:
+            self.__input = os.fdopen(
+                os.dup(self.__stdhandles[0]),
+                'rt',
+                1
+            )
+            self.__output = os.fdopen(
+                os.dup(self.__stdhandles[1]),
+                'wt',
+                self.OUTPUT_BUFFER_SIZE
+            )
+        self.__lastFlush = time.time()
+        self.__handler = self._createLogHandler(stream=self.__output)
         self.__handler.setLevel(logging.INFO)
         if logFormatter is not None:
             self.__handler.setFormatter(logFormatter)
@@ -209,18 +267,26 @@ class DialogBaseImpl(DialogBase):
     def __flush(self, stream):
         stream.flush()
         try:
-            # tty [at least] gets errors
-            os.fsync(stream.fileno())
+            # pipes and ttys have nothing to sync
+            if stat.S_ISREG(os.fstat(stream.fileno()).st_mode):
+                os.fsync(stream.fileno())
         except OSError:
             pass
 
-    def __logString(self, name, string):
+    def _logString(self, name, string):
         for line in string.splitlines():
             self.logger.debug('DIALOG:%-10s %s', name, line)
 
     def __notification(self, event):
         if event == self.context.NOTIFY_REEXEC:
             self._close()
+        elif event == self.context.NOTIFY_STAGE:
+            if self.__output is not None:
+                self._flush()
+
+    def _createLogHandler(self, stream):
+        """Create handler of log records sent to manager."""
+        return logging.StreamHandler(stream)
 
     def _open(self, logFormatter=None):
         self.__setupStdHandles()
@@ -232,16 +298,42 @@ class DialogBaseImpl(DialogBase):
             self.__input.close()
             self.__input = None
         if self.__output is not None:
+            self._flush()
             self.__output.close()
             self.__output = None
+        if self.__socket is not None:
+            self.__socket.close()
+            self.__socket = None
         self.__restoreStdHandles()
 
     def _output_isatty(self):
-        return self.__output.isatty()
+        # python-2 socket file objects have no isatty
+        return self.__socket is None and self.__output.isatty()
+
+    def _output_columns(self):
+        """Terminal width of output, 80 if unknown."""
+        try:
+            return struct.unpack(
+                'hh',
+                fcntl.ioctl(
+                    self.__output.fileno(),
+                    termios.TIOCGWINSZ,
+                    b'\0' * 4,
+                ),
+            )[1] or 80
+        except Exception:
+            return 80
+
+    def __flushLog(self):
+        """Make sure log is complete before waiting for input."""
+        for handler in logging.getLogger(constants.Log.LOGGER_BASE).handlers:
+            handler.flush()
 
     def _readline(self, hidden=False):
+        self.__flushLog()
+        self._flush()
         getpass_error = True
-        if hidden and self.__input.isatty():
+        if hidden and self.__socket is None and self.__input.isatty():
             old = os.dup(0)
             os.dup2(self.__stdhandles[0], 0)
             try:
@@ -264,18 +356,71 @@ class DialogBaseImpl(DialogBase):
 
         value = value.rstrip('\n')
         if not hidden:
-            self.__logString('RECEIVE', value)
+            self._logString('RECEIVE', value)
+        return value
+
+    def _read(self, size, hidden=False):
+        """Read exactly size characters."""
+        self.__flushLog()
+        self._flush()
+        value = ''
+        while len(value) < size:
+            data = self.__input.read(size - len(value))
+            if not data:
+                raise IOError(_('End of file'))
+            value += data
+        if not hidden:
+            self._logString('RECEIVE', value)
         return value
 
     def _flush(self):
         self.__flush(stream=self.__output)
+        self.__lastFlush = time.time()
+
+    def _write(self, text, flush=False, log=True):
+        """Write text to manager.
 
-    def _write(self, text, flush=True):
+        Keyword arguments:
+        text -- text to write.
+        flush -- flush now, otherwise flush is delayed up to
+            FLUSH_INTERVAL or until input is read.
+        log -- log the text.
+        """
         text = common.toStr(text)
-        self.__logString('SEND', text)
+        if log:
+            self._logString('SEND', text)
         self.__output.write(text)
-        if flush:
-            self.__flush(self.__output)
+        if flush or time.time() - self.__lastFlush >= self.FLUSH_INTERVAL:
+            self._flush()
+
+    WRITE_LINES_CHUNK = 1000
+
+    def _writeLines(self, lines, log=True):
+        """Write lines in chunks.
+
+        lines may be any iterable, it is consumed while writing.
+
+        Returns:
+        True if any line was written.
+        """
+        written = False
+        chunk = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) >= self.WRITE_LINES_CHUNK:
+                self._write(
+                    text='%s\n' % '\n'.join(chunk),
+                    log=log,
+                )
+                written = True
+                chunk = []
+        if chunk:
+            self._write(
+                text='%s\n' % '\n'.join(chunk),
+                log=log,
+            )
+            written = True
+        return written
 
     def _queryStringNote(
         self,
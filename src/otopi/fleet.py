@@ -0,0 +1,523 @@
+#
+# otopi -- plugable installer
+# Copyright (C) 2012-2013 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""Multi-host runner.
+
+Drives machine dialogs of many otopi processes from a single loop.
+
+"""
+
+
+import base64
+import errno
+import fcntl
+import gettext
+import json
+import os
+import select
+import subprocess
+import sys
+import time
+import zlib
+
+
+try:
+    from shlex import quote as _quote
+except ImportError:
+    from pipes import quote as _quote
+
+
+from . import common
+from . import constants
+from . import util
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='otopi')
+
+
+#
+# Machine dialog constants are owned by the dialog plugin,
+# which is not importable as a module.
+#
+_REQUEST_PREFIX = '***'
+_NOTE_PREFIX = '#'
+_LOG_PREFIX = _REQUEST_PREFIX + 'L:'
+_PROTOCOL = _REQUEST_PREFIX + 'PROTOCOL 2'
+
+
+@util.export
+class Host(object):
+    """otopi process of a single host.
+
+    Keyword arguments:
+    name -- host name, used for reporting.
+    command -- otopi command line, sequence.
+    transport -- transport command prefix, sequence, for example
+        ('ssh', '-T', 'root@host'). Command is appended as a single
+        shell quoted argument. Empty for local execution.
+    environment -- otopi environment to set, dict.
+    answers -- answers of this host, dict, override fleet answers.
+    cwd -- working directory of local process.
+    env -- process environment to add, dict.
+
+    After run:
+    rc -- exit code, None if not executed.
+    error -- runner error, None if none.
+    messages -- list of (severity, record) of log messages.
+    values -- dict of displayed values.
+    log -- streamed debug log records, if not written to file.
+    logFile -- streamed debug log file name, if written to file.
+    stderr -- standard error output.
+
+    """
+
+    def __init__(
+        self,
+        name,
+        command,
+        transport=(),
+        environment=None,
+        answers=None,
+        cwd=None,
+        env=None,
+    ):
+        self.name = name
+        self.command = list(command)
+        self.transport = list(transport)
+        self.environment = dict(environment or {})
+        self.answers = dict(answers or {})
+        self.cwd = cwd
+        self.env = dict(env or {})
+
+        self.rc = None
+        self.error = None
+        self.messages = []
+        self.values = {}
+        self.log = []
+        self.logFile = None
+        self.stderr = ''
+
+        self._process = None
+        self._buffer = b''
+        self._output = b''
+        self._frameSize = None
+        self._framed = False
+        self._multiString = None
+        self._consumed = {}
+        self._logHandle = None
+        self._open = 0
+
+    def __str__(self):
+        return self.name
+
+    def commandLine(self):
+        """Command line to execute."""
+        # otopi splits each argument using shell syntax
+        args = self.command + [
+            _quote(
+                '%s=%s:%s' % (
+                    key,
+                    common.typeName(value),
+                    '\n'.join(value) if isinstance(value, (list, tuple))
+                    else value,
+                )
+            )
+            for key, value in sorted(self.environment.items())
+        ]
+        if self.transport:
+            args = self.transport + [' '.join(_quote(a) for a in args)]
+        return args
+
+
+@util.export
+class Fleet(object):
+    """Runner of many otopi processes.
+
+    Processes are started with the machine dialect version 2 and log
+    streaming, so debug log is collected while running. Input of
+    processes is written without blocking, so a slow process does not
+    stall the others.
+
+    Queries are resolved from answers of host and then from answers
+    of fleet, by query name. A list answer of string query or
+    confirmation is a sequence, each query consumes the next element.
+    Unanswered queries are aborted.
+
+    Keyword arguments:
+    answers -- answers shared by all hosts, dict.
+    logDir -- directory to write streamed debug log of hosts into,
+        <logDir>/<host>.log, None to keep in memory.
+    parallel -- maximum number of processes running, None for all.
+
+    """
+
+    READ_SIZE = 65536
+
+    def __init__(self, answers=None, logDir=None, parallel=None):
+        self._answers = dict(answers or {})
+        self._logDir = logDir
+        self._parallel = parallel
+        self._hosts = []
+
+    @property
+    def hosts(self):
+        return self._hosts
+
+    def add(self, host):
+        """Add host to run."""
+        self._hosts.append(host)
+        return host
+
+    def _start(self, host):
+        host.environment.setdefault(
+            constants.DialogEnv.DIALECT,
+            constants.Const.DIALOG_DIALECT_MACHINE,
+        )
+        host.environment.setdefault(constants.DialogEnv.MACHINE_VERSION, 2)
+        host.environment.setdefault(constants.CoreEnv.LOG_STREAM, True)
+        if self._logDir is not None:
+            host.logFile = os.path.join(self._logDir, '%s.log' % host.name)
+            host._logHandle = open(host.logFile, 'w')
+        env = os.environ.copy()
+        env.update(host.env)
+        try:
+            host._process = subprocess.Popen(
+                host.commandLine(),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=host.cwd,
+                env=env,
+                close_fds=True,
+            )
+        except OSError as e:
+            host.error = _('Cannot execute: {error}').format(error=e)
+            host.rc = 1
+            self._finish(host)
+            return False
+        fd = host._process.stdin.fileno()
+        fcntl.fcntl(
+            fd,
+            fcntl.F_SETFL,
+            fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK,
+        )
+        host._open = 2
+        return True
+
+    def _finish(self, host):
+        if host._process is not None:
+            for f in (
+                host._process.stdin,
+                host._process.stdout,
+                host._process.stderr,
+            ):
+                f.close()
+            host.rc = host._process.wait()
+            host._process = None
+        if host._logHandle is not None:
+            host._logHandle.close()
+            host._logHandle = None
+
+    def _writeInput(self, host):
+        """Write pending input of process, as much as it accepts."""
+        try:
+            while host._output:
+                host._output = host._output[
+                    os.write(host._process.stdin.fileno(), host._output):
+                ]
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                # process is gone, detected by end of output
+                host.error = _('Cannot write: {error}').format(error=e)
+                host._output = b''
+
+    def _send(self, host, **message):
+        payload = json.dumps(message, sort_keys=True)
+        host._output += ('%d\n%s\n' % (len(payload), payload)).encode(
+            'ascii'
+        )
+        self._writeInput(host)
+
+    def _answer(self, host, name, sequence=False):
+        for answers in (host.answers, self._answers):
+            if name in answers:
+                value = answers[name]
+                if sequence and isinstance(value, (list, tuple)):
+                    index = host._consumed.get(name, 0)
+                    if index >= len(value):
+                        return False, None
+                    host._consumed[name] = index + 1
+                    value = value[index]
+                return True, value
+        return False, None
+
+    def _query(self, host, frame):
+        name = frame.get('name')
+        found, value = self._answer(
+            host,
+            name,
+            sequence=frame['type'] in ('query-string', 'confirm'),
+        )
+        if not found:
+            host.error = _("No answer for '{name}'").format(name=name)
+            self._send(
+                host,
+                type='response',
+                id=frame.get('id'),
+                name=name,
+                abort=True,
+            )
+            return
+
+        query = frame['type']
+        if query == 'query-string':
+            value = common.toStr(value)
+        elif query == 'query-multi-string':
+            if not isinstance(value, (list, tuple)):
+                value = common.toStr(value).splitlines()
+            value = [common.toStr(v) for v in value]
+        elif query == 'confirm':
+            if not isinstance(value, bool):
+                value = common.toStr(value) in ('yes', 'y', 'Y')
+        self._send(
+            host,
+            type='response',
+            id=frame.get('id'),
+            name=name,
+            value=value,
+        )
+
+    def _logStream(self, host, value):
+        records = zlib.decompress(
+            base64.b64decode(value)
+        ).decode('utf-8').split('\n')
+        if host._logHandle is not None:
+            host._logHandle.write('%s\n' % '\n'.join(records))
+        else:
+            host.log.extend(records)
+
+    def _processFrame(self, host, frame):
+        t = frame.get('type')
+        if t == 'log':
+            host.messages.append((frame['severity'], frame['record']))
+        elif t == 'log-stream':
+            self._logStream(host, frame['value'])
+        elif t == 'display-value':
+            host.values[frame['name']] = frame['value']
+        elif t == 'display-multi-string':
+            if host._multiString is None:
+                host._multiString = []
+            host._multiString.extend(frame['value'])
+            if not frame.get('more'):
+                host.values[frame['name']] = host._multiString
+                host._multiString = None
+        elif t in (
+            'query-string',
+            'query-multi-string',
+            'query-value',
+            'confirm',
+        ):
+            self._query(host, frame)
+
+    def _processLine(self, host, line):
+        if line == _PROTOCOL:
+            host._framed = True
+        elif line.startswith(_LOG_PREFIX):
+            entry = line[len(_LOG_PREFIX):].split(' ', 1)
+            host.messages.append(
+                (entry[0].rstrip(':'), entry[1] if len(entry) > 1 else '')
+            )
+        elif not line.startswith(_NOTE_PREFIX):
+            host.messages.append(('ERROR', line))
+
+    def _processOutput(self, host, data):
+        host._buffer += data
+        while True:
+            if host._frameSize is None:
+                i = host._buffer.find(b'\n')
+                if i == -1:
+                    break
+                line = host._buffer[:i].decode('utf-8', 'replace')
+                host._buffer = host._buffer[i + 1:]
+                if host._framed:
+                    host._frameSize = int(line)
+                else:
+                    self._processLine(host, line)
+            else:
+                if len(host._buffer) < host._frameSize + 1:
+                    break
+                payload = host._buffer[:host._frameSize]
+                host._buffer = host._buffer[host._frameSize + 1:]
+                host._frameSize = None
+                self._processFrame(host, json.loads(payload.decode('ascii')))
+
+    def _processInput(self, host, fd):
+        try:
+            data = os.read(fd, self.READ_SIZE)
+        except OSError:
+            data = b''
+        if fd == host._process.stderr.fileno():
+            host.stderr += data.decode('utf-8', 'replace')
+        elif data:
+            try:
+                self._processOutput(host, data)
+            except ValueError as e:
+                host.error = _('Invalid output: {error}').format(error=e)
+                host._process.kill()
+        if not data:
+            host._open -= 1
+            if host._open == 0:
+                self._finish(host)
+
+    def run(self, timeout=None):
+        """Run all hosts.
+
+        Keyword arguments:
+        timeout -- seconds, processes still running are killed.
+
+        Returns:
+        dict host name to exit code.
+
+        """
+        pending = list(self._hosts)
+        running = []
+        start = time.time()
+        while pending or running:
+            while pending and (
+                self._parallel is None or
+                len(running) < self._parallel
+            ):
+                host = pending.pop(0)
+                if self._start(host):
+                    running.append(host)
+
+            fds = {}
+            wfds = {}
+            for host in running:
+                for f in (host._process.stdout, host._process.stderr):
+                    if not f.closed:
+                        fds[f.fileno()] = host
+                if host._output:
+                    wfds[host._process.stdin.fileno()] = host
+
+            wait = None
+            if timeout is not None:
+                wait = max(0, start + timeout - time.time())
+            readable, writable, _unused = select.select(
+                list(fds.keys()),
+                list(wfds.keys()),
+                [],
+                wait,
+            )
+            if not readable and not writable and timeout is not None:
+                for host in running:
+                    host.error = _('Timeout')
+                    host._process.kill()
+                    self._finish(host)
+                running = []
+                for host in pending:
+                    host.error = _('Timeout')
+                pending = []
+
+            for fd in writable:
+                host = wfds[fd]
+                if host._process is not None:
+                    self._writeInput(host)
+            for fd in readable:
+                host = fds[fd]
+                if host._process is not None:
+                    self._processInput(host, fd)
+            running = [h for h in running if h._process is not None]
+
+        return dict((host.name, host.rc) for host in self._hosts)
+
+    def failed(self):
+        """Hosts that did not complete successfully."""
+        return [
+            host for host in self._hosts
+            if host.rc != 0 or host.error is not None
+        ]
+
+
+class Example():
+
+    @staticmethod
+    def main():
+        import shutil
+        import tempfile
+
+        count = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+        base = tempfile.mkdtemp()
+        try:
+            # stand-ins need neither root nor a live repository
+            fixture = os.path.join(base, 'fixture.json')
+            with open(fixture, 'w') as f:
+                json.dump(
+                    {
+                        'installed': [
+                            {'name': 'bash', 'version': '4.2'},
+                        ],
+                        'available': [
+                            {'name': 'bash', 'version': '4.3'},
+                            {
+                                'name': 'iproute',
+                                'version': '3.10',
+                                'requires': ['bash'],
+                            },
+                        ],
+                    },
+                    f,
+                )
+            fleet = Fleet(logDir=base, parallel=2)
+            for i in range(count):
+                cwd = os.path.join(base, 'host%d' % i)
+                os.mkdir(cwd)
+                fleet.add(
+                    Host(
+                        name='host%d' % i,
+                        command=(sys.executable, '-m', 'otopi'),
+                        environment={
+                            constants.CoreEnv.LOG_DIR: cwd,
+                            constants.PackEnv.FAKEPACKAGER_FIXTURE: fixture,
+                        },
+                        cwd=cwd,
+                        env={'OTOPI_NONROOT': '1'},
+                    )
+                )
+            for name, rc in sorted(fleet.run(timeout=300).items()):
+                print('%s: %s' % (name, rc))
+            for host in fleet.hosts:
+                print('%s: error=%s log=%d bytes' % (
+                    host.name,
+                    host.error,
+                    os.path.getsize(host.logFile),
+                ))
+                for severity, record in host.messages:
+                    print('    %s %s' % (severity, record))
+        finally:
+            shutil.rmtree(base)
+
+
+if __name__ == '__main__':
+    Example.main()
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -24,15 +24,28 @@
 import gettext
 import logging
 import os
+import re
+import shutil
+import subprocess
 import sys
+import tempfile
+import threading
 import time
 import traceback
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 import dnf
 import dnf.callback
 import dnf.logging
+import dnf.repo
+import dnf.rpm
 import dnf.subject
 import dnf.yum.rpmtrans
+import rpm
 
 
 def _(m):
@@ -85,6 +98,15 @@ class MiniDNFSinkBase(object):
         """
         pass
 
+    def progress(self, msg):
+        """download progress log, info log by default.
+
+        Keyword arguments:
+        msg -- message to print
+
+        """
+        self.info(msg)
+
     def askForGPGKeyImport(self, userid, hexkeyid):
         """Ask for GPG Key import.
 
@@ -104,6 +126,11 @@ class MiniDNFSinkBase(object):
 
 class MiniDNF():
 
+    _RE_PLAIN_NAME = re.compile(r'^[A-Za-z0-9_.+-]+$')
+
+    SNAPSHOT_REPO = 'otopi-snapshot'
+    CREATEREPO = ('createrepo_c', 'createrepo')
+
     class _MyHandler(logging.Handler):
         def __init__(self, sink):
             logging.Handler.__init__(self)
@@ -131,16 +158,17 @@ class MiniDNF():
             dnf.callback.STATUS_DRPM: _('DRPM'),
         }
 
-        def __init__(self, sink):
+        def __init__(self, sink, downloaded=None):
             super(MiniDNF._MyDownloadProgress, self).__init__()
             self._sink = sink
+            self._downloaded = downloaded
 
         def start(self, total_files, total_size):
             super(MiniDNF._MyDownloadProgress, self).start(
                 total_files,
                 total_size,
             )
-            self._sink.info(
+            self._sink.progress(
                 _('Downloading {files} files, {size:.2f}KB').format(
                     files=total_files,
                     size=total_size / 1024,
@@ -159,7 +187,7 @@ class MiniDNF():
 
         def end(self, payload, status, msg):
             super(MiniDNF._MyDownloadProgress, self).end(payload, status, msg)
-            self._sink.info(
+            self._sink.progress(
                 _('Downloaded {payload}{status}{message}').format(
                     payload=payload,
                     status=(
@@ -169,6 +197,11 @@ class MiniDNF():
                     message=(_(' ') + msg) if msg else '',
                 )
             )
+            if self._downloaded is not None and status in (
+                dnf.callback.STATUS_OK,
+                dnf.callback.STATUS_ALREADY_EXISTS,
+            ):
+                self._downloaded(payload)
 
     class _MyTransactionDisplay(dnf.yum.rpmtrans.TransactionDisplay):
 
@@ -313,6 +346,15 @@ class MiniDNF():
         def __init__(self):
             super(MiniDNF._VoidSink, self).__init__()
 
+    class _MyQueueSink(object):
+        """Sink queuing calls, made later by the consuming thread."""
+
+        def __init__(self, events):
+            self._events = events
+
+        def __getattr__(self, name):
+            return lambda *args: self._events.put((name, args))
+
     @classmethod
     def _getPackageName(clz, po):
         return '%s%s-%s-%s.%s' % (
@@ -339,6 +381,23 @@ class MiniDNF():
 
     def _createBase(self, offline=False):
         base = dnf.Base()
+        if self._installroot != '/':
+            # keep metadata cache of roots out of the roots
+            cachedir = os.path.join(
+                base.conf.cachedir,
+                'installroot',
+                os.path.abspath(self._installroot).lstrip('/'),
+            )
+            base.conf.installroot = self._installroot
+            base.conf.cachedir = cachedir
+            # history is of the root, as dnf --installroot does
+            base.conf.persistdir = os.path.join(
+                self._installroot,
+                base.conf.persistdir.lstrip('/'),
+            )
+            releasever = dnf.rpm.detect_releasever(self._installroot)
+            if releasever is not None:
+                base.conf.releasever = releasever
         if base.conf.plugins:
             base.plugins.load(base.conf.pluginpath, self._disabledPlugins)
 
@@ -348,6 +407,39 @@ class MiniDNF():
 
         base.plugins.run_init(base, None)
         base.read_all_repos()
+        expireCache = self._expireCache
+        for repo in base.repos.iter_enabled():
+            if self._metadataExpire is not None:
+                repo.metadata_expire = self._metadataExpire
+            if expireCache:
+                cached, left = repo.metadata_expire_in()
+                self._sink.verbose(
+                    _(
+                        'Repository {repo}: {state}, checking repomd.xml'
+                    ).format(
+                        repo=repo.id,
+                        state=(
+                            _('no cached metadata') if not cached
+                            else _('metadata older than maximum age')
+                            if left <= 0
+                            else _('metadata within maximum age')
+                        ),
+                    )
+                )
+                repo.md_expire_cache()
+        if self._snapshotReplay:
+            # packages keep signatures of their origin
+            enabled = list(base.repos.iter_enabled())
+            base.repos.all().disable()
+            repo = dnf.repo.Repo(self.SNAPSHOT_REPO, base.conf.cachedir)
+            repo.baseurl = ['file://%s' % os.path.abspath(self._snapshot)]
+            repo.gpgcheck = (
+                base.conf.gpgcheck or
+                any(r.gpgcheck for r in enabled)
+            )
+            repo.gpgkey = sorted(set(k for r in enabled for k in r.gpgkey))
+            repo.enable()
+            base.repos.add(repo)
         base.repos.all().set_progress_bar(self._MyDownloadProgress(self._sink))
 
         # dnf does not keep packages for offline usage
@@ -356,6 +448,8 @@ class MiniDNF():
 
         base.fill_sack()
         base.read_comps()
+        if expireCache:
+            self._expireCache = False
 
         return base
 
@@ -364,15 +458,221 @@ class MiniDNF():
             base.plugins.unload()
             base.close()
 
+    def _rpmdbCookie(self):
+        """Cookie of rpmdb, changes when rpmdb is modified."""
+        try:
+            dbpath = os.path.join(
+                self._installroot,
+                rpm.expandMacro('%{_dbpath}').lstrip('/'),
+            )
+            cookie = []
+            for name in sorted(os.listdir(dbpath)):
+                st = os.stat(os.path.join(dbpath, name))
+                cookie.append((name, st.st_mtime, st.st_size))
+            return tuple(cookie)
+        except OSError:
+            return None
+
+    def _getQueryBase(self):
+        """Read only base for queries outside of transaction.
+
+        Base is kept until a transaction is started or processed,
+        cache is cleaned or rpmdb is modified.
+        """
+        cookie = self._rpmdbCookie()
+        if self._queryBase is not None:
+            if cookie is not None and cookie == self._queryBaseCookie:
+                self._sink.verbose(_('Reusing cached query base'))
+                return self._queryBase
+            self._sink.verbose(_('rpmdb modified, dropping cached query base'))
+            self._dropQueryBase()
+
+        self._sink.verbose(_('Creating query base'))
+        self._queryBase = self._createBase()
+        self._queryBaseCookie = cookie
+        return self._queryBase
+
+    def _dropQueryBase(self):
+        if self._queryBase is not None:
+            self._destroyBase(self._queryBase)
+            self._queryBase = None
+            self._queryBaseCookie = None
+
+    def _snapshotClosure(self, base):
+        """Packages of transaction and all their dependencies.
+
+        Dependencies already installed are included, so the snapshot
+        can be replayed on hosts not having them.
+
+        Returns:
+        list of available packages.
+        """
+        sack = base.sack
+        install = list(base.transaction.install_set)
+        ret = {}
+        pending = list(install)
+        while pending:
+            po = pending.pop()
+            if str(po) in ret:
+                continue
+            ret[str(po)] = po
+            for req in po.requires:
+                providers = sack.query().filter(provides=req)
+                if any(p in install for p in providers):
+                    continue
+                for p in providers.installed():
+                    available = sack.query().available().filter(
+                        name=p.name,
+                        evr=p.evr,
+                        arch=p.arch,
+                    )
+                    if available:
+                        pending.append(list(available)[0])
+                    elif str(p) not in ret:
+                        ret[str(p)] = None
+                        self._sink.verbose(
+                            _(
+                                'Package {package} is not available, '
+                                'not captured into snapshot'
+                            ).format(
+                                package=p,
+                            )
+                        )
+        return [po for po in ret.values() if po is not None]
+
+    def _stageSnapshot(self, base):
+        """Copy packages of transaction closure into staging directory.
+
+        Returns:
+        staging directory.
+        """
+        packages = self._snapshotClosure(base)
+        base.download_packages(
+            [po for po in packages if po not in base.transaction.install_set],
+            progress=self._MyDownloadProgress(self._sink),
+        )
+        if not os.path.exists(self._snapshot):
+            os.makedirs(self._snapshot)
+        staging = tempfile.mkdtemp(prefix='.staging.', dir=self._snapshot)
+        try:
+            for po in packages:
+                self._sink.verbose(
+                    _('Capturing {package} into snapshot').format(
+                        package=po,
+                    )
+                )
+                shutil.copy2(po.localPkg(), staging)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return staging
+
+    def _captureSnapshot(self, staging):
+        """Move staged packages into snapshot and create its metadata.
+
+        Metadata is created aside and replaces the previous one by
+        rename, so a failure keeps the previous metadata intact.
+        """
+        target = os.path.join(self._snapshot, 'Packages')
+        if not os.path.exists(target):
+            os.makedirs(target)
+        for name in os.listdir(staging):
+            os.rename(
+                os.path.join(staging, name),
+                os.path.join(target, name),
+            )
+        os.rmdir(staging)
+
+        output = tempfile.mkdtemp(prefix='.repodata.', dir=self._snapshot)
+        try:
+            self._createRepo(output)
+            repodata = os.path.join(self._snapshot, 'repodata')
+            old = None
+            if os.path.exists(repodata):
+                old = tempfile.mkdtemp(prefix='.old.', dir=self._snapshot)
+                os.rename(repodata, os.path.join(old, 'repodata'))
+            os.rename(os.path.join(output, 'repodata'), repodata)
+            if old is not None:
+                shutil.rmtree(old, ignore_errors=True)
+        finally:
+            shutil.rmtree(output, ignore_errors=True)
+
+    def _createRepo(self, output):
+        for createrepo in self.CREATEREPO:
+            try:
+                p = subprocess.Popen(
+                    (
+                        createrepo,
+                        '--outputdir', output,
+                        self._snapshot,
+                    ),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    close_fds=True,
+                )
+            except OSError:
+                continue
+            stdout = p.communicate()[0]
+            self._sink.verbose(stdout.decode('utf-8', 'replace'))
+            if p.returncode != 0:
+                raise RuntimeError(
+                    _('Cannot create snapshot metadata using {cmd}').format(
+                        cmd=createrepo,
+                    )
+                )
+            return
+        raise RuntimeError(
+            _('Cannot create snapshot metadata, none of {cmds} found').format(
+                cmds=', '.join(self.CREATEREPO),
+            )
+        )
+
+    def _resolvePatterns(self, sack, patterns):
+        """Resolve package patterns in one pass.
+
+        Plain names are resolved by a single name query. Other patterns
+        and names not matching any package name are resolved as dnf
+        does, by provides and files if no package name matches.
+
+        Returns:
+        dict of pattern to (packages, provides), provides is True if
+        pattern was resolved by provides or files.
+        """
+        ret = {}
+        names = [p for p in patterns if self._RE_PLAIN_NAME.match(p)]
+        if names:
+            for po in sack.query().filter(name=names):
+                ret.setdefault(po.name, ([], False))[0].append(po)
+        for pattern in patterns:
+            if pattern not in ret:
+                subject = dnf.subject.Subject(pattern)
+                pos = list(subject.get_best_query(sack, with_provides=False))
+                ret[pattern] = (pos, False) if pos else (
+                    list(subject.get_best_query(sack, with_provides=True)),
+                    True,
+                )
+        return ret
+
     def _queuePackages(
         self,
         action,
         call,
         packages,
         ignoreErrors=False,
+        installed=False,
     ):
+        """Queue packages.
+
+        Packages are resolved together first, packages that cannot be
+        resolved, or are not installed if installed is set, are failed
+        without calling the action. The action is called with the
+        packages matching each pattern and whether they were matched by
+        provides, and marks them, so patterns are not resolved again.
+        """
         ret = True
 
+        packages = list(packages)
+        resolved = self._resolvePatterns(self._base.sack, packages)
         for package in packages:
             try:
                 self._sink.verbose(
@@ -381,7 +681,16 @@ class MiniDNF():
                         action=action,
                     )
                 )
-                call(package)
+                matches, provides = resolved[package]
+                if installed:
+                    matches = [po for po in matches if po.installed]
+                if not matches:
+                    raise dnf.exceptions.MarkingError(
+                        _('No package matched')
+                        if not installed
+                        else _('No installed package matched')
+                    )
+                call(matches, provides)
             except dnf.exceptions.Error as e:
                 ret = False
                 msg = _("Cannot queue package '{package}': {error}").format(
@@ -404,6 +713,59 @@ class MiniDNF():
 
         return ret
 
+    def _markInstall(self, pos, provides):
+        """Mark best available package of each name not installed.
+
+        Latest version is selected, of native arch or noarch if any,
+        otherwise of each arch matched. When matched by provides, only
+        the provider of shortest name is marked, unless any provider is
+        installed.
+        """
+        installed = self._base.sack.query().installed()
+        byName = {}
+        for po in pos:
+            if not po.installed:
+                byName.setdefault(po.name, []).append(po)
+        if provides and byName:
+            if any(po.installed for po in pos):
+                return
+            name = min(byName.keys(), key=lambda n: (len(n), n))
+            byName = {name: byName[name]}
+
+        archs = (self._base.conf.substitutions['arch'], 'noarch')
+        for name, candidates in sorted(byName.items()):
+            latest = self._base.sack.query().filter(pkg=candidates).latest()
+            native = [po for po in latest if po.arch in archs]
+            if native:
+                if not installed.filter(name=name):
+                    for po in native:
+                        self._base.package_install(po)
+            else:
+                for po in latest:
+                    if not installed.filter(name=name, arch=po.arch):
+                        self._base.package_install(po)
+
+    def _markUpgrade(self, pos, provides):
+        """Mark latest available version of installed packages.
+
+        Arch compatibility is left to dnf, so packages may move from
+        or to noarch.
+        """
+        names = set(po.name for po in pos if po.installed)
+        if not names:
+            return
+        installed = self._base.sack.query().installed()
+        for po in self._base.sack.query().available().filter(
+            name=list(names),
+        ).latest():
+            if any(po.evr_gt(i) for i in installed.filter(name=po.name)):
+                self._base.package_upgrade(po)
+
+    def _markRemove(self, pos, provides):
+        for po in pos:
+            if po.installed:
+                self._base.package_remove(po)
+
     def _queueGroup(
         self,
         action,
@@ -451,21 +813,30 @@ class MiniDNF():
         self,
         sink=None,
         disabledPlugins=None,
+        installroot=None,
     ):
         if int(dnf.__version__.split('.')[0]) != 1:
             raise RuntimeError(_('Incompatible DNF'))
 
         self._sink = sink if sink else self._VoidSink()
         self._disabledPlugins = disabledPlugins if disabledPlugins else []
+        self._installroot = installroot if installroot else '/'
+        self._snapshot = None
+        self._snapshotReplay = False
+        self._metadataExpire = None
+        self._expireCache = False
 
         self._base = None
         self._baseTransaction = None
+        self._queryBase = None
+        self._queryBaseCookie = None
 
         self._handler = self._MyHandler(self._sink)
 
     def __del__(self):
         if self._base is not None:
             self.endTransaction(rollback=True)
+        self._dropQueryBase()
 
     def selinux_role(self):
         """Setup proper selinux role.
@@ -523,6 +894,108 @@ class MiniDNF():
                 os.execv(sys.executable, [sys.executable] + sys.argv)
                 os._exit(1)
 
+    @property
+    def installroot(self):
+        return self._installroot
+
+    def setInstallroot(self, installroot):
+        """Set root to install into.
+
+        Allows provisioning several roots in sequence. Metadata of each
+        root is cached under the host cache directory, history is kept
+        within the root, release version is detected from the root, if
+        the root has none yet the release version of the host is used.
+
+        Keyword arguments:
+        installroot -- root directory, None for /.
+
+        """
+        installroot = installroot if installroot else '/'
+        if installroot != self._installroot:
+            if self._base is not None:
+                raise RuntimeError(
+                    _('Cannot change installroot within transaction')
+                )
+            self._sink.verbose(
+                _('Using installroot {root}').format(
+                    root=installroot,
+                )
+            )
+            self._dropQueryBase()
+            self._installroot = installroot
+
+    def setMetadataExpire(self, maxAge):
+        """Expire metadata and set its expiration.
+
+        Metadata is expired when the next base is created, so repomd.xml
+        of each repository is checked and metadata is kept if it was not
+        modified. Later bases check metadata once older than maxAge.
+
+        Keyword arguments:
+        maxAge -- maximum age in seconds, None for configuration.
+
+        """
+        self._dropQueryBase()
+        self._metadataExpire = maxAge
+        self._expireCache = True
+
+    def setSnapshot(self, directory, replay=False):
+        """Set local repository snapshot.
+
+        When replaying, the snapshot replaces all repositories, so no
+        remote metadata is fetched. When capturing, packages installed
+        by transactions and their dependencies are captured into
+        directory and repository metadata is created once the
+        transaction succeeds, to be replayed later.
+
+        Keyword arguments:
+        directory -- snapshot directory, None to disable.
+        replay -- replay snapshot, otherwise capture.
+
+        """
+        replay = directory is not None and replay
+        if (directory, replay) != (self._snapshot, self._snapshotReplay):
+            if self._base is not None:
+                raise RuntimeError(
+                    _('Cannot change snapshot within transaction')
+                )
+            self._dropQueryBase()
+            self._snapshot = directory
+            self._snapshotReplay = replay
+            if directory is not None:
+                self._sink.verbose(
+                    (
+                        _('Installing from snapshot {directory}')
+                        if self._snapshotReplay
+                        else _('Capturing snapshot into {directory}')
+                    ).format(
+                        directory=directory,
+                    )
+                )
+
+    def createQueryBase(self):
+        """Create base for queries without using it.
+
+        State is not modified, except that pending metadata expiration
+        is done, so it may be called in background, the result should
+        be passed to setQueryBase.
+        """
+        cookie = self._rpmdbCookie()
+        return self._createBase(), cookie
+
+    def setQueryBase(self, queryBase):
+        """Use base created by createQueryBase for queries.
+
+        Base is dropped if a base is already in use.
+        """
+        base, cookie = queryBase
+        if self._base is not None or self._queryBase is not None:
+            self._destroyBase(base)
+        else:
+            self._sink.verbose(_('Using prefetched query base'))
+            self._queryBase = base
+            self._queryBaseCookie = cookie
+
     def transaction(self, rollback=True):
         """Manage transaction.
 
@@ -539,6 +1012,7 @@ class MiniDNF():
                     what=what,
                 )
             )
+            self._dropQueryBase()
             if 'expire-cache' in what or 'all' in what:
                 for repo in self._base.repos.iter_enabled():
                     repo.md_expire_cache()
@@ -550,6 +1024,7 @@ class MiniDNF():
     def beginTransaction(self):
         try:
             logging.getLogger('dnf').addHandler(self._handler)
+            self._dropQueryBase()
             self._sink.verbose(_('Creating transaction'))
             self._base = self._createBase()
             self._baseTransaction = self._base.history.last().tid
@@ -632,27 +1107,103 @@ class MiniDNF():
             self._sink.error(e)
             raise
 
-    def _processTransaction(self, base=None):
+    def _verifyPackage(self, base, po):
+        result, errmsg = base.sigCheckPkg(po)
+        if result == 0:
+            pass
+        elif result == 1:
+            def _askGPG(d):
+                return self._sink.askForGPGKeyImport(
+                    d['userid'],
+                    d['hexkeyid'],
+                )
+            base.getKeyForPackage(po, fullaskcb=_askGPG)
+        else:
+            raise RuntimeError(errmsg)
+
+    def _downloadPackages(self, base, packages, events):
+        """Download packages, progress and completion are queued."""
         try:
             base.download_packages(
-                base.transaction.install_set,
-                progress=self._MyDownloadProgress(self._sink),
+                packages,
+                progress=self._MyDownloadProgress(
+                    self._MyQueueSink(events),
+                    downloaded=lambda payload: events.put(
+                        ('downloaded', (payload,))
+                    ),
+                ),
             )
-            for po in base.transaction.install_set:
-                result, errmsg = base.sigCheckPkg(po)
-                if result == 0:
-                    pass
-                elif result == 1:
-                    def _askGPG(d):
-                        return self._sink.askForGPGKeyImport(
-                            d['userid'],
-                            d['hexkeyid'],
-                        )
-                    base.getKeyForPackage(po, fullaskcb=_askGPG)
+            events.put(('done', (None,)))
+        except Exception as e:
+            events.put(('done', (e,)))
+
+    def _downloadAndVerify(self, base):
+        """Download packages to install and verify them.
+
+        Packages are downloaded by a background thread and each package
+        is verified once downloaded, so verification overlaps download
+        of the rest. Sink is called by this thread only. Packages not
+        reported as downloaded, such as packages of local repositories
+        used in place, are verified at end.
+        """
+        packages = list(base.transaction.install_set)
+        events = queue.Queue()
+        downloader = threading.Thread(
+            target=self._downloadPackages,
+            name='otopi.minidnf.download',
+            kwargs={
+                'base': base,
+                'packages': packages,
+                'events': events,
+            },
+        )
+        downloader.daemon = True
+        downloader.start()
+        verified = set()
+        try:
+            while True:
+                name, args = events.get()
+                if name == 'done':
+                    if args[0] is not None:
+                        raise args[0]
+                    break
+                elif name == 'downloaded':
+                    po = getattr(args[0], 'pkg', None)
+                    if po is not None and po not in verified:
+                        self._verifyPackage(base, po)
+                        verified.add(po)
                 else:
-                    raise RuntimeError(errmsg)
+                    getattr(self._sink, name)(*args)
+        finally:
+            downloader.join()
+        for po in packages:
+            if po not in verified:
+                self._verifyPackage(base, po)
+
+    def _processTransaction(self, base=None):
+        try:
+            self._downloadAndVerify(base)
+
+            staging = None
+            if (
+                base is self._base and
+                self._snapshot is not None and
+                not self._snapshotReplay
+            ):
+                staging = self._stageSnapshot(base)
+
+            self._dropQueryBase()
+            try:
+                base.do_transaction(
+                    display=self._MyTransactionDisplay(self._sink),
+                )
+            except Exception:
+                if staging is not None:
+                    shutil.rmtree(staging, ignore_errors=True)
+                raise
 
-            base.do_transaction(display=self._MyTransactionDisplay(self._sink))
+            if staging is not None:
+                self._captureSnapshot(staging)
         except Exception as e:
             self._sink.error(e)
             raise
@@ -705,19 +1256,15 @@ class MiniDNF():
     def install(self, packages, **kwargs):
         return self._queuePackages(
             _('install'),
-            self._base.install,
+            self._markInstall,
             packages,
             **kwargs
         )
 
     def installUpdate(self, packages, **kwargs):
-        def _installUpdate(p):
-            self._base.install(p)
-            try:
-                self._base.upgrade(p)
-            except dnf.exceptions.MarkingError:
-                # package is just now being queued for install
-                pass
+        def _installUpdate(pos, provides):
+            self._markInstall(pos, provides)
+            self._markUpgrade(pos, provides)
 
         return self._queuePackages(
             _('install/update'),
@@ -729,20 +1276,26 @@ class MiniDNF():
     def remove(self, packages, **kwargs):
         return self._queuePackages(
             _('erase'),
-            self._base.remove,
+            self._markRemove,
             packages,
+            installed=True,
             **kwargs
         )
 
     def update(self, packages, **kwargs):
         return self._queuePackages(
             _('update'),
-            self._base.upgrade,
+            self._markUpgrade,
             packages,
+            installed=True,
             **kwargs
         )
 
-    def queryPackages(self, patterns=None, showdups=False):
+    def queryPackages(
+        self,
+        patterns=None,
+        showdups=False,
+    ):
         try:
             ret = []
 
@@ -750,48 +1303,46 @@ class MiniDNF():
             available = []
             reinstall_available = []
 
-            if self._base is None:
-                base = _base = self._createBase()
-            else:
-                base = self._base
-                _base = None
-
-            try:
-                for pattern in patterns:
-                    q = dnf.subject.Subject(pattern).get_best_query(
-                        base.sack,
-                        with_provides=True,
-                    )
-
-                    # more or less copy from dnf
-                    dinst = {}
-                    ndinst = {}  # Newest versions by name.arch
-                    for po in q.installed():
-                        dinst[po.pkgtup] = po
-                        if showdups:
-                            continue
-                        key = (po.name, po.arch)
-                        if key not in ndinst or po > ndinst[key]:
-                            ndinst[key] = po
-                    installed = dinst.values()
-
-                    if not showdups:
-                        q = q.latest()
-                    for pkg in q:
-                        if showdups:
-                            if pkg.pkgtup in dinst:
-                                reinstall_available.append(pkg)
-                            else:
-                                available.append(pkg)
+            base = self._base
+            if base is None:
+                base = self._getQueryBase()
+
+            pkgs = set()
+            for matches, provides in self._resolvePatterns(
+                base.sack,
+                patterns,
+            ).values():
+                pkgs.update(matches)
+
+            if pkgs:
+                q = base.sack.query().filter(pkg=list(pkgs))
+
+                # more or less copy from dnf
+                dinst = {}
+                ndinst = {}  # Newest versions by name.arch
+                for po in q.installed():
+                    dinst[po.pkgtup] = po
+                    if showdups:
+                        continue
+                    key = (po.name, po.arch)
+                    if key not in ndinst or po > ndinst[key]:
+                        ndinst[key] = po
+                installed = dinst.values()
+
+                if not showdups:
+                    q = q.latest()
+                for pkg in q:
+                    if showdups:
+                        if pkg.pkgtup in dinst:
+                            reinstall_available.append(pkg)
                         else:
-                            key = (pkg.name, pkg.arch)
-                            if pkg.pkgtup in dinst:
-                                reinstall_available.append(pkg)
-                            elif key not in ndinst or pkg.evr_gt(ndinst[key]):
-                                available.append(pkg)
-            finally:
-                if _base is not None:
-                    self._destroyBase(_base)
+                            available.append(pkg)
+                    else:
+                        key = (pkg.name, pkg.arch)
+                        if pkg.pkgtup in dinst:
+                            reinstall_available.append(pkg)
+                        elif key not in ndinst or pkg.evr_gt(ndinst[key]):
+                            available.append(pkg)
 
             for op, l in (
                 ('available', available),
@@ -809,13 +1360,11 @@ class MiniDNF():
             raise
 
     def queryGroups(self):
-        if self._base is None:
-            base = _base = self._createBase()
-        else:
+        try:
             base = self._base
-            _base = None
+            if base is None:
+                base = self._getQueryBase()
 
-        try:
             return [
                 {
                     'operation': (
@@ -833,9 +1382,6 @@ class MiniDNF():
         except Exception as e:
             self._sink.error(e)
             raise
-        finally:
-            if _base is not None:
-                self._destroyBase(_base)
 
 
 class Example():
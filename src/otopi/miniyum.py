@@ -442,10 +442,18 @@ class MiniYum(object):
         return ret
 
     def _queryProvides(self, packages, showdups=None):
+        return self._selectProvides(
+            self._yb.searchPackageProvides(args=packages),
+            showdups=showdups,
+        )
+
+    def _selectProvides(self, pos, showdups=None):
+        """Select packages of legit arches, latest of each unless showdups.
+        """
         database = {}
         ret = []
 
-        for po in self._yb.searchPackageProvides(args=packages):
+        for po in pos:
             if po.arch in (
                 list(self._yb.arch.legit_multi_arches) +
                 ['noarch']
@@ -490,6 +498,39 @@ class MiniYum(object):
 
         return ret
 
+    def _resolveQueue(self, packages):
+        """Resolve provides and package lists of packages in one pass.
+
+        Provides matched by dependency string are attributed to the
+        package, others (globs, files) and packages having no valid
+        selection are left to be resolved separately.
+
+        Returns:
+        (provides, holder), provides is dict of package to list of
+        names of selected provides, holder is package lists of all.
+        """
+        matches = self._yb.searchPackageProvides(args=packages)
+        provides = {}
+        for package in packages:
+            pos = [
+                po for po, values in matches.items()
+                if package in values
+            ]
+            names = [
+                self._get_package_name(po)
+                for po in self._selectProvides(pos)
+            ]
+            # others resolved separately, failed if not found
+            if names:
+                provides[package] = names
+
+        holder = None
+        if provides:
+            holder = self._yb.doPackageLists(
+                patterns=sorted(set(sum(provides.values(), []))),
+            )
+        return provides, holder
+
     def _queue(
         self,
         action,
@@ -501,26 +542,45 @@ class MiniYum(object):
         ret = True
 
         with self._disableOutput:
+            packages = list(packages)
+            try:
+                provides, holder = self._resolveQueue(packages=packages)
+            except (RuntimeError, yum.Errors.YumBaseError) as e:
+                # resolve each package to attribute the error
+                self._sink.verbose('cannot resolve queue: %s' % e)
+                provides, holder = {}, None
+
             for package in packages:
                 try:
                     self._sink.verbose(
                         'queue package %s for %s' % (package, action)
                     )
 
-                    provides = self._queryProvides(packages=(package,))
+                    if package in provides:
+                        names = set(provides[package])
+                        pos = [
+                            po for po in getpackages(holder)
+                            if self._get_package_name(po) in names
+                        ]
+                    else:
+                        pos = self._queryProvides(packages=(package,))
+
+                        if not pos:
+                            raise RuntimeError(
+                                _('Package {package} cannot be found').format(
+                                    package=package,
+                                )
+                            )
 
-                    if not provides:
-                        raise RuntimeError(
-                            _('Package {package} cannot be found').format(
-                                package=package,
+                        pos = getpackages(
+                            self._yb.doPackageLists(
+                                patterns=[
+                                    self._get_package_name(p) for p in pos
+                                ],
                             )
                         )
 
-                    holder = self._yb.doPackageLists(
-                        patterns=[self._get_package_name(p) for p in provides],
-                    )
-
-                    for po in getpackages(holder):
+                    for po in pos:
                         self._sink.verbose(
                             'processing package %s for %s' % (po, action)
                         )
@@ -721,6 +781,36 @@ class MiniYum(object):
             self._sink.error(e)
             raise
 
+    def setMetadataExpire(self, maxAge):
+        """Expire metadata and set its expiration.
+
+        Metadata is expired now, so repomd.xml of each repository is
+        checked when repository is set up and metadata is kept if it
+        was not modified. Later, metadata is checked once older than
+        maxAge.
+
+        Keyword arguments:
+        maxAge -- maximum age in seconds.
+
+        """
+        try:
+            with self._disableOutput:
+                self._yb.cleanExpireCache()
+            for repo in self._yb.repos.listEnabled():
+                self._sink.verbose(
+                    _(
+                        'Repository {repo}: checking repomd.xml, '
+                        'maximum age {maxAge}'
+                    ).format(
+                        repo=repo.id,
+                        maxAge=maxAge,
+                    )
+                )
+                repo.metadata_expire = maxAge
+        except Exception as e:
+            self._sink.error(e)
+            raise
+
     def beginTransaction(self):
         """Lock (begin of transaction)
 
@@ -993,7 +1083,12 @@ class MiniYum(object):
 
         return ret
 
-    def queryPackages(self, pkgnarrow='all', patterns=None, showdups=None):
+    def queryPackages(
+        self,
+        pkgnarrow='all',
+        patterns=None,
+        showdups=None,
+    ):
         try:
             with self._disableOutput:
                 ret = []
@@ -0,0 +1,235 @@
+#
+# otopi -- plugable installer
+# Copyright (C) 2012-2013 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""Package query result."""
+
+
+import re
+
+
+from . import util
+
+
+@util.export
+class PackageList(object):
+    """Compact indexed package query result.
+
+    Entries are kept as tuples of FIELDS, indexed by name and by
+    (name, arch). Entries are set and returned as dicts, the result
+    supports the list operations so it can be used as the list of
+    dicts it replaces.
+
+    """
+
+    __slots__ = ('_entries', '_byName', '_byNameArch')
+
+    __hash__ = None
+
+    FIELDS = (
+        'operation',
+        'display_name',
+        'name',
+        'version',
+        'release',
+        'epoch',
+        'arch',
+    )
+
+    _NAME = FIELDS.index('name')
+    _ARCH = FIELDS.index('arch')
+    _OPERATION = FIELDS.index('operation')
+    _RE_SEGMENT = re.compile(r'(\d+|[A-Za-z]+)')
+
+    @classmethod
+    def evr(clz, entry):
+        """Sort key of entry by epoch, version and release.
+
+        Segments are compared as rpm does, numeric segments are newer
+        than alphabetic ones.
+
+        """
+        def _segments(s):
+            return tuple(
+                (1, int(x)) if x.isdigit() else (0, x)
+                for x in clz._RE_SEGMENT.findall(s)
+            )
+        return (
+            int(entry['epoch'] or 0),
+            _segments(entry['version']),
+            _segments(entry['release']),
+        )
+
+    def __init__(self, entries=()):
+        self._entries = []
+        self._byName = {}
+        self._byNameArch = {}
+        self.extend(entries)
+
+    def _row(self, entry):
+        return tuple(entry[f] for f in self.FIELDS)
+
+    def _dict(self, row):
+        return dict(zip(self.FIELDS, row))
+
+    def _index(self, index, row):
+        self._byName.setdefault(row[self._NAME], []).append(index)
+        self._byNameArch.setdefault(
+            (row[self._NAME], row[self._ARCH]),
+            [],
+        ).append(index)
+
+    def _reindex(self):
+        self._byName = {}
+        self._byNameArch = {}
+        for index, row in enumerate(self._entries):
+            self._index(index, row)
+
+    def _select(self, indices, operation):
+        return [
+            self._dict(self._entries[i])
+            for i in indices
+            if (
+                operation is None or
+                self._entries[i][self._OPERATION] == operation
+            )
+        ]
+
+    def names(self):
+        """Names of packages."""
+        return list(self._byName.keys())
+
+    def byName(self, name, operation=None):
+        """Entries of name, optionally of operation only."""
+        return self._select(self._byName.get(name, ()), operation)
+
+    def byNameArch(self, name, arch, operation=None):
+        """Entries of name and arch, optionally of operation only."""
+        return self._select(self._byNameArch.get((name, arch), ()), operation)
+
+    def latest(self, name, operation=None):
+        """Latest entry of name, None if none."""
+        entries = self.byName(name, operation=operation)
+        return max(entries, key=self.evr) if entries else None
+
+    #
+    # list
+    #
+
+    def append(self, entry):
+        """Append entry, a dict having FIELDS."""
+        row = self._row(entry)
+        self._entries.append(row)
+        self._index(len(self._entries) - 1, row)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def insert(self, index, entry):
+        self._entries.insert(index, self._row(entry))
+        self._reindex()
+
+    def pop(self, index=-1):
+        row = self._entries.pop(index)
+        self._reindex()
+        return self._dict(row)
+
+    def remove(self, entry):
+        self._entries.remove(self._row(entry))
+        self._reindex()
+
+    def index(self, entry, *args):
+        return self._entries.index(self._row(entry), *args)
+
+    def count(self, entry):
+        return self._entries.count(self._row(entry))
+
+    def sort(self, key=None, reverse=False):
+        """Sort in place, key is called with entry dicts."""
+        self._entries.sort(
+            key=None if key is None else lambda row: key(self._dict(row)),
+            reverse=reverse,
+        )
+        self._reindex()
+
+    def reverse(self):
+        self._entries.reverse()
+        self._reindex()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        for row in self._entries:
+            yield self._dict(row)
+
+    def __reversed__(self):
+        for row in reversed(self._entries):
+            yield self._dict(row)
+
+    def __contains__(self, entry):
+        return self._row(entry) in self._entries
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            ret = PackageList()
+            ret._entries = self._entries[index]
+            ret._reindex()
+            return ret
+        return self._dict(self._entries[index])
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self._entries[index] = [self._row(entry) for entry in value]
+        else:
+            self._entries[index] = self._row(value)
+        self._reindex()
+
+    def __delitem__(self, index):
+        del self._entries[index]
+        self._reindex()
+
+    def __add__(self, other):
+        ret = PackageList(self)
+        ret.extend(other)
+        return ret
+
+    def __radd__(self, other):
+        ret = PackageList(other)
+        ret.extend(self)
+        return ret
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, PackageList)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -29,6 +29,7 @@ packager.
 import gettext
 
 
+from . import packagelist
 from . import util
 
 
@@ -179,11 +180,14 @@ class PackagerBase(object):
         """
         return []
 
-    def queryPackages(self, patterns=None, listAll=False):
+    def queryPackages(self, patterns=None, listAll=False, installedOnly=False):
         """Query packages.
 
         Keyword arguments:
         patterns -- patterns to query.
+        listAll -- list all versions.
+        installedOnly -- query installed packages only, answered from
+            rpmdb without loading repository metadata.
 
         Returns:
             [
@@ -197,9 +201,11 @@ class PackagerBase(object):
                     'arch':,
                 },
             ]
+            as packagelist.PackageList, a list of dicts also indexed by
+            name and by (name, arch).
 
         """
-        return []
+        return packagelist.PackageList()
 
 
 # vim: expandtab tabstop=4 shiftwidth=4
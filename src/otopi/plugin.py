@@ -403,6 +403,7 @@ class PluginBase(base.Base):
 
         _callCallback.next = datetime.datetime.now()
 
+        start_time = time.time()
         end_time = datetime.datetime.now()
         if timeout is None:
             end_time += datetime.timedelta(days=3650)
@@ -616,6 +617,7 @@ class PluginBase(base.Base):
                     i,
                     p['args']['args'],
                     p['popen'].returncode,
+                    extra={'duration': time.time() - start_time},
                 )
 
             return {
@@ -859,6 +861,7 @@ class PluginBase(base.Base):
                             )
                         )
 
+            start_time = time.time()
             p = subprocess.Popen(
                 args,
                 executable=executable,
@@ -876,6 +879,7 @@ class PluginBase(base.Base):
                 'execute-result: %s, rc=%s',
                 args,
                 rc,
+                extra={'duration': time.time() - start_time},
             )
         except:
             self.logger.debug(
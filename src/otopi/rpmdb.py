@@ -0,0 +1,138 @@
+#
+# otopi -- plugable installer
+# Copyright (C) 2012-2013 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""Installed packages read directly from rpmdb."""
+
+
+import re
+
+
+import rpm
+
+
+from . import util
+
+
+_RE_NEVRA = re.compile(r'^[A-Za-z0-9_.+:-]+$')
+
+
+def _str(v):
+    return v.decode('utf-8') if isinstance(v, bytes) else v
+
+
+def _info(header, epochType):
+    info = {
+        'name': _str(header['name']),
+        'version': _str(header['version']),
+        'release': _str(header['release']),
+        'epoch': epochType(header['epoch'] or 0),
+        'arch': _str(header['arch']),
+    }
+    info['display_name'] = '%s%s-%s-%s.%s' % (
+        '' if info['epoch'] == '0' else '%s:' % info['epoch'],
+        info['name'],
+        info['version'],
+        info['release'],
+        info['arch'],
+    )
+    return info
+
+
+def _match(ts, pattern):
+    """Match installed headers by name, glob, nevra, file or provide."""
+    if pattern.startswith('/'):
+        return list(ts.dbMatch('basenames', pattern))
+
+    if any(c in pattern for c in '*?['):
+        mi = ts.dbMatch()
+        mi.pattern('name', rpm.RPMMIRE_GLOB, pattern)
+        return list(mi)
+
+    headers = list(ts.dbMatch('name', pattern))
+    if not headers and _RE_NEVRA.match(pattern):
+        for i, c in enumerate(pattern):
+            if c not in '-.':
+                continue
+            for header in ts.dbMatch('name', pattern[:i]):
+                p = _info(header, str)
+                e = '%s:' % p['epoch']
+                if pattern in (
+                    '%s.%s' % (p['name'], p['arch']),
+                    '%s-%s' % (p['name'], p['version']),
+                    '%s-%s-%s' % (p['name'], p['version'], p['release']),
+                    '%s-%s%s-%s' % (
+                        p['name'], e, p['version'], p['release'],
+                    ),
+                    '%s-%s-%s.%s' % (
+                        p['name'], p['version'], p['release'], p['arch'],
+                    ),
+                    '%s-%s%s-%s.%s' % (
+                        p['name'], e, p['version'], p['release'], p['arch'],
+                    ),
+                ):
+                    headers.append(header)
+    if not headers:
+        headers = list(ts.dbMatch('providename', pattern))
+    return headers
+
+
+@util.export
+def queryInstalled(patterns=None, root='/', epochType=str):
+    """Query installed packages without loading repository metadata.
+
+    Keyword arguments:
+    patterns -- names, globs, name.arch or nevra forms, file names or
+        provides, None for all packages.
+    root -- root of rpmdb.
+    epochType -- type of epoch in result, as returned by the normal
+        query of the packager, int for dnf, str for yum.
+
+    Returns:
+    list of package info dicts, operation is 'installed'.
+
+    """
+    ts = rpm.TransactionSet(root)
+    try:
+        if patterns is None:
+            headers = list(ts.dbMatch())
+        else:
+            headers = [
+                header
+                for pattern in patterns
+                for header in _match(ts, pattern)
+            ]
+
+        ret = []
+        seen = set()
+        for header in headers:
+            # gpg-pubkey
+            if header['arch'] is None:
+                continue
+            info = _info(header, epochType)
+            if info['display_name'] not in seen:
+                seen.add(info['display_name'])
+                info['operation'] = 'installed'
+                ret.append(info)
+        return ret
+    finally:
+        ts.closeDB()
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
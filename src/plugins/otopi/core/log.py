@@ -21,13 +21,19 @@
 """Log plugin."""
 
 
+import codecs
 import gettext
+import json
 import logging
 import os
+import queue
 import random
+import re
 import string
 import tempfile
+import threading
 import time
+import zlib
 
 
 from otopi import common
@@ -36,6 +42,12 @@ from otopi import plugin
 from otopi import util
 
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
 def _(m):
     return gettext.dgettext(message=m, domain='otopi')
 
@@ -53,6 +65,11 @@ class Plugin(plugin.PluginBase):
         CoreEnv.LOG_FILE_NAME -- file name.
         CoreEnv.LOG_FILTER -- list of strings to flter out.
         CoreEnv.LOG_REMOVE_AT_EXIT -- True if to remove log.
+        CoreEnv.LOG_ASYNC -- True if to write log from background thread.
+        CoreEnv.LOG_JSON -- True if to write also JSON lines log.
+        CoreEnv.LOG_JSON_FILE_NAME -- JSON lines log file name.
+        CoreEnv.LOG_COMPRESS -- compression method, None to disable.
+        CoreEnv.LOG_STREAM -- True if to stream log to manager.
 
     OS Environment:
         SystemEnvironment.LOG_FILE -- log file name, default self genmerate.
@@ -78,6 +95,29 @@ class Plugin(plugin.PluginBase):
         def environment(self):
             return self._environment
 
+        def _compile(self, tokens):
+            """
+            Compile tokens into a single expression.
+
+            The expression is kept until the tokens change, so the
+            cost is paid only when filter list or values are modified.
+
+            At every position the longest token wins, so the matches
+            cover exactly the same spans as searching for each token.
+            """
+            tokens = tuple(tokens)
+            if tokens != self._tokens:
+                self._tokens = tokens
+                tofilter = sorted(
+                    set(t for t in tokens if t not in (None, '')),
+                    key=len,
+                    reverse=True,
+                )
+                self._pattern = re.compile(
+                    '(?=(%s))' % '|'.join(re.escape(t) for t in tofilter)
+                ) if tofilter else None
+            return self._pattern
+
         def _filter(self, content, tokens):
             """
             Filter overlapping tokens within content.
@@ -88,36 +128,40 @@ class Plugin(plugin.PluginBase):
             content=aaaababbbb, tokens=('aaab', 'aaa', 'bbb')
             """
 
-            def _insertFilter(content, begin, end):
-                return content[:begin] + '**FILTERED**' + content[end:]
+            pattern = self._compile(tokens)
+            if pattern is None:
+                return content
 
-            tofilter = []
-
-            for token in tokens:
-                if token not in (None, ''):
-                    index = -1
-                    while True:
-                        index = content.find(token, index+1)
-                        if index == -1:
-                            break
-                        tofilter.append((index, index + len(token)))
-
-            tofilter = sorted(tofilter, key=lambda e: e[1], reverse=True)
+            ret = []
+            last = 0
             begin = None
             end = None
-            for entry in tofilter:
-                if begin is None or entry[1] < begin:
+            for match in pattern.finditer(content):
+                if begin is not None and match.start() <= end:
+                    end = max(end, match.end(1))
+                else:
                     if begin is not None:
-                        content = _insertFilter(content, begin, end)
-                    begin = entry[0]
-                    end = entry[1]
-                elif entry[0] < begin:
-                    begin = entry[0]
-            else:
-                if begin is not None:
-                    content = _insertFilter(content, begin, end)
-
-            return content
+                        ret.append(content[last:begin])
+                        ret.append('**FILTERED**')
+                        last = end
+                    begin = match.start()
+                    end = match.end(1)
+            if begin is None:
+                return content
+            ret.append(content[last:begin])
+            ret.append('**FILTERED**')
+            ret.append(content[end:])
+
+            return ''.join(ret)
+
+        def _getTokens(self):
+            return (
+                self.environment[constants.CoreEnv.LOG_FILTER]._list +
+                [
+                    self.environment.get(k, None) for k in
+                    self.environment[constants.CoreEnv.LOG_FILTER_KEYS]
+                ]
+            )
 
         def __init__(
             self,
@@ -127,23 +171,450 @@ class Plugin(plugin.PluginBase):
         ):
             logging.Formatter.__init__(self, fmt=fmt, datefmt=datefmt)
             self._environment = environment
+            self._tokens = ()
+            self._pattern = None
 
         def format(self, record):
             return self._filter(
                 logging.Formatter.format(self, record),
-                (
-                    self.environment[constants.CoreEnv.LOG_FILTER]._list +
-                    [
-                        self.environment.get(k, None) for k in
-                        self.environment[constants.CoreEnv.LOG_FILTER_KEYS]
-                    ]
+                self._getTokens(),
+            )
+
+    class _MyCompressedStream(object):
+        """Text stream written through a streaming compressor.
+
+        Compressor is sync flushed at most every SYNC_INTERVAL seconds
+        when flushed, and always when synced, so a partially written
+        log can be decompressed up to the last sync point. A flush
+        within the interval arms a timer, so content of an idle log is
+        synced at most SYNC_INTERVAL seconds after it was flushed.
+
+        Appending to an existing log starts a new gzip member or zstd
+        frame, concatenated members/frames are valid.
+
+        fileno() is a pipe, content written to it is compressed as
+        well, so standard handles may be redirected into the log.
+        """
+
+        SYNC_INTERVAL = 5
+        CHUNK_SIZE = 4096
+        CLOSE_TIMEOUT = 5
+
+        def __init__(self, name, method):
+            self._lock = threading.RLock()
+            self._pipe = None
+            self._reader = None
+            self._file = open(name, 'ab')
+            if method == constants.Const.LOG_COMPRESS_ZSTD:
+                self._compressor = zstandard.ZstdCompressor().compressobj()
+                self._syncMode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+                self._finishMode = zstandard.COMPRESSOBJ_FLUSH_FINISH
+            else:
+                self._compressor = zlib.compressobj(
+                    6,
+                    zlib.DEFLATED,
+                    16 + zlib.MAX_WBITS,    # gzip header
+                )
+                self._syncMode = zlib.Z_SYNC_FLUSH
+                self._finishMode = zlib.Z_FINISH
+            self._lastSync = time.time()
+            self._dirty = False
+            self._timer = None
+
+        def _timedSync(self):
+            with self._lock:
+                self._timer = None
+                self.sync()
+
+        def _readPipe(self):
+            decoder = codecs.getincrementaldecoder('utf-8')('replace')
+            while True:
+                data = os.read(self._pipe[0], self.CHUNK_SIZE)
+                if not data:
+                    break
+                self.write(decoder.decode(data))
+                self.flush()
+
+        @property
+        def closed(self):
+            return self._file is None
+
+        def fileno(self):
+            with self._lock:
+                if self._pipe is None:
+                    self._pipe = os.pipe()
+                    self._reader = threading.Thread(
+                        target=self._readPipe,
+                        name='otopi.core.log.stdio',
+                    )
+                    self._reader.daemon = True
+                    self._reader.start()
+                return self._pipe[1]
+
+        def isatty(self):
+            return False
+
+        def write(self, text):
+            with self._lock:
+                if self._file is not None:
+                    self._file.write(
+                        self._compressor.compress(text.encode('utf-8'))
+                    )
+                    self._dirty = True
+
+        def sync(self):
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if self._file is not None and self._dirty:
+                    self._file.write(self._compressor.flush(self._syncMode))
+                    self._file.flush()
+                    self._dirty = False
+                self._lastSync = time.time()
+
+        def flush(self):
+            with self._lock:
+                if not self._dirty or self._timer is not None:
+                    return
+                remaining = self._lastSync + self.SYNC_INTERVAL - time.time()
+                if remaining <= 0:
+                    self.sync()
+                else:
+                    self._timer = threading.Timer(remaining, self._timedSync)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+        def close(self):
+            if self._pipe is not None:
+                #
+                # Standard handles may still point to our pipe,
+                # detach them so reader gets end of file.
+                #
+                pipestat = os.fstat(self._pipe[1])
+                null = os.open(os.devnull, os.O_WRONLY)
+                for fd in (1, 2):
+                    try:
+                        fdstat = os.fstat(fd)
+                    except OSError:
+                        continue
+                    if (
+                        (fdstat.st_dev, fdstat.st_ino) ==
+                        (pipestat.st_dev, pipestat.st_ino)
+                    ):
+                        os.dup2(null, fd)
+                os.close(null)
+                os.close(self._pipe[1])
+                self._reader.join(self.CLOSE_TIMEOUT)
+                if not self._reader.is_alive():
+                    os.close(self._pipe[0])
+                self._pipe = None
+
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if self._file is not None:
+                    self._file.write(
+                        self._compressor.flush(self._finishMode)
+                    )
+                    self._file.close()
+                    self._file = None
+
+    class _MyJsonFormatter(_MyFormatter):
+        """Format entries as JSON lines with typed fields.
+
+        Fields are extracted from the arguments of well known
+        messages, optionally logged by a specific function only, all
+        string values are filtered.
+        """
+
+        EVENTS = {
+            'STAGE %s': (
+                'stage',
+                ('stage',),
+                'runSequence',
+            ),
+            'Stage %s METHOD %s': (
+                'method',
+                ('stage', 'method'),
+                None,
+            ),
+            "ENV %s=%s:'%s'": (
+                'env',
+                ('key', 'type', 'value'),
+                None,
+            ),
+            "execute: %s, executable='%s', cwd='%s', env=%s": (
+                'execute',
+                ('args', 'executable', 'cwd', None),
+                None,
+            ),
+            'execute-result: %s, rc=%s': (
+                'execute-result',
+                ('args', 'rc'),
+                None,
+            ),
+            'execute-result: %s, exception': (
+                'execute-exception',
+                ('args',),
+                None,
+            ),
+            'executePipe-result: [%s] %s, rc=%s': (
+                'execute-result',
+                ('index', 'args', 'rc'),
+                None,
+            ),
+        }
+
+        def _value(self, value, tokens):
+            if value is None or isinstance(value, (bool, int, float)):
+                return value
+            elif isinstance(value, (list, tuple)):
+                return [self._value(v, tokens) for v in value]
+            else:
+                return self._filter(common.toStr(value), tokens)
+
+        def __init__(
+            self,
+            datefmt=None,
+            environment=None,
+        ):
+            Plugin._MyFormatter.__init__(
+                self,
+                fmt='%(message)s',
+                datefmt=datefmt,
+                environment=environment,
+            )
+
+        def format(self, record):
+            tokens = self._getTokens()
+            entry = {
+                'time': self.formatTime(record, self.datefmt),
+                'level': record.levelname,
+                'logger': record.name,
+                'module': record.module,
+                'function': record.funcName,
+                'line': record.lineno,
+                'message': self._filter(
+                    logging.Formatter.format(self, record),
+                    tokens,
                 ),
+            }
+
+            args = record.args
+            event = self.EVENTS.get(record.msg)
+            if (
+                event is not None and
+                event[2] in (None, record.funcName) and
+                isinstance(args, tuple) and
+                len(args) == len(event[1])
+            ):
+                entry['event'] = event[0]
+                for name, value in zip(event[1], args):
+                    if name is not None:
+                        entry[name] = self._value(value, tokens)
+
+            duration = getattr(record, 'duration', None)
+            if duration is not None:
+                entry['duration'] = round(duration, 3)
+
+            return json.dumps(entry, sort_keys=True)
+
+    class _MyAsyncHandler(logging.StreamHandler):
+        """Write records from a background thread.
+
+        Records are formatted (and so filtered) by the caller, so the
+        filter tokens in effect at the time of the call are used, and
+        the resulting lines are written in batches by the writer
+        thread. The queue is bounded, the caller blocks when writer
+        falls behind.
+
+        flush() is a barrier, it returns after all records queued
+        before it were written.
+        """
+
+        QUEUE_SIZE = 10000
+        BATCH_SIZE = 1000
+
+        def __init__(self, stream=None):
+            logging.StreamHandler.__init__(self, stream)
+            self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+            self._thread = threading.Thread(
+                target=self._writer,
+                name='otopi.core.log.writer',
             )
+            self._thread.daemon = True
+            self._thread.start()
+
+        def _writer(self):
+            stop = False
+            while not stop:
+                entries = [self._queue.get()]
+                try:
+                    while len(entries) < self.BATCH_SIZE:
+                        entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    pass
+
+                lines = []
+                barriers = []
+                for entry in entries:
+                    if entry is None:
+                        stop = True
+                    elif isinstance(entry, tuple):
+                        lines.append(entry)
+                    else:
+                        barriers.append(entry)
+
+                if lines:
+                    try:
+                        self.stream.write(
+                            ''.join(line for line, record in lines)
+                        )
+                        self.stream.flush()
+                    except Exception:
+                        self.handleError(lines[0][1])
+
+                for barrier in barriers:
+                    barrier.set()
+
+        def emit(self, record):
+            if not self._thread.is_alive():
+                logging.StreamHandler.emit(self, record)
+                return
+
+            try:
+                self._queue.put((self.format(record) + '\n', record))
+            except Exception:
+                self.handleError(record)
+
+        def flush(self):
+            if self._thread.is_alive():
+                barrier = threading.Event()
+                self._queue.put(barrier)
+                barrier.wait()
+
+        def close(self):
+            if self._thread.is_alive():
+                self._queue.put(None)
+                self._thread.join()
+            logging.StreamHandler.close(self)
+
+    class _MyStreamHandler(logging.Handler):
+        """Stream records to the manager via the dialog.
+
+        Records are formatted (and so filtered) when emitted, and sent
+        zlib compressed in batches when BATCH_SIZE bytes are pending,
+        every INTERVAL seconds and when flushed.
+
+        Batches are sent only from the thread that created the handler,
+        so they are not interleaved with dialog messages. Nothing is
+        sent until activated.
+        """
+
+        BATCH_SIZE = 65536
+        INTERVAL = 5
+
+        def __init__(self, dialog):
+            logging.Handler.__init__(self)
+            self._dialog = dialog
+            self._thread = threading.current_thread()
+            self._records = []
+            self._size = 0
+            self._lastSend = time.time()
+            self._sending = False
+            self._active = False
+
+        def _send(self):
+            """Send pending records.
+
+            Returns:
+            True if nothing is pending.
+            """
+            if (
+                self._records and
+                self._active and
+                not self._sending and
+                threading.current_thread() is self._thread
+            ):
+                self._sending = True
+                try:
+                    data = '\n'.join(self._records)
+                    if not isinstance(data, bytes):
+                        data = data.encode('utf-8')
+                    if self._dialog().streamLog(data=zlib.compress(data)):
+                        self._records = []
+                        self._size = 0
+                        self._lastSend = time.time()
+                finally:
+                    self._sending = False
+            return not self._records
+
+        def activate(self):
+            """Start sending, returns False if dialog refused."""
+            self.acquire()
+            try:
+                self._active = True
+                return self._send()
+            finally:
+                self.release()
+
+        def emit(self, record):
+            try:
+                line = common.toStr(self.format(record))
+                self._records.append(line)
+                self._size += len(line) + 1
+                if (
+                    self._size >= self.BATCH_SIZE or
+                    time.time() - self._lastSend >= self.INTERVAL
+                ):
+                    self._send()
+            except Exception:
+                self.handleError(record)
+
+        def flush(self):
+            self.acquire()
+            try:
+                self._send()
+            finally:
+                self.release()
 
     def __init__(self, context):
         super(Plugin, self).__init__(context=context)
         self._handler = None
+        self._jsonHandler = None
+        self._jsonHandle = None
+        self._streamHandler = None
         self._logerror = None
+        self._jsonlogerror = None
+        self._compresserror = None
+
+    def _createHandler(self, stream, formatter):
+        handler = (
+            self._MyAsyncHandler
+            if self.environment[constants.CoreEnv.LOG_ASYNC]
+            else logging.StreamHandler
+        )(stream)
+        handler.setLevel(logging.DEBUG)
+        handler.setFormatter(formatter)
+        logging.getLogger(constants.Log.LOGGER_BASE).addHandler(handler)
+        return handler
+
+    def _createFormatter(self):
+        return self._MyFormatter(
+            fmt=(
+                '%(asctime)s %(levelname)s %(name)s '
+                '%(module)s.%(funcName)s:%(lineno)d '
+                '%(message)s'
+            ),
+            datefmt='%Y-%m-%d %H:%M:%S',
+            environment=self.environment,
+        )
+
+    def _removeHandler(self, handler):
+        logging.getLogger(constants.Log.LOGGER_BASE).removeHandler(handler)
+        handler.close()
 
     def _setupLogging(self):
         self.environment[constants.CoreEnv.LOG_FILE_HANDLE] = None
@@ -153,6 +624,39 @@ class Plugin(plugin.PluginBase):
             constants.CoreEnv.LOG_FILE_NAME_PREFIX,
             constants.Defaults.LOG_FILE_PREFIX
         )
+        self.environment.setdefault(
+            constants.CoreEnv.LOG_ASYNC,
+            False
+        )
+        self.environment.setdefault(
+            constants.CoreEnv.LOG_JSON,
+            False
+        )
+        logAsync = self.environment[constants.CoreEnv.LOG_ASYNC]
+        logCompress = self.environment.setdefault(
+            constants.CoreEnv.LOG_COMPRESS,
+            None
+        )
+        if logCompress not in (
+            None,
+            constants.Const.LOG_COMPRESS_GZIP,
+            constants.Const.LOG_COMPRESS_ZSTD,
+        ):
+            self._compresserror = _(
+                "Unsupported log compression '{method}'"
+            ).format(
+                method=logCompress,
+            )
+            logCompress = None
+        elif (
+            logCompress == constants.Const.LOG_COMPRESS_ZSTD and
+            zstandard is None
+        ):
+            self._compresserror = _(
+                'zstandard module is not available, using gzip'
+            )
+            logCompress = constants.Const.LOG_COMPRESS_GZIP
+        self.environment[constants.CoreEnv.LOG_COMPRESS] = logCompress
 
         #
         # Allow system environment to override both
@@ -174,7 +678,7 @@ class Plugin(plugin.PluginBase):
                 constants.CoreEnv.LOG_FILE_NAME,
                 os.path.join(
                     self.environment[constants.CoreEnv.LOG_DIR],
-                    "%s-%s-%s.log" % (
+                    "%s-%s-%s.log%s" % (
                         self.environment[
                             constants.CoreEnv.LOG_FILE_NAME_PREFIX
                         ],
@@ -186,7 +690,11 @@ class Plugin(plugin.PluginBase):
                                     string.digits
                                 ) for i in range(6)
                             ]
-                        )
+                        ),
+                        {
+                            constants.Const.LOG_COMPRESS_GZIP: '.gz',
+                            constants.Const.LOG_COMPRESS_ZSTD: '.zst',
+                        }.get(logCompress, ''),
                     )
                 )
             ),
@@ -199,44 +707,90 @@ class Plugin(plugin.PluginBase):
         os.environ[constants.SystemEnvironment.LOG_FILE] = logFileName
 
         try:
-            self.environment[constants.CoreEnv.LOG_FILE_HANDLE] = open(
-                logFileName,
-                mode='a',
-                buffering=1,
-            )
+            if logCompress is not None:
+                self.environment[
+                    constants.CoreEnv.LOG_FILE_HANDLE
+                ] = self._MyCompressedStream(
+                    name=logFileName,
+                    method=logCompress,
+                )
+            else:
+                self.environment[constants.CoreEnv.LOG_FILE_HANDLE] = open(
+                    logFileName,
+                    mode='a',
+                    buffering=-1 if logAsync else 1,
+                )
         except IOError as e:
             self._logerror = common.toStr(e)
+            self.environment[constants.CoreEnv.LOG_COMPRESS] = None
             self.environment[constants.CoreEnv.LOG_FILE_HANDLE] = open(
                 os.devnull,
                 mode='a',
                 buffering=1,
             )
 
-        self._handler = logging.StreamHandler(
-            self.environment[constants.CoreEnv.LOG_FILE_HANDLE]
+        self._handler = self._createHandler(
+            stream=self.environment[constants.CoreEnv.LOG_FILE_HANDLE],
+            formatter=self._createFormatter(),
         )
-        self._handler.setLevel(logging.DEBUG)
-        self._handler.setFormatter(
-            self._MyFormatter(
-                fmt=(
-                    '%(asctime)s %(levelname)s %(name)s '
-                    '%(module)s.%(funcName)s:%(lineno)d '
-                    '%(message)s'
-                ),
-                datefmt='%Y-%m-%d %H:%M:%S',
-                environment=self.environment,
+
+        if self.environment.setdefault(
+            constants.CoreEnv.LOG_STREAM,
+            False
+        ):
+            #
+            # Records are kept until dialog is available
+            #
+            self._streamHandler = self._MyStreamHandler(
+                dialog=lambda: self.dialog,
             )
-        )
-        l = logging.getLogger("otopi")
-        l.addHandler(self._handler)
+            self._streamHandler.setLevel(logging.DEBUG)
+            self._streamHandler.setFormatter(self._createFormatter())
+            logging.getLogger(constants.Log.LOGGER_BASE).addHandler(
+                self._streamHandler
+            )
+
+        if self.environment[constants.CoreEnv.LOG_JSON]:
+            jsonFileName = self.environment.setdefault(
+                constants.CoreEnv.LOG_JSON_FILE_NAME,
+                '%s.jsonl' % os.path.splitext(logFileName)[0],
+            )
+            try:
+                self._jsonHandle = open(
+                    jsonFileName,
+                    mode='a',
+                    buffering=-1 if logAsync else 1,
+                )
+            except IOError as e:
+                self._jsonlogerror = common.toStr(e)
+            else:
+                self._jsonHandler = self._createHandler(
+                    stream=self._jsonHandle,
+                    formatter=self._MyJsonFormatter(
+                        datefmt='%Y-%m-%dT%H:%M:%S',
+                        environment=self.environment,
+                    ),
+                )
+
+    def _closeStream(self):
+        if self._streamHandler is not None:
+            self._streamHandler.flush()
+            self._removeHandler(self._streamHandler)
+            self._streamHandler = None
 
     def _closeLogging(self):
+        self._closeStream()
+
         if self._handler is not None:
-            l = logging.getLogger("otopi")
-            l.removeHandler(self._handler)
-            self._handler.close()
+            self._removeHandler(self._handler)
             self._handler = None
 
+        if self._jsonHandler is not None:
+            self._removeHandler(self._jsonHandler)
+            self._jsonHandler = None
+            self._jsonHandle.close()
+            self._jsonHandle = None
+
         if (
             self.environment.setdefault(
                 constants.CoreEnv.LOG_FILE_HANDLE,
@@ -246,24 +800,33 @@ class Plugin(plugin.PluginBase):
             self.environment[constants.CoreEnv.LOG_FILE_HANDLE].close()
             self.environment[constants.CoreEnv.LOG_FILE_HANDLE] = None
 
-        if (
-            self.environment.setdefault(
-                constants.CoreEnv.LOG_REMOVE_AT_EXIT,
-                False
-            ) and
-            self.environment.setdefault(
-                constants.CoreEnv.LOG_FILE_NAME,
-                None
-            ) is not None
+        if self.environment.setdefault(
+            constants.CoreEnv.LOG_REMOVE_AT_EXIT,
+            False
         ):
-            try:
-                os.unlink(self.environment[constants.CoreEnv.LOG_FILE_NAME])
-            except OSError:
-                pass
+            for key in (
+                constants.CoreEnv.LOG_FILE_NAME,
+                constants.CoreEnv.LOG_JSON_FILE_NAME,
+            ):
+                if self.environment.get(key) is not None:
+                    try:
+                        os.unlink(self.environment[key])
+                    except OSError:
+                        pass
 
     def _notification(self, event):
         if event == self.context.NOTIFY_REEXEC:
             self._closeLogging()
+        elif event == self.context.NOTIFY_ERROR:
+            for handler in (
+                self._handler,
+                self._jsonHandler,
+                self._streamHandler,
+            ):
+                if handler is not None:
+                    handler.flush()
+            if self.environment[constants.CoreEnv.LOG_COMPRESS] is not None:
+                self.environment[constants.CoreEnv.LOG_FILE_HANDLE].sync()
 
     @plugin.event(
         name=constants.Stages.CORE_LOG_INIT,
@@ -285,6 +848,8 @@ class Plugin(plugin.PluginBase):
         priority=plugin.Stages.PRIORITY_HIGH,
     )
     def _setup(self):
+        if self._compresserror:
+            self.logger.warning(self._compresserror)
         if self._logerror:
             self.logger.warning(
                 _("Cannot open log file '{logFileName}': {error}").format(
@@ -302,6 +867,37 @@ class Plugin(plugin.PluginBase):
                     ],
                 )
             )
+        if self._jsonlogerror:
+            self.logger.warning(
+                _("Cannot open log file '{logFileName}': {error}").format(
+                    logFileName=self.environment[
+                        constants.CoreEnv.LOG_JSON_FILE_NAME
+                    ],
+                    error=self._jsonlogerror,
+                )
+            )
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_BOOT,
+        priority=plugin.Stages.PRIORITY_LOW,
+        condition=lambda self: self._streamHandler is not None,
+    )
+    def _bootStream(self):
+        if not self._streamHandler.activate():
+            self._removeHandler(self._streamHandler)
+            self._streamHandler = None
+            self.logger.warning(
+                _('Log streaming is not supported by dialog, disabled')
+            )
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_TERMINATE,
+        priority=plugin.Stages.PRIORITY_LAST,
+        condition=lambda self: self._streamHandler is not None,
+    )
+    def _terminateStream(self):
+        # before dialog is terminated
+        self._closeStream()
 
     @plugin.event(
         stage=plugin.Stages.STAGE_TERMINATE,
@@ -72,6 +72,14 @@ class Plugin(plugin.PluginBase):
             )
         )
 
+    @plugin.event(
+        stage=plugin.Stages.STAGE_CUSTOMIZATION,
+        priority=plugin.Stages.PRIORITY_FIRST,
+    )
+    def _customization(self):
+        # use the time waiting for customization
+        self.context.startPrefetch()
+
     @plugin.event(
         stage=plugin.Stages.STAGE_VALIDATION,
         priority=plugin.Stages.PRIORITY_FIRST,
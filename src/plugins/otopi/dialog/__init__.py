@@ -24,6 +24,7 @@
 from otopi import util
 
 
+from . import answers
 from . import cli
 from . import human
 from . import machine
@@ -32,6 +33,7 @@ from . import misc
 
 @util.export
 def createPlugins(context):
+    answers.Plugin(context=context)
     cli.Plugin(context=context)
     human.Plugin(context=context)
     machine.Plugin(context=context)
@@ -0,0 +1,261 @@
+#
+# otopi -- plugable installer
+# Copyright (C) 2012-2013 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""Answer store dialog plugin."""
+
+
+import configparser
+import gettext
+
+
+from otopi import common
+from otopi import constants
+from otopi import dialog
+from otopi import plugin
+from otopi import util
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='otopi')
+
+
+@util.export
+class Plugin(plugin.PluginBase):
+    """Answer store dialog provider.
+
+    Wraps the registered dialog, queries having a pre-seeded answer
+    are resolved locally, all other queries are passed to the
+    registered dialog.
+
+    Environment:
+        DialogEnv.ANSWER_PREFIX -- answers, key=query name value=answer.
+        DialogEnv.ANSWER_FILE -- answer file.
+
+    Answer file has a single section Const.DIALOG_ANSWER_SECTION,
+    keys are query names, values are at type:value notation.
+
+    Environment answers take precedence over answer file.
+
+    A list answer of string query or confirmation is a sequence, each
+    query consumes the next element, when exhausted the query is passed
+    to the registered dialog.
+
+    """
+
+    class _MyDialog(dialog.DialogBase):
+
+        def __init__(self, parent, dialog):
+            super(Plugin._MyDialog, self).__init__()
+            self._parent = parent
+            self._dialog = dialog
+
+        def __getattr__(self, name):
+            return getattr(self._dialog, name)
+
+        def _invalid(self, name, source):
+            return RuntimeError(
+                _("Invalid value provided to '{name}' by {source}").format(
+                    name=name,
+                    source=source,
+                )
+            )
+
+        def note(self, text, prompt=False):
+            return self._dialog.note(text=text, prompt=prompt)
+
+        def queryString(
+            self,
+            name,
+            note=None,
+            validValues=None,
+            caseSensitive=True,
+            hidden=False,
+            prompt=False,
+            default=None,
+        ):
+            found, value, source = self._parent._getAnswer(
+                name=name,
+                sequence=True,
+            )
+            if not found:
+                return self._dialog.queryString(
+                    name=name,
+                    note=note,
+                    validValues=validValues,
+                    caseSensitive=caseSensitive,
+                    hidden=hidden,
+                    prompt=prompt,
+                    default=default,
+                )
+
+            value = common.toStr(value)
+            if not value and default is not None:
+                value = common.toStr(default)
+            if validValues is not None:
+                validValues = [common.toStr(v) for v in validValues]
+                if not caseSensitive:
+                    validValues = [v.lower() for v in validValues]
+            if not caseSensitive:
+                value = value.lower()
+            if (
+                validValues is not None and value not in validValues or
+                not value and default is None
+            ):
+                raise self._invalid(name=name, source=source)
+            return value
+
+        def queryMultiString(self, name, note=None):
+            found, value, source = self._parent._getAnswer(name=name)
+            if not found:
+                return self._dialog.queryMultiString(name=name, note=note)
+            if isinstance(value, list):
+                value = [common.toStr(v) for v in value]
+            else:
+                value = common.toStr(value).splitlines()
+            return value
+
+        def queryValue(self, name, note=None):
+            found, value, source = self._parent._getAnswer(name=name)
+            if not found:
+                return self._dialog.queryValue(name=name, note=note)
+            return value
+
+        def displayValue(self, name, value, note=None):
+            return self._dialog.displayValue(
+                name=name,
+                value=value,
+                note=note,
+            )
+
+        def displayMultiString(self, name, value, note=None, log=True):
+            return self._dialog.displayMultiString(
+                name=name,
+                value=value,
+                note=note,
+                log=log,
+            )
+
+        def confirm(
+            self,
+            name,
+            description,
+            note=None,
+            prompt=False,
+        ):
+            found, value, source = self._parent._getAnswer(
+                name=name,
+                sequence=True,
+            )
+            if not found:
+                return self._dialog.confirm(
+                    name=name,
+                    description=description,
+                    note=note,
+                    prompt=prompt,
+                )
+            if not isinstance(value, bool):
+                value = common.toStr(value)
+                if value not in ('yes', 'y', 'Y', 'no', 'n', 'N'):
+                    raise self._invalid(name=name, source=source)
+                value = value in ('yes', 'y', 'Y')
+            return value
+
+        def streamLog(self, data):
+            return self._dialog.streamLog(data=data)
+
+        def terminate(self):
+            return self._dialog.terminate()
+
+    def _loadAnswers(self):
+        answerFile = self.environment[constants.DialogEnv.ANSWER_FILE]
+        if answerFile != self._answerFile:
+            self._answerFile = answerFile
+            self._answers = {}
+            if answerFile is not None:
+                config = configparser.ConfigParser()
+                config.optionxform = str
+                if not config.read([self.resolveFile(answerFile)]):
+                    raise RuntimeError(
+                        _("Cannot read answer file '{file}'").format(
+                            file=answerFile,
+                        )
+                    )
+                section = constants.Const.DIALOG_ANSWER_SECTION
+                if config.has_section(section):
+                    for name, value in config.items(section):
+                        try:
+                            self._answers[name] = common.parseTypedValue(
+                                value
+                            )
+                        except Exception as e:
+                            raise RuntimeError(
+                                _(
+                                    "Cannot parse answer file key "
+                                    "{key}: {exception}"
+                                ).format(
+                                    key=name,
+                                    exception=e,
+                                )
+                            )
+        return self._answers
+
+    def _getAnswer(self, name, sequence=False):
+        key = constants.DialogEnv.ANSWER_PREFIX + name
+        if key in self.environment:
+            found, value, source = True, self.environment[key], key
+        else:
+            answers = self._loadAnswers()
+            found = name in answers
+            value = answers.get(name)
+            source = self._answerFile
+        if found and sequence and isinstance(value, list):
+            index = self._consumed.get(name, 0)
+            found = index < len(value)
+            if found:
+                value = value[index]
+                self._consumed[name] = index + 1
+        if found:
+            self.logger.debug('query %s answered from %s', name, source)
+        return found, value, source
+
+    def __init__(self, context):
+        super(Plugin, self).__init__(context=context)
+        self._answerFile = None
+        self._answers = {}
+        self._consumed = {}
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_BOOT,
+        priority=plugin.Stages.PRIORITY_MEDIUM + 10,
+    )
+    def _init(self):
+        self.environment.setdefault(
+            constants.DialogEnv.ANSWER_FILE,
+            None
+        )
+        self.context.registerDialog(
+            self._MyDialog(
+                parent=self,
+                dialog=self.dialog,
+            )
+        )
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -26,8 +26,10 @@ Refer to README.dialog.
 
 
 import gettext
+import re
 import shlex
 import traceback
+import zlib
 
 
 from optparse import OptionParser, OptParseError   # python-2.6
@@ -40,6 +42,12 @@ from otopi import plugin
 from otopi import util
 
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
 def _(m):
     return gettext.dgettext(message=m, domain='otopi')
 
@@ -418,35 +426,255 @@ class Plugin(plugin.PluginBase):
             )
         return True
 
+    BULK_ESCAPE = {
+        '\\': '\\\\',
+        '\n': '\\n',
+        '\r': '\\r',
+    }
+    BULK_UNESCAPE = dict((v[1], k) for k, v in BULK_ESCAPE.items())
+    _RE_BULK_ESCAPE = re.compile(r'[\\\n\r]')
+    _RE_BULK_UNESCAPE = re.compile(r'\\(.?)')
+
+    def _bulkEscape(self, s):
+        return self._RE_BULK_ESCAPE.sub(
+            lambda m: self.BULK_ESCAPE[m.group(0)],
+            s,
+        )
+
+    def _bulkUnescape(self, s):
+        def _unescape(m):
+            if m.group(1) not in self.BULK_UNESCAPE:
+                raise ValueError(_('Invalid escape sequence'))
+            return self.BULK_UNESCAPE[m.group(1)]
+        return self._RE_BULK_UNESCAPE.sub(_unescape, s)
+
+    @_command(
+        command='env-set-bulk',
+        description=_('Set environment variables'),
+    )
+    def _cmd_env_set_bulk(self, cmd):
+        parser = self._MyOptionParser(cmd[0], logger=self.logger)
+        (options, args) = parser.parse_args(args=cmd[1:])
+        if options.help:
+            self.dialog.note(text=parser.format_help())
+        elif args:
+            self.logger.error(_("Syntax error"))
+        else:
+            values = {}
+            for line in self.dialog.queryMultiString(
+                name=constants.Queries.ENV_SET_BULK,
+            ):
+                if not line:
+                    continue
+                key, sep, value = line.partition('=')
+                if not sep or not key:
+                    self.logger.error(_("Syntax error"))
+                    break
+                try:
+                    values[self._bulkUnescape(key)] = common.parseTypedValue(
+                        self._bulkUnescape(value)
+                    )
+                except (ValueError, KeyError) as e:
+                    self.logger.error(
+                        _("Invalid value for '{key}': {error}").format(
+                            key=key,
+                            error=e,
+                        )
+                    )
+                    break
+            else:
+                self.environment.update(values)
+        return True
+
+    @_command(
+        command='env-get-bulk',
+        description=_('Get environment variables'),
+    )
+    def _cmd_env_get_bulk(self, cmd):
+        parser = self._MyOptionParser(cmd[0], logger=self.logger)
+        parser.add_option(
+            '-a', '--all',
+            action="store_true", dest='all', default=False,
+            help=_('All environment keys')
+        )
+        (options, args) = parser.parse_args(args=cmd[1:])
+        if options.help:
+            self.dialog.note(text=parser.format_help())
+        elif args:
+            self.logger.error(_("Syntax error"))
+        else:
+            if options.all:
+                keys = sorted(self.environment.keys())
+            else:
+                keys = [
+                    self._bulkUnescape(k)
+                    for k in self.dialog.queryMultiString(
+                        name=constants.Queries.ENV_GET_BULK,
+                    )
+                    if k
+                ]
+            lines = []
+            for key in keys:
+                value = self.environment.get(key)
+                vtype = common.typeName(value)
+                if vtype == constants.Types.NONE:
+                    value = ''
+                elif vtype == constants.Types.MULTI_STRING:
+                    value = '\n'.join(common.toStr(v) for v in value)
+                else:
+                    value = common.toStr(value)
+                lines.append(
+                    '%s=%s:%s' % (
+                        self._bulkEscape(key),
+                        vtype,
+                        self._bulkEscape(value),
+                    )
+                )
+            self.dialog.displayMultiString(
+                name=constants.Queries.ENV_GET_BULK,
+                value=lines,
+            )
+        return True
+
+    GZIP_MAGIC = b'\x1f\x8b'
+    ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+    LOG_CHUNK_SIZE = 65536
+
+    def _readLogChunks(self, f, offset):
+        """Read log content from offset, decompress if compressed.
+
+        A log that is still being written ends with an incomplete
+        member/frame, its content is available up to last sync point.
+        """
+        magic = f.read(len(self.ZSTD_MAGIC))
+        if magic.startswith(self.GZIP_MAGIC):
+            def decompressobj():
+                return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif magic == self.ZSTD_MAGIC and zstandard is not None:
+            def decompressobj():
+                return zstandard.ZstdDecompressor().decompressobj()
+        else:
+            decompressobj = None
+
+        if decompressobj is None:
+            f.seek(offset)
+            while True:
+                data = f.read(self.LOG_CHUNK_SIZE)
+                if not data:
+                    break
+                yield data
+        else:
+            f.seek(0)
+            d = decompressobj()
+            while True:
+                data = f.read(self.LOG_CHUNK_SIZE)
+                if not data:
+                    break
+                while data:
+                    chunk = d.decompress(data)
+                    # concatenated members/frames
+                    data = getattr(d, 'unused_data', b'')
+                    if data:
+                        d = decompressobj()
+                    if offset:
+                        skip = min(offset, len(chunk))
+                        chunk = chunk[skip:]
+                        offset -= skip
+                    if chunk:
+                        yield chunk
+
+    def _readLogLines(self, f, state, offset=0, size=None):
+        """Read log lines within range.
+
+        When range is specified only complete lines are returned,
+        unless the range has no line end at all. The offset of the
+        first byte not returned is stored in state['offset'].
+        """
+        ranged = offset != 0 or size is not None
+        remaining = size
+        pending = b''
+        state['offset'] = offset
+        for chunk in self._readLogChunks(f=f, offset=offset):
+            if remaining is not None:
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                state['offset'] += len(line) + 1
+                # warning: python-2.6 does not have kwargs for decode
+                yield line.decode('utf-8', 'replace')
+            if remaining == 0:
+                break
+
+        if pending and (
+            not ranged or
+            (remaining == 0 and state['offset'] == offset)
+        ):
+            state['offset'] += len(pending)
+            yield pending.decode('utf-8', 'replace')
+
     @_command(
         command='log',
         description=_('Retrieve log file'),
     )
     def _cmd_log(self, cmd):
         parser = self._MyOptionParser(cmd[0], logger=self.logger)
+        parser.add_option(
+            '-o', '--offset',
+            action="store", dest='offset', type='int', default=None,
+            help=_('Offset to start from, default 0')
+        )
+        parser.add_option(
+            '-s', '--size',
+            action="store", dest='size', type='int', default=None,
+            help=_('Maximum size to retrieve, default unlimited')
+        )
         (options, args) = parser.parse_args(args=cmd[1:])
         if options.help:
             self.dialog.note(text=parser.format_help())
-        elif args:
+        elif (
+            args or
+            (options.offset is not None and options.offset < 0) or
+            (options.size is not None and options.size <= 0)
+        ):
             self.logger.error(_("Syntax error"))
         else:
+            if self.environment.get(constants.CoreEnv.LOG_COMPRESS):
+                self.environment[constants.CoreEnv.LOG_FILE_HANDLE].sync()
+            state = {}
             with open(
                 self.resolveFile(
                     self.environment[constants.CoreEnv.LOG_FILE_NAME]
                 ),
-                'r'
+                'rb'
             ) as f:
-                log = [
-                    l.replace(
-                        self.environment[constants.DialogEnv.BOUNDARY],
-                        '**BOUNDARY**'
-                    ).rstrip('\n')
-                    for l in f.readlines()
-                ]
-            self.dialog.displayMultiString(
-                name='LOG',
-                value=log,
-            )
+                self.dialog.displayMultiString(
+                    name='LOG',
+                    value=(
+                        l.replace(
+                            self.environment[constants.DialogEnv.BOUNDARY],
+                            '**BOUNDARY**'
+                        )
+                        for l in self._readLogLines(
+                            f=f,
+                            state=state,
+                            offset=(
+                                options.offset
+                                if options.offset is not None
+                                else 0
+                            ),
+                            size=options.size,
+                        )
+                    ),
+                    log=False,
+                )
+            if options.offset is not None or options.size is not None:
+                # string, manager may not support long integers
+                self.dialog.displayValue(
+                    name='LOG_NEXT_OFFSET',
+                    value=str(state['offset']),
+                )
         return True
 
     @_command(
@@ -57,5 +57,26 @@ class DialogMachineConst(object):
 
     TERMINATE = 'TERMINATE'
 
+    PROTOCOL = 'PROTOCOL'
+
+    LOG_STREAM = 'LOG-STREAM'
+
+
+@util.codegen
+class DialogMachineV2Const(object):
+    VERSION = 2
+
+    TYPE_NOTE = 'note'
+    TYPE_LOG = 'log'
+    TYPE_LOG_STREAM = 'log-stream'
+    TYPE_QUERY_STRING = 'query-string'
+    TYPE_QUERY_MULTI_STRING = 'query-multi-string'
+    TYPE_QUERY_VALUE = 'query-value'
+    TYPE_DISPLAY_VALUE = 'display-value'
+    TYPE_DISPLAY_MULTI_STRING = 'display-multi-string'
+    TYPE_CONFIRM = 'confirm'
+    TYPE_TERMINATE = 'terminate'
+    TYPE_RESPONSE = 'response'
+
 
 # vim: expandtab tabstop=4 shiftwidth=4
@@ -23,6 +23,9 @@
 
 import gettext
 import logging
+import re
+import threading
+import time
 
 
 from otopi import common
@@ -43,10 +46,45 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
     Environment:
         DialogEnv.DIALECT -- if human activate.
         DialogEnv.BOUNDARY -- set bundary to use.
+        DialogEnv.PROGRESS_COALESCE -- coalesce progress records.
+
+    Progress records are log records having a true progress attribute.
+    When coalesced, on a tty they are rendered as a single status line
+    rewritten at most every REFRESH_INTERVAL seconds, and removed before
+    any other output. Otherwise, the first progress record is printed
+    and then at most one every SUMMARY_INTERVAL seconds, with the count
+    of records suppressed since, pending summary is printed before any
+    other output.
 
     """
     BOUNDARY = '--=451b80dc-996f-432e-9e4f-2b29ef6d1141=--'
 
+    REFRESH_INTERVAL = 0.2
+    SUMMARY_INTERVAL = 10
+
+    _RE_COLOR = re.compile(r'\033\[[0-9;]*m')
+
+    class _MyHandler(logging.Handler):
+        """Pass records to the progress renderer."""
+
+        def __init__(self, parent):
+            logging.Handler.__init__(self)
+            self._parent = parent
+
+        def emit(self, record):
+            try:
+                text = self.format(record)
+                if getattr(record, 'progress', False):
+                    self._parent._progress(text=text)
+                else:
+                    self._parent._write(
+                        text='%s\n' % text,
+                        flush=True,
+                        log=False,
+                    )
+            except Exception:
+                self.handleError(record)
+
     class _MyFormatter(logging.Formatter):
         """Color formatter."""
 
@@ -85,6 +123,74 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
         super(Plugin, self).__init__(context=context)
         dialog.DialogBaseImpl.__init__(self)    # python super is no good
         self._enabled = False
+        self._status = False
+        self._lastProgress = 0
+        self._suppressed = None
+        self._suppressedCount = 0
+        self._progressLock = threading.RLock()
+
+    def _progress(self, text):
+        with self._progressLock:
+            now = time.time()
+            if self._output_isatty():
+                if now - self._lastProgress >= self.REFRESH_INTERVAL:
+                    self._lastProgress = now
+                    width = self._output_columns() - 1
+                    if len(self._RE_COLOR.sub('', text)) > width:
+                        text = self._RE_COLOR.sub('', text)[:width]
+                    dialog.DialogBaseImpl._write(
+                        self,
+                        text='\r%s\033[K' % text,
+                        flush=True,
+                        log=False,
+                    )
+                    self._status = True
+            else:
+                self._suppressed = text
+                self._suppressedCount += 1
+                if now - self._lastProgress >= self.SUMMARY_INTERVAL:
+                    self._lastProgress = now
+                    self._endProgress()
+                    self._flush()
+
+    def _endProgress(self):
+        if self._status:
+            self._status = False
+            dialog.DialogBaseImpl._write(
+                self,
+                text='\r\033[K',
+                log=False,
+            )
+        if self._suppressed is not None:
+            text = self._suppressed
+            if self._suppressedCount > 1:
+                text = _('{text} ({count} similar suppressed)').format(
+                    text=text,
+                    count=self._suppressedCount - 1,
+                )
+            self._suppressed = None
+            self._suppressedCount = 0
+            dialog.DialogBaseImpl._write(
+                self,
+                text='%s\n' % text,
+                log=False,
+            )
+
+    def _createLogHandler(self, stream):
+        if not self.environment[constants.DialogEnv.PROGRESS_COALESCE]:
+            return dialog.DialogBaseImpl._createLogHandler(self, stream)
+        return self._MyHandler(parent=self)
+
+    def _write(self, text, flush=False, log=True):
+        with self._progressLock:
+            self._endProgress()
+            self._lastProgress = 0
+            dialog.DialogBaseImpl._write(
+                self,
+                text=text,
+                flush=flush,
+                log=log,
+            )
 
     @plugin.event(
         stage=plugin.Stages.STAGE_BOOT,
@@ -97,6 +203,10 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
     )
     def _init(self):
         self.environment[constants.DialogEnv.BOUNDARY] = self.BOUNDARY
+        self.environment.setdefault(
+            constants.DialogEnv.PROGRESS_COALESCE,
+            True
+        )
         self._open(logFormatter=self._MyFormatter(parent=self))
         self._enabled = True
         self.context.registerDialog(self)
@@ -124,7 +234,6 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
                     ' ' + line if line else '',
                     '\n' if newline else '',
                 ),
-                flush=False,
             )
 
         if isinstance(text, list) or isinstance(text, tuple):
@@ -141,7 +250,7 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             for line in lines[:-1]:
                 printline(line)
             printline(lines[-1], newline=not prompt)
-            self._flush()
+        self._flush()
 
     def queryString(
         self,
@@ -228,19 +337,20 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             )
         )
 
-    def displayMultiString(self, name, value, note=None):
+    def displayMultiString(self, name, value, note=None, log=True):
         self.logger.debug('display %s', name)
         if note is not None:
             self.note(text=note)
 
         self._write(
-            text='D:MULTI-STRING %s %s\n%s\n%s\n' % (
+            text='D:MULTI-STRING %s %s\n' % (
                 name,
                 self.BOUNDARY,
-                '\n'.join(value),
-                self.BOUNDARY,
-            )
+            ),
         )
+        if not self._writeLines(lines=value, log=log):
+            self._write(text='\n')
+        self._write(text='%s\n' % self.BOUNDARY)
 
     def confirm(
         self,
@@ -25,8 +25,12 @@ Refer to README.dialog.
 """
 
 
+import base64
+import builtins
 import gettext
+import json
 import logging
+import threading
 
 
 from otopi import common
@@ -51,6 +55,9 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
     Environment:
         DialogEnv.DIALECT -- if machine activate.
         DialogEnv.BOUNDARY -- set bundary to use.
+        DialogEnv.MACHINE_VERSION -- protocol version, 1 or 2.
+
+    Version 2 frames JSON messages, refer to README.dialog.
 
     """
     BOUNDARY = '--=451b80dc-996f-432e-9e4f-2b29ef6d1141=--'
@@ -72,10 +79,134 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
         def format(self, record):
             return logging.Formatter.format(self, record).replace('\n', ' ')
 
+    class _MyV2Handler(logging.Handler):
+        """Send log records as frames."""
+        def __init__(self, parent):
+            logging.Handler.__init__(self)
+            self._parent = parent
+
+        def emit(self, record):
+            try:
+                self._parent._writeFrame(
+                    type=dialogcons.DialogMachineV2Const.TYPE_LOG,
+                    severity=record.levelname,
+                    record=self.format(record),
+                    flush=True,
+                    log=False,
+                )
+            except Exception:
+                self.handleError(record)
+
     def __init__(self, context):
         super(Plugin, self).__init__(context=context)
         dialog.DialogBaseImpl.__init__(self)    # python super is no good
         self._enabled = False
+        self._version = 1
+        self._frameId = 0
+        self._frameLock = threading.RLock()
+        self._responses = []
+        self._multiPart = False
+
+    #
+    # Version 2 framing
+    #
+
+    def _createLogHandler(self, stream):
+        if self._version == 1:
+            return dialog.DialogBaseImpl._createLogHandler(self, stream)
+        return self._MyV2Handler(parent=self)
+
+    def _writeFrame(self, flush=False, log=True, **message):
+        """Build and write a frame, ascii JSON so length is in bytes.
+
+        Frames are written also by log handler, possibly from other
+        threads, so id is assigned and frame is written under lock.
+
+        Returns:
+        Id of frame.
+        """
+        with self._frameLock:
+            frameId = message['id'] = self._frameId
+            self._frameId += 1
+            payload = json.dumps(message, sort_keys=True)
+            self._write(
+                text='%d\n%s\n' % (len(payload), payload),
+                flush=flush,
+                log=log,
+            )
+        return frameId
+
+    def _readFrame(self, hidden=False):
+        header = self._readline()
+        try:
+            size = int(header)
+        except ValueError:
+            raise RuntimeError(
+                _("Invalid frame header '{header}'").format(
+                    header=header,
+                )
+            )
+        payload = self._read(size=size + 1, hidden=hidden)
+        if payload[-1] != '\n':
+            raise RuntimeError(_('Invalid frame'))
+        return json.loads(payload[:-1])
+
+    def _responseOf(self, response, queryId, name):
+        """Whether response answers the query.
+
+        id or name are optional, if present they must match the query.
+        """
+        if 'id' in response and response['id'] < queryId:
+            raise RuntimeError(
+                _("Unexpected response to '{received}'").format(
+                    received=response.get('name', response['id']),
+                )
+            )
+        return (
+            response.get('id', queryId) == queryId and
+            response.get('name', name) == name
+        )
+
+    def _queryFrame(self, name, **message):
+        """Send a query and wait for its response.
+
+        Response may refer to the query by id or by name, so the
+        manager can send responses ahead. Responses to other queries
+        are kept until these queries are sent, so responses may arrive
+        in any order.
+
+        Frames are read hidden and logged once matched to a query which
+        is not hidden, so values of hidden queries are never logged.
+        """
+        queryId = self._writeFrame(name=name, **message)
+        response = None
+        for pending in self._responses:
+            if self._responseOf(pending, queryId, name):
+                response = pending
+                self._responses.remove(pending)
+                break
+        while response is None:
+            frame = self._readFrame(hidden=True)
+            if (
+                frame.get('type') !=
+                dialogcons.DialogMachineV2Const.TYPE_RESPONSE
+            ):
+                raise RuntimeError(
+                    _("Invalid response type '{type}'").format(
+                        type=frame.get('type'),
+                    )
+                )
+            if self._responseOf(frame, queryId, name):
+                response = frame
+            else:
+                self._responses.append(frame)
+        if not message.get('hidden', False):
+            self._logString('RECEIVE', json.dumps(response, sort_keys=True))
+        if response.get('abort', False):
+            raise context.Abort(_('Aborted by dialog'))
+        if 'value' not in response:
+            raise RuntimeError(_('Value ot provided'))
+        return response['value']
 
     @plugin.event(
         stage=plugin.Stages.STAGE_BOOT,
@@ -88,9 +219,33 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
     )
     def _init(self):
         self.environment[constants.DialogEnv.BOUNDARY] = self.BOUNDARY
-        self._open(logFormatter=self._MyFormatter(parent=self))
+        self._version = self.environment.setdefault(
+            constants.DialogEnv.MACHINE_VERSION,
+            1
+        )
+        if self._version not in (1, dialogcons.DialogMachineV2Const.VERSION):
+            raise RuntimeError(
+                _('Unsupported machine dialog version {version}').format(
+                    version=self._version,
+                )
+            )
+        self._open(
+            logFormatter=(
+                self._MyFormatter(parent=self) if self._version == 1
+                else logging.Formatter(fmt='%(message)s')
+            )
+        )
         self._enabled = True
         self.context.registerDialog(self)
+        if self._version != 1:
+            # announce in version 1 syntax, everything after is framed
+            self._write(
+                text='%s%s %s\n' % (
+                    dialogcons.DialogMachineConst.REQUEST_PREFIX,
+                    dialogcons.DialogMachineConst.PROTOCOL,
+                    self._version,
+                )
+            )
 
     @plugin.event(
         stage=plugin.Stages.STAGE_TERMINATE,
@@ -120,14 +275,19 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             text = '\n'
         text = common.toStr(text)
 
-        for line in text.splitlines():
-            self._write(
-                text='%s%s\n' % (
-                    PREFIX,
-                    ' ' + line if line else ''
-                ),
-                flush=False,
+        if self._version != 1:
+            self._writeFrame(
+                type=dialogcons.DialogMachineV2Const.TYPE_NOTE,
+                text=text,
             )
+        else:
+            for line in text.splitlines():
+                self._write(
+                    text='%s%s\n' % (
+                        PREFIX,
+                        ' ' + line if line else ''
+                    ),
+                )
         self._flush()
 
     def queryString(
@@ -154,15 +314,32 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
         if not caseSensitive and validValues is not None:
             validValues = [v.lower() for v in validValues]
 
-        self._write(
-            text='%s%s %s\n' % (
-                dialogcons.DialogMachineConst.REQUEST_PREFIX,
-                dialogcons.DialogMachineConst.QUERY_STRING,
-                name,
+        if self._version != 1:
+            value = self._queryFrame(
+                type=dialogcons.DialogMachineV2Const.TYPE_QUERY_STRING,
+                name=name,
+                note=note,
+                validValues=validValues,
+                default=default,
+                hidden=hidden,
             )
-        )
-        self.dialog.note(text=note, prompt=prompt)
-        value = self._readline()
+            if not isinstance(value, (str, builtins.unicode)):
+                raise RuntimeError(
+                    _("Invalid value provided to '{name}'").format(
+                        name=name
+                    )
+                )
+            value = common.toStr(value)
+        else:
+            self._write(
+                text='%s%s %s\n' % (
+                    dialogcons.DialogMachineConst.REQUEST_PREFIX,
+                    dialogcons.DialogMachineConst.QUERY_STRING,
+                    name,
+                )
+            )
+            self.dialog.note(text=note, prompt=prompt)
+            value = self._readline()
         if not value and default is not None:
             value = default
         if not caseSensitive:
@@ -183,6 +360,23 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             note = _("\nPlease specify multiple strings for '{name}':").format(
                 name=name
             )
+        if self._version != 1:
+            value = self._queryFrame(
+                type=dialogcons.DialogMachineV2Const.TYPE_QUERY_MULTI_STRING,
+                name=name,
+                note=note,
+            )
+            if not isinstance(value, list) or [
+                v for v in value
+                if not isinstance(v, (str, builtins.unicode))
+            ]:
+                raise RuntimeError(
+                    _("Invalid value provided to '{name}'").format(
+                        name=name
+                    )
+                )
+            return [common.toStr(v) for v in value]
+
         self._write(
             text='%s%s %s %s %s\n' % (
                 dialogcons.DialogMachineConst.REQUEST_PREFIX,
@@ -218,6 +412,25 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             note = _("\nPlease specify value for '{name}':").format(
                 name=name
             )
+        if self._version != 1:
+            value = self._queryFrame(
+                type=dialogcons.DialogMachineV2Const.TYPE_QUERY_VALUE,
+                name=name,
+                note=note,
+            )
+            if isinstance(value, builtins.unicode):
+                value = common.toStr(value)
+            elif not (
+                value is None or
+                isinstance(value, (bool, int, str))
+            ):
+                raise RuntimeError(
+                    _("Invalid value provided to '{name}'").format(
+                        name=name
+                    )
+                )
+            return value
+
         self._write(
             text='%s%s %s\n' % (
                 dialogcons.DialogMachineConst.REQUEST_PREFIX,
@@ -267,6 +480,23 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
         if note is not None:
             self.note(text=note)
 
+        if self._version != 1:
+            valueType = common.typeName(value)
+            self._writeFrame(
+                type=dialogcons.DialogMachineV2Const.TYPE_DISPLAY_VALUE,
+                name=name,
+                valueType=valueType,
+                value=(
+                    value if valueType in (
+                        constants.Types.NONE,
+                        constants.Types.BOOLEAN,
+                        constants.Types.INTEGER,
+                    )
+                    else common.toStr(value)
+                ),
+            )
+            return
+
         self._write(
             text='%s%s %s=%s:%s\n' % (
                 dialogcons.DialogMachineConst.REQUEST_PREFIX,
@@ -277,21 +507,56 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
             )
         )
 
-    def displayMultiString(self, name, value, note=None):
+    def displayMultiString(self, name, value, note=None, log=True):
         if note is not None:
             self.note(text=note)
 
+        if self._version != 1:
+            #
+            # Sent in chunks, last chunk has more=False.
+            #
+            chunk = []
+            for line in value:
+                chunk.append(common.toStr(line))
+                if len(chunk) >= self.WRITE_LINES_CHUNK:
+                    self._writeFrame(
+                        type=(
+                            dialogcons.DialogMachineV2Const.
+                            TYPE_DISPLAY_MULTI_STRING
+                        ),
+                        name=name,
+                        value=chunk,
+                        more=True,
+                        log=log,
+                    )
+                    chunk = []
+            self._writeFrame(
+                type=(
+                    dialogcons.DialogMachineV2Const.
+                    TYPE_DISPLAY_MULTI_STRING
+                ),
+                name=name,
+                value=chunk,
+                more=False,
+                log=log,
+            )
+            return
+
         self._write(
-            text='%s%s %s %s\n%s%s%s\n' % (
+            text='%s%s %s %s\n' % (
                 dialogcons.DialogMachineConst.REQUEST_PREFIX,
                 dialogcons.DialogMachineConst.DISPLAY_MULTI_STRING,
                 name,
                 self.BOUNDARY,
-                '\n'.join(value),
-                '\n' if value else '',
-                self.BOUNDARY,
-            )
+            ),
         )
+        # no log stream within the multi-string
+        self._multiPart = True
+        try:
+            self._writeLines(lines=value, log=log)
+            self._write(text='%s\n' % self.BOUNDARY)
+        finally:
+            self._multiPart = False
 
     def confirm(
         self,
@@ -307,6 +572,21 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
                 name=name,
                 description=description,
             )
+        if self._version != 1:
+            value = self._queryFrame(
+                type=dialogcons.DialogMachineV2Const.TYPE_CONFIRM,
+                name=name,
+                description=description,
+                note=note,
+            )
+            if not isinstance(value, bool):
+                raise RuntimeError(
+                    _("Invalid value provided to '{name}'").format(
+                        name=name
+                    )
+                )
+            return value
+
         self._write(
             text='%s%s %s %s\n' % (
                 dialogcons.DialogMachineConst.REQUEST_PREFIX,
@@ -356,7 +636,35 @@ class Plugin(plugin.PluginBase, dialog.DialogBaseImpl):
                 )
             )
 
+    def streamLog(self, data):
+        if self._multiPart:
+            return False
+
+        value = common.toStr(base64.b64encode(data).decode('ascii'))
+        if self._version != 1:
+            self._writeFrame(
+                type=dialogcons.DialogMachineV2Const.TYPE_LOG_STREAM,
+                value=value,
+                log=False,
+            )
+        else:
+            self._write(
+                text='%s%s %s\n' % (
+                    dialogcons.DialogMachineConst.REQUEST_PREFIX,
+                    dialogcons.DialogMachineConst.LOG_STREAM,
+                    value,
+                ),
+                log=False,
+            )
+        return True
+
     def terminate(self):
+        if self._version != 1:
+            self._writeFrame(
+                type=dialogcons.DialogMachineV2Const.TYPE_TERMINATE,
+            )
+            return
+
         self._write(
             text='%s%s\n' % (
                 dialogcons.DialogMachineConst.REQUEST_PREFIX,
@@ -21,6 +21,9 @@
 """Misc plugin."""
 
 
+import os
+
+
 from otopi import constants
 from otopi import plugin
 from otopi import util
@@ -32,6 +35,10 @@ class Plugin(plugin.PluginBase):
 
     Environment:
         DialogEnv.DIALECT -- set default dialect.
+        DialogEnv.SOCKET -- set default dialog socket.
+
+    OS Environment:
+        SystemEnvironment.DIALOG_SOCKET -- dialog socket.
 
     """
     def __init__(self, context):
@@ -46,6 +53,10 @@ class Plugin(plugin.PluginBase):
             constants.DialogEnv.DIALECT,
             constants.Const.DIALOG_DIALECT_HUMAN,
         )
+        self.environment.setdefault(
+            constants.DialogEnv.SOCKET,
+            os.environ.get(constants.SystemEnvironment.DIALOG_SOCKET),
+        )
 
 
 # vim: expandtab tabstop=4 shiftwidth=4
@@ -25,12 +25,14 @@ from otopi import util
 
 
 from . import dnfpackager
+from . import fakepackager
 from . import yumpackager
 
 
 @util.export
 def createPlugins(context):
     dnfpackager.Plugin(context=context)
+    fakepackager.Plugin(context=context)
     yumpackager.Plugin(context=context)
 
 
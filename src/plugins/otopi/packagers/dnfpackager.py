@@ -27,12 +27,20 @@ import time
 
 
 from otopi import constants
+from otopi import packagelist
 from otopi import packager
 from otopi import plugin
 from otopi import transaction
 from otopi import util
 
 
+try:
+    from otopi import rpmdb
+except ImportError:
+    # rpm is missing, so is the packager
+    rpmdb = None
+
+
 def _(m):
     return gettext.dgettext(message=m, domain='otopi')
 
@@ -104,7 +112,14 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
                 if time.time() - self._last >= self._parent.environment[
                     constants.PackEnv.KEEP_ALIVE_INTERVAL
                 ]:
-                    self.info(msg)
+                    self.progress(msg)
+
+            def progress(self, msg):
+                self._parent.logger.info(
+                    'DNF %s' % msg,
+                    extra={'progress': True},
+                )
+                self._touch()
 
             def askForGPGKeyImport(self, userid, hexkeyid):
                 return self._parent.dialog.confirm(
@@ -127,6 +142,8 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
             disabledPlugins=disabledPlugins,
         )
 
+    PREFETCH_QUERY_BASE = 'otopi.packagers.dnfpackager.queryBase'
+
     def __init__(self, context):
         super(Plugin, self).__init__(context=context)
         self._minidnf = None
@@ -149,6 +166,10 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
             constants.PackEnv.KEEP_ALIVE_INTERVAL,
             constants.Defaults.PACKAGER_KEEP_ALIVE_INTERVAL
         )
+        self.environment.setdefault(
+            constants.PackEnv.METADATA_MAX_AGE,
+            constants.Defaults.PACKAGER_METADATA_MAX_AGE
+        )
         self.environment.setdefault(
             constants.PackEnv.DNFPACKAGER_EXPIRE_CACHE,
             True
@@ -157,6 +178,18 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
             constants.PackEnv.DNF_ROLLBACK,
             True
         )
+        self.environment.setdefault(
+            constants.PackEnv.DNF_INSTALLROOT,
+            None
+        )
+        self.environment.setdefault(
+            constants.PackEnv.DNF_SNAPSHOT,
+            None
+        )
+        self.environment.setdefault(
+            constants.PackEnv.DNF_SNAPSHOT_MODE,
+            'capture'
+        )
 
         try:
             if self.environment[constants.PackEnv.DNFPACKAGER_ENABLED]:
@@ -205,8 +238,11 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
     )
     def _setup(self):
         if self.environment[constants.PackEnv.DNFPACKAGER_EXPIRE_CACHE]:
-            with self._minidnf.transaction():
-                self._minidnf.clean(['expire-cache'])
+            self._minidnf.setMetadataExpire(
+                maxAge=self.environment[
+                    constants.PackEnv.METADATA_MAX_AGE
+                ],
+            )
         self.environment[constants.CoreEnv.MAIN_TRANSACTION].append(
             self.DNFTransaction(
                 parent=self,
@@ -220,6 +256,17 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
             )
         )
 
+    @plugin.event(
+        stage=plugin.Stages.STAGE_LATE_SETUP,
+        condition=lambda self: self._enabled,
+    )
+    def _late_setup(self):
+        # load metadata while waiting for customization
+        self.context.registerPrefetch(
+            name=self.PREFETCH_QUERY_BASE,
+            method=self._minidnf.createQueryBase,
+        )
+
     @plugin.event(
         stage=plugin.Stages.STAGE_INTERNAL_PACKAGES,
         priority=plugin.Stages.PRIORITY_LAST,
@@ -252,9 +299,34 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
                 )
             self._minidnf.processTransaction()
 
+    def _consumePrefetch(self):
+        valid, queryBase = self.context.getPrefetch(
+            name=self.PREFETCH_QUERY_BASE,
+        )
+        if valid:
+            self._minidnf.setQueryBase(queryBase)
+
+    def _configure(self):
+        self._minidnf.setInstallroot(
+            self.environment[constants.PackEnv.DNF_INSTALLROOT]
+        )
+        mode = self.environment[constants.PackEnv.DNF_SNAPSHOT_MODE]
+        if mode not in ('capture', 'replay'):
+            raise RuntimeError(
+                _('Invalid snapshot mode {mode}').format(
+                    mode=mode,
+                )
+            )
+        self._minidnf.setSnapshot(
+            self.environment[constants.PackEnv.DNF_SNAPSHOT],
+            replay=mode == 'replay',
+        )
+
     # PackagerBase
 
     def beginTransaction(self):
+        self._consumePrefetch()
+        self._configure()
         return self._minidnf.beginTransaction()
 
     def endTransaction(self, rollback=False):
@@ -304,12 +376,24 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
         )
 
     def queryGroups(self):
+        self._consumePrefetch()
         return self._minidnf.queryGroups()
 
-    def queryPackages(self, patterns=None, listAll=False):
-        return self._minidnf.queryPackages(
-            patterns=patterns,
-            showdups=listAll,
+    def queryPackages(self, patterns=None, listAll=False, installedOnly=False):
+        if installedOnly:
+            return packagelist.PackageList(
+                rpmdb.queryInstalled(
+                    patterns=patterns,
+                    root=self._minidnf.installroot,
+                    epochType=int,
+                )
+            )
+        self._consumePrefetch()
+        return packagelist.PackageList(
+            self._minidnf.queryPackages(
+                patterns=patterns,
+                showdups=listAll,
+            )
         )
 
 
@@ -0,0 +1,607 @@
+#
+# otopi -- plugable installer
+# Copyright (C) 2012-2013 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""Fake packager provider."""
+
+
+import copy
+import fnmatch
+import gettext
+import json
+import time
+
+
+from otopi import constants
+from otopi import packagelist
+from otopi import packager
+from otopi import plugin
+from otopi import transaction
+from otopi import util
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='otopi')
+
+
+@util.export
+class Plugin(plugin.PluginBase, packager.PackagerBase):
+    """Fake packager provider.
+
+    In memory rpmdb and repository loaded from a json fixture, for
+    benchmarking and testing without root nor a live repository.
+    Enabled when PackEnv.FAKEPACKAGER_FIXTURE is set, replaces the
+    real packagers.
+
+    Fixture:
+        {
+            "installed": [PACKAGE...],
+            "available": [PACKAGE...],
+            "groups": {
+                "name": {"packages": [NAME...], "uservisible": true}
+            },
+            "latency": {
+                "resolve": seconds per queued package,
+                "download": seconds per MiB of package size,
+                "scriptlet": seconds per processed package
+            }
+        }
+
+    PACKAGE:
+        {
+            "name":, "version":, "release":, "epoch":, "arch":,
+            "size": bytes,
+            "requires": [NAME...],
+            "provides": [NAME...]
+        }
+
+    """
+
+    class FakeTransaction(transaction.TransactionElement):
+        """fake transaction element."""
+
+        def __init__(self, parent):
+            self._parent = parent
+
+        def __str__(self):
+            return _("Fake Packager Transaction")
+
+        def prepare(self):
+            self._parent.beginTransaction()
+
+        def abort(self):
+            self._parent.endTransaction(rollback=True)
+
+        def commit(self):
+            self._parent.endTransaction(rollback=False)
+
+    @staticmethod
+    def _evr(p):
+        return packagelist.PackageList.evr(p)
+
+    @staticmethod
+    def _displayName(p):
+        return '%s%s-%s-%s.%s' % (
+            '' if p['epoch'] == '0' else '%s:' % p['epoch'],
+            p['name'],
+            p['version'],
+            p['release'],
+            p['arch'],
+        )
+
+    @classmethod
+    def _info(clz, p, operation):
+        info = dict(
+            (f, p[f])
+            for f in ('name', 'version', 'release', 'epoch', 'arch')
+        )
+        info['display_name'] = clz._displayName(p)
+        info['operation'] = operation
+        return info
+
+    @staticmethod
+    def _normalize(p):
+        ret = {
+            'name': p['name'],
+            'version': p.get('version', '1'),
+            'release': p.get('release', '1'),
+            'epoch': str(p.get('epoch', 0)),
+            'arch': p.get('arch', 'noarch'),
+            'size': p.get('size', 0),
+            'requires': list(p.get('requires', [])),
+        }
+        ret['provides'] = [ret['name']] + list(p.get('provides', []))
+        return ret
+
+    def _sleep(self, seconds):
+        seconds *= self.environment[
+            constants.PackEnv.FAKEPACKAGER_TIME_SCALE
+        ] / 100.0
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _load(self):
+        fixture = self.resolveFile(
+            self.environment[constants.PackEnv.FAKEPACKAGER_FIXTURE]
+        )
+        self.logger.debug('Loading fake packager fixture %s', fixture)
+        with open(fixture) as f:
+            data = json.load(f)
+        self._setRpmdb(
+            [self._normalize(p) for p in data.get('installed', [])]
+        )
+        self._available = [
+            self._normalize(p) for p in data.get('available', [])
+        ]
+        self._availableIndex = self._index(self._available)
+        self._groups = data.get('groups', {})
+        self._latency = data.get('latency', {})
+
+    @classmethod
+    def _index(clz, packages):
+        """Index packages by provides, name.arch and display name."""
+        index = {}
+        for p in packages:
+            for key in set(p['provides']) | set((
+                clz._displayName(p),
+                '%s.%s' % (p['name'], p['arch']),
+            )):
+                index.setdefault(key, []).append(p)
+        return index
+
+    def _setRpmdb(self, packages):
+        self._rpmdb = packages
+        self._rpmdbIndex = self._index(packages)
+
+    def _provider(self, index, name):
+        """Latest package of index providing name."""
+        ret = None
+        for p in index.get(name, ()):
+            if name in p['provides'] and (
+                ret is None or
+                self._evr(p) > self._evr(ret)
+            ):
+                ret = p
+        return ret
+
+    def _match(self, packages, index, pattern):
+        if not any(c in pattern for c in '*?['):
+            return list(index.get(pattern, ()))
+        return [
+            p for p in packages
+            if fnmatch.fnmatch(p['name'], pattern) or
+            pattern in p['provides'] or
+            pattern in (
+                self._displayName(p),
+                '%s.%s' % (p['name'], p['arch']),
+            )
+        ]
+
+    def _queue(self, action, call, packages, ignoreErrors):
+        ret = True
+        for package in packages:
+            self.logger.debug('queue package %s for %s', package, action)
+            try:
+                call(package)
+            except RuntimeError as e:
+                if ignoreErrors:
+                    self.logger.debug(
+                        'Cannot queue package %s: %s',
+                        package,
+                        e,
+                    )
+                    ret = False
+                else:
+                    self.logger.error(
+                        _('Cannot queue package {package}: {error}').format(
+                            package=package,
+                            error=e,
+                        )
+                    )
+                    raise
+        return ret
+
+    def _queueInstall(self, package, update=False):
+        self._sleep(self._latency.get('resolve', 0))
+        latest = {}
+        for p in self._match(self._available, self._availableIndex, package):
+            if (
+                p['name'] not in latest or
+                self._evr(p) > self._evr(latest[p['name']])
+            ):
+                latest[p['name']] = p
+        if not latest and not self._match(
+            self._rpmdb,
+            self._rpmdbIndex,
+            package,
+        ):
+            raise RuntimeError(
+                _('Package {package} cannot be found').format(
+                    package=package,
+                )
+            )
+        for name, p in sorted(latest.items()):
+            installed = [
+                i for i in self._rpmdbIndex.get(name, ())
+                if i['name'] == name
+            ]
+            if installed and (
+                not update or
+                self._evr(p) <= max(self._evr(i) for i in installed)
+            ):
+                continue
+            self._queued.append(('install', p))
+
+    def _queueUpdate(self, package):
+        if not self._match(self._rpmdb, self._rpmdbIndex, package):
+            raise RuntimeError(
+                _('Package {package} is not installed').format(
+                    package=package,
+                )
+            )
+        self._queueInstall(package, update=True)
+
+    def _queueRemove(self, package):
+        self._sleep(self._latency.get('resolve', 0))
+        installed = self._match(self._rpmdb, self._rpmdbIndex, package)
+        if not installed:
+            raise RuntimeError(
+                _('Package {package} is not installed').format(
+                    package=package,
+                )
+            )
+        for p in installed:
+            self._queued.append(('erase', p))
+
+    @classmethod
+    def _add(clz, target, keys, p):
+        key = clz._displayName(p)
+        if key not in keys:
+            keys.add(key)
+            target.append(p)
+
+    def _resolve(self):
+        """Dependency closure of queued operations."""
+        install = []
+        installNames = set()
+        erase = []
+        eraseNames = set()
+        for op, p in self._queued:
+            if op == 'install':
+                self._add(install, installNames, p)
+            else:
+                self._add(erase, eraseNames, p)
+
+        # replaced packages
+        for p in install:
+            key = '%s.%s' % (p['name'], p['arch'])
+            for i in self._rpmdbIndex.get(key, ()):
+                if (i['name'], i['arch']) == (p['name'], p['arch']):
+                    self._add(erase, eraseNames, i)
+
+        # requires of installed packages
+        kept = self._index(
+            [
+                x for x in self._rpmdb
+                if self._displayName(x) not in eraseNames
+            ]
+        )
+        installIndex = self._index(install)
+        i = 0
+        while i < len(install):
+            p = install[i]
+            for req in p['requires']:
+                if (
+                    self._provider(installIndex, req) is None and
+                    self._provider(kept, req) is None
+                ):
+                    dep = self._provider(self._availableIndex, req)
+                    if dep is None:
+                        raise RuntimeError(
+                            _(
+                                'Unresolvable dependency {req} of {package}'
+                            ).format(
+                                req=req,
+                                package=self._displayName(p),
+                            )
+                        )
+                    if self._displayName(dep) not in installNames:
+                        self._add(install, installNames, dep)
+                        for key, packages in self._index([dep]).items():
+                            installIndex.setdefault(key, []).extend(packages)
+            i += 1
+
+        # packages requiring erased packages
+        providers = {}
+        requirers = {}
+        for p in [
+            x for x in self._rpmdb if self._displayName(x) not in eraseNames
+        ] + install:
+            for name in p['provides']:
+                providers.setdefault(name, set()).add(self._displayName(p))
+            if self._displayName(p) not in installNames:
+                for req in p['requires']:
+                    requirers.setdefault(req, []).append(p)
+        pending = [
+            p for p in self._rpmdb
+            if self._displayName(p) not in eraseNames and any(
+                req not in providers for req in p['requires']
+            )
+        ]
+        while pending:
+            p = pending.pop()
+            if self._displayName(p) in eraseNames:
+                continue
+            self._add(erase, eraseNames, p)
+            for name in p['provides']:
+                names = providers[name]
+                names.discard(self._displayName(p))
+                if not names:
+                    pending.extend(requirers.get(name, ()))
+
+        return install, erase
+
+    def __init__(self, context):
+        super(Plugin, self).__init__(context=context)
+        self._enabled = False
+        self._rpmdb = []
+        self._rpmdbIndex = {}
+        self._available = []
+        self._availableIndex = {}
+        self._groups = {}
+        self._latency = {}
+        self._queued = []
+        self._snapshot = None
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_BOOT,
+        priority=plugin.Stages.PRIORITY_LOW - 1,
+    )
+    def _boot(self):
+        self.environment.setdefault(
+            constants.PackEnv.FAKEPACKAGER_FIXTURE,
+            None
+        )
+        self.environment.setdefault(
+            constants.PackEnv.FAKEPACKAGER_TIME_SCALE,
+            100
+        )
+        if self.environment[constants.PackEnv.FAKEPACKAGER_FIXTURE]:
+            self._enabled = True
+            self.environment[constants.PackEnv.DNFPACKAGER_ENABLED] = False
+            self.environment[constants.PackEnv.YUMPACKAGER_ENABLED] = False
+
+    @plugin.event(
+        name=constants.Stages.PACKAGERS_DETECTION,
+        stage=plugin.Stages.STAGE_INIT,
+        priority=plugin.Stages.PRIORITY_HIGH,
+        condition=lambda self: self._enabled,
+    )
+    def _init(self):
+        self._load()
+        self.logger.debug('Registering fake packager')
+        self.context.registerPackager(packager=self)
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_SETUP,
+        priority=plugin.Stages.PRIORITY_HIGH,
+        condition=lambda self: self._enabled,
+    )
+    def _setup(self):
+        self.environment[constants.CoreEnv.MAIN_TRANSACTION].append(
+            self.FakeTransaction(
+                parent=self,
+            )
+        )
+        self.environment[
+            constants.CoreEnv.INTERNAL_PACKAGES_TRANSACTION
+        ].append(
+            self.FakeTransaction(
+                parent=self,
+            )
+        )
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_INTERNAL_PACKAGES,
+        priority=plugin.Stages.PRIORITY_LAST,
+        condition=lambda self: self._enabled,
+    )
+    def _internal_packages_end(self):
+        self.processTransaction()
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_PACKAGES,
+        priority=plugin.Stages.PRIORITY_LAST,
+        condition=lambda self: self._enabled,
+    )
+    def _packages(self):
+        self.processTransaction()
+
+    def processTransaction(self):
+        """Resolve and apply queued operations."""
+        install, erase = self._resolve()
+        self._queued = []
+        if not install and not erase:
+            return
+
+        self.logger.debug("Transaction Summary:")
+        for op, c in (('install', install), ('erase', erase)):
+            for p in c:
+                self.logger.debug("    %s - %s", op, self._displayName(p))
+
+        for p in install:
+            self._sleep(
+                self._latency.get('download', 0) * p['size'] / 1048576.0
+            )
+            self.logger.info(
+                _('Fake: Downloaded {package}').format(
+                    package=self._displayName(p),
+                ),
+                extra={'progress': True},
+            )
+        for op, c in (
+            (_('Installing'), install),
+            (_('Erasing'), erase),
+        ):
+            for p in c:
+                self._sleep(self._latency.get('scriptlet', 0))
+                self.logger.info(
+                    _('Fake: {op}: {package}').format(
+                        op=op,
+                        package=self._displayName(p),
+                    ),
+                )
+        eraseNames = set(self._displayName(p) for p in erase)
+        self._setRpmdb(
+            [
+                p for p in self._rpmdb
+                if self._displayName(p) not in eraseNames
+            ] + install
+        )
+
+    # PackagerBase
+
+    def beginTransaction(self):
+        self._snapshot = copy.copy(self._rpmdb)
+        self._queued = []
+
+    def endTransaction(self, rollback=False):
+        if rollback and self._snapshot is not None:
+            self.logger.info(_('Performing fake packager rollback'))
+            self._setRpmdb(self._snapshot)
+        self._snapshot = None
+        self._queued = []
+
+    def installGroup(self, group, ignoreErrors=False):
+        if group not in self._groups:
+            if ignoreErrors:
+                return False
+            raise RuntimeError(
+                _('Group {group} cannot be found').format(group=group)
+            )
+        return self.install(
+            packages=self._groups[group].get('packages', []),
+            ignoreErrors=ignoreErrors,
+        )
+
+    def updateGroup(self, group, ignoreErrors=False):
+        return self.installUpdate(
+            packages=self._groups.get(group, {}).get('packages', []),
+            ignoreErrors=ignoreErrors,
+        )
+
+    def removeGroup(self, group, ignoreErrors=False):
+        return self.remove(
+            packages=self._groups.get(group, {}).get('packages', []),
+            ignoreErrors=ignoreErrors,
+        )
+
+    def install(self, packages, ignoreErrors=False):
+        return self._queue(
+            _('install'),
+            self._queueInstall,
+            packages,
+            ignoreErrors,
+        )
+
+    def update(self, packages, ignoreErrors=False):
+        return self._queue(
+            _('update'),
+            self._queueUpdate,
+            packages,
+            ignoreErrors,
+        )
+
+    def installUpdate(self, packages, ignoreErrors=False):
+        return self._queue(
+            _('install/update'),
+            lambda p: self._queueInstall(p, update=True),
+            packages,
+            ignoreErrors,
+        )
+
+    def remove(self, packages, ignoreErrors=False):
+        return self._queue(
+            _('remove'),
+            self._queueRemove,
+            packages,
+            ignoreErrors,
+        )
+
+    def queryGroups(self):
+        return [
+            {
+                'operation': (
+                    'update' if all(
+                        self._match(self._rpmdb, self._rpmdbIndex, p)
+                        for p in g.get('packages', [])
+                    )
+                    else 'install'
+                ),
+                'name': name,
+                'uservisible': g.get('uservisible', True),
+            }
+            for name, g in sorted(self._groups.items())
+        ]
+
+    def queryPackages(self, patterns=None, listAll=False, installedOnly=False):
+        if patterns is None:
+            patterns = ('*',)
+
+        installed = []
+        installedNames = set()
+        available = []
+        availableNames = set()
+        for pattern in patterns:
+            for p in self._match(self._rpmdb, self._rpmdbIndex, pattern):
+                self._add(installed, installedNames, p)
+            if not installedOnly:
+                for p in self._match(
+                    self._available,
+                    self._availableIndex,
+                    pattern,
+                ):
+                    self._add(available, availableNames, p)
+
+        if not listAll:
+            latest = {}
+            for p in available:
+                key = (p['name'], p['arch'])
+                if key not in latest or self._evr(p) > self._evr(latest[key]):
+                    latest[key] = p
+            available = list(latest.values())
+
+        byNameArch = {}
+        for i in installed:
+            byNameArch.setdefault((i['name'], i['arch']), []).append(i)
+        ret = packagelist.PackageList(
+            self._info(p, 'installed') for p in installed
+        )
+        for p in available:
+            same = byNameArch.get((p['name'], p['arch']), [])
+            if any(self._evr(i) == self._evr(p) for i in same):
+                ret.append(self._info(p, 'reinstall_available'))
+            elif listAll or not same or all(
+                self._evr(p) > self._evr(i) for i in same
+            ):
+                ret.append(self._info(p, 'available'))
+        return ret
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -27,12 +27,20 @@ import time
 
 
 from otopi import constants
+from otopi import packagelist
 from otopi import packager
 from otopi import plugin
 from otopi import transaction
 from otopi import util
 
 
+try:
+    from otopi import rpmdb
+except ImportError:
+    # rpm is missing, so is the packager
+    rpmdb = None
+
+
 def _(m):
     return gettext.dgettext(message=m, domain='otopi')
 
@@ -105,7 +113,11 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
                 if time.time() - self._last >= self._parent.environment[
                     constants.PackEnv.KEEP_ALIVE_INTERVAL
                 ]:
-                    self.info(msg)
+                    self._parent.logger.info(
+                        'Yum %s' % msg,
+                        extra={'progress': True},
+                    )
+                    self._touch()
 
             def askForGPGKeyImport(self, userid, hexkeyid):
                 return self._parent.dialog.confirm(
@@ -177,6 +189,10 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
             constants.PackEnv.KEEP_ALIVE_INTERVAL,
             constants.Defaults.PACKAGER_KEEP_ALIVE_INTERVAL
         )
+        self.environment.setdefault(
+            constants.PackEnv.METADATA_MAX_AGE,
+            constants.Defaults.PACKAGER_METADATA_MAX_AGE
+        )
         self.environment.setdefault(
             constants.PackEnv.YUMPACKAGER_EXPIRE_CACHE,
             True
@@ -227,7 +243,11 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
     def _setup(self):
         if self.environment[constants.PackEnv.YUMPACKAGER_EXPIRE_CACHE]:
             with self._miniyum.transaction():
-                self._miniyum.clean(['expire-cache'])
+                self._miniyum.setMetadataExpire(
+                    maxAge=self.environment[
+                        constants.PackEnv.METADATA_MAX_AGE
+                    ],
+                )
         self.environment[constants.CoreEnv.MAIN_TRANSACTION].append(
             self.YumTransaction(
                 parent=self,
@@ -329,10 +349,19 @@ class Plugin(plugin.PluginBase, packager.PackagerBase):
     def queryGroups(self):
         return self._miniyum.queryGroups()
 
-    def queryPackages(self, patterns=None, listAll=False):
-        return self._miniyum.queryPackages(
-            patterns=patterns,
-            showdups=listAll
+    def queryPackages(self, patterns=None, listAll=False, installedOnly=False):
+        if installedOnly:
+            return packagelist.PackageList(
+                rpmdb.queryInstalled(
+                    patterns=patterns,
+                    epochType=str,
+                )
+            )
+        return packagelist.PackageList(
+            self._miniyum.queryPackages(
+                patterns=patterns,
+                showdups=listAll,
+            )
         )
 
 
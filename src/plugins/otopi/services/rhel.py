@@ -103,7 +103,7 @@ class Plugin(plugin.PluginBase, services.ServicesBase):
         exists = False
         status = False
 
-        if self.command.get('initctl') is not None:
+        if self.command.get('initctl', optional=True) is not None:
             #
             # status always returns rc 0 no mater
             # what state it is